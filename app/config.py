@@ -15,7 +15,7 @@ class Settings(BaseSettings):
     # Google Cloud Platform
     gcp_project_id: str
     gcp_location: str = "us"
-    gcp_processor_id: str
+    gcp_processor_id: str = ""  # Vacío = sin Document AI (campos de la capa de texto)
     gcs_bucket_name: str
     
     # Credenciales: usaremos Application Default Credentials (no necesita archivo JSON)
@@ -23,6 +23,99 @@ class Settings(BaseSettings):
     
     # Configuración de la aplicación
     environment: str = "development"
+    startup_profile: bool = False           # Imprime el tiempo de arranque de cada componente
+    
+    # Recepción de PDFs
+    max_upload_mb: int = 25                 # Tamaño máximo de un PDF (413 si se supera)
+    upload_chunk_size: int = 1024 * 1024    # Bloques de lectura del upload
+    
+    # Subidas reanudables (/uploads)
+    upload_session_chunk_mb: int = 8             # Tamaño máximo de cada bloque (PUT)
+    upload_session_ttl: float = 86400.0          # Segundos hasta descartar una subida sin finalizar
+    upload_session_prefix: str = "upload-sessions"  # Carpeta del bucket para los bloques
+    upload_session_sweep_interval: float = 3600.0   # Cada cuántos segundos se borran las vencidas
+    
+    # Carga en lote (/upload-reports/batch)
+    batch_max_mb: int = 1024          # Tamaño máximo de la petición completa
+    batch_max_files: int = 1000       # PDFs por lote (contando los de los ZIP)
+    batch_concurrency: int = 4        # PDFs procesados a la vez
+    batch_write_size: int = 200       # Reportes por escritura en lote en Firestore
+    batch_input_prefix: str = "batch-inputs"  # Carpeta del bucket donde esperan los archivos del lote
+    
+    # Document AI en lote (/upload-reports/batch?ocr_mode=batch)
+    documentai_batch_prefix: str = "documentai-batch"  # Carpeta temporal en el bucket
+    documentai_batch_max_documents: int = 1000         # PDFs por operación
+    documentai_batch_poll_initial: float = 5.0         # Espera inicial entre consultas (s)
+    documentai_batch_poll_max: float = 60.0            # Espera máxima entre consultas (s)
+    documentai_batch_timeout: float = 3600.0           # Tiempo máximo de las operaciones (s)
+    documentai_batch_transport: str = "google"         # google o local (emulación en memoria)
+    
+    # Extracción de imágenes
+    min_image_pixels: int = 1024         # Descarta imágenes menores (ej. 32x32): íconos y adornos
+    
+    # Extracción por niveles: capa de texto del PDF antes que Document AI
+    text_layer_fast_path: bool = True          # False = siempre Document AI
+    text_layer_min_fields: int = 3             # Campos (de 5) encontrados para no usar OCR
+    text_layer_min_chars_per_page: float = 100.0  # Menos texto por página = probablemente escaneado
+    
+    # Document AI por fragmentos (PDFs grandes)
+    ocr_shard_threshold_pages: int = 15  # PDFs con más páginas se dividen (0 = nunca)
+    ocr_shard_pages: int = 10            # Páginas por fragmento
+    ocr_shard_concurrency: int = 4       # Fragmentos procesados a la vez
+    ocr_shard_retries: int = 2           # Reintentos por fragmento
+    
+    # Miniaturas y vistas previas ("nombre:lado,..."; vacío = desactivado)
+    image_derivative_sizes: str = "thumb:256,preview:1280"
+    image_derivative_format: str = "webp"    # webp o jpeg
+    image_derivative_quality: int = 80
+    image_derivative_workers: int = 2        # Procesos para redimensionar (y hilos que los esperan)
+    image_derivative_queue_max_size: int = 16  # Reportes esperando miniaturas; con más se omiten
+    
+    # Subida de imágenes a Cloud Storage
+    gcs_upload_concurrency: int = 8      # Imágenes subidas a la vez
+    gcs_upload_timeout: float = 60.0     # Timeout por imagen (segundos)
+    
+    # Deduplicación de PDFs reenviados
+    fingerprint_cache_size: int = 1024   # Huellas SHA-256 recientes en memoria
+    
+    # Caché de lectura de GET /reports/{id}
+    report_cache_size: int = 1024         # Reportes en memoria (0 = sin caché)
+    report_cache_ttl: float = 300.0       # Segundos que vive un reporte en caché
+    report_cache_negative_ttl: float = 5.0  # Segundos que se recuerda un 404
+    report_cache_url: str = ""            # Redis compartido entre instancias (vacío = memoria del proceso)
+    report_cache_timeout: float = 0.25    # Timeout de Redis (s); si falla o tarda se lee de Firestore
+    
+    # Búsqueda de reportes (GET /reports/search)
+    search_backend: str = "firestore"     # firestore o memory (índice en el proceso, para pruebas)
+    search_max_scan: int = 500            # Documentos leídos como máximo por página de resultados
+    
+    # Resiliencia frente a Document AI y Cloud Storage
+    pipeline_deadline: float = 120.0      # Presupuesto de tiempo de cada PDF (0 = sin límite)
+    documentai_timeout: float = 60.0      # Timeout de cada llamada a Document AI
+    documentai_retries: int = 2           # Reintentos ante errores transitorios (429, 5xx, timeouts)
+    gcs_retries: int = 3                  # Reintentos de cada subida/descarga de Cloud Storage
+    retry_base_delay: float = 0.5         # Backoff exponencial con jitter: espera base (s)
+    retry_max_delay: float = 8.0          # Tope de la espera entre reintentos (s)
+    circuit_failure_threshold: int = 5    # Errores transitorios seguidos que abren el circuito
+    circuit_reset_timeout: float = 30.0   # Segundos abierto antes de la llamada de prueba
+    
+    # Hilos para las etapas bloqueantes del pipeline (PyPDF2, Storage, Document AI, Firestore)
+    pipeline_max_workers: int = 8
+    read_workers: int = 8                 # Hilos aparte para las lecturas de los endpoints GET
+    
+    # Control de admisión: más allá del cupo se espera turno; con la cola llena, 429 + Retry-After
+    upload_concurrency: int = 4           # Uploads procesándose a la vez por instancia
+    upload_queue_max_size: int = 16       # Uploads esperando turno
+    upload_queue_timeout: float = 30.0    # Segundos de espera antes del 429
+    read_concurrency: int = 64            # Lecturas (GET) a la vez, con cupo propio
+    read_queue_max_size: int = 256
+    read_queue_timeout: float = 5.0
+    
+    # Modo asíncrono de /upload-report
+    job_workers: int = 2          # Trabajos procesados a la vez
+    job_queue_max_size: int = 100  # Trabajos en espera antes de rechazar con 503
+    job_input_prefix: str = "job-inputs"  # Carpeta del bucket donde esperan los PDFs encolados
+    job_stale_after: float = 3600.0  # Segundos tras los que un trabajo sin terminar se da por abandonado
     
     class Config:
         # Busca estas variables en un archivo .env
@@ -2,153 +2,1033 @@
 API Principal de DiagnoVET Challenge.
 Endpoints para subir PDFs de reportes veterinarios y consultarlos.
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, Header
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
+from starlette.routing import Match
+
+_fastapi_imported = time.perf_counter()
+
+import asyncio
 import os
+import signal
 import uuid
+import zipfile
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import List, Literal, Optional
 
-from app.models import VeterinaryReport, UploadResponse, ErrorResponse
-from app.config import get_settings
+from app.models import (
+    VeterinaryReport, UploadResponse, ErrorResponse, JobResponse, JobStatus, ReportPage,
+    BatchResponse, UploadSessionCreate, UploadSessionStatus
+)
+from app.config import Settings, get_settings
 from app.services.pdf_processor import PDFProcessor
 from app.services.gcp_storage import GCPStorageService
-from app.services.firestore_db import FirestoreService
-
-# Inicializar la aplicación FastAPI
-app = FastAPI(
-    title="DiagnoVET PDF Processor API",
-    description="API para procesar reportes de ultrasonido veterinario",
-    version="1.0.0"
+from app.services.firestore_db import FirestoreService, InvalidCursorError
+from app.services.cache import LRUCache, SharedCache
+from app.services.report_search import (
+    FirestoreReportSearch, InMemoryReportSearch, InvalidSearchError, ReportSearchQuery
+)
+from app.services.report_pipeline import ReportPipeline
+from app.services.job_queue import JobQueue, Job, JobQueueFullError
+from app.services.documentai_client import get_documentai_manager
+from app.services.image_derivatives import ImageDerivativeService, parse_derivative_specs
+from app.services.batch_ingest import BatchIngestor, file_items
+from app.services.documentai_batch import LocalBatchTransport, split_gcs_uri
+from app.services import metrics
+from app.services.admission import AdmissionController, AdmissionRejectedError
+from app.services.resilience import (
+    CircuitOpenError, RetryPolicy, circuit_stats, configure_guard
+)
+from app.services.startup import ServiceInitializer, StartupProfiler
+from app.services.upload_ingest import (
+    read_pdf_upload, pdf_upload_from_bytes, PDFUpload, UploadTooLargeError, InvalidPDFError
+)
+from app.services.upload_sessions import (
+    UploadSession, UploadSessionStore, UploadSessionNotFoundError, InvalidChunkError,
+    ChunkChecksumError, ChunkOffsetError
 )
 
-# Cargar configuración
-settings = get_settings()
+# Tiempos de arranque (STARTUP_PROFILE=true los imprime; GET /ready los devuelve)
+startup_profiler = StartupProfiler(started=_import_started)
+startup_profiler.record("fastapi", "import", _fastapi_imported - _import_started)
+startup_profiler.record("app", "import", time.perf_counter() - _fastapi_imported)
+
+# Rutas que responden aunque los servicios no estén listos
+ALWAYS_AVAILABLE_PATHS = {"/", "/ready", "/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"}
+
+# Segundos que una petición espera a que terminen de inicializarse los servicios antes del 503
+READY_WAIT_TIMEOUT = 30.0
+
+# Intentos de inicializar los servicios antes de terminar el proceso, y
+# espera entre intentos (se duplica hasta el máximo)
+STARTUP_ATTEMPTS = 5
+STARTUP_RETRY_DELAY = 2.0
+STARTUP_RETRY_MAX_DELAY = 30.0
+
+# Servicios: se construyen en segundo plano al arrancar (initialize_services)
+settings: Optional[Settings] = None
+pdf_processor: Optional[PDFProcessor] = None
+storage_service: Optional[GCPStorageService] = None
+report_cache = None
+search_index: Optional[InMemoryReportSearch] = None
+firestore_service: Optional[FirestoreService] = None
+report_search = None
+derivative_service: Optional[ImageDerivativeService] = None
+report_pipeline: Optional[ReportPipeline] = None
+job_queue: Optional[JobQueue] = None
+batch_transport: Optional[LocalBatchTransport] = None
+batch_ingestor: Optional[BatchIngestor] = None
+upload_sessions: Optional[UploadSessionStore] = None
+upload_sweeper: Optional[asyncio.Task] = None
+upload_admission: Optional[AdmissionController] = None
+read_admission: Optional[AdmissionController] = None
+
+
+def build_storage_service(settings: Settings) -> GCPStorageService:
+    """Cliente de Cloud Storage con el nombre del bucket y project_id configurado."""
+    startup_profiler.import_module("google.cloud.storage")
+    with startup_profiler.step("storage"):
+        return GCPStorageService(
+            bucket_name=settings.gcs_bucket_name,
+            project_id=settings.gcp_project_id,
+            upload_concurrency=settings.gcs_upload_concurrency,
+            upload_timeout=settings.gcs_upload_timeout
+        )
+
+
+def build_firestore_service(settings: Settings, report_cache, search_index) -> FirestoreService:
+    """Cliente de Firestore con las cachés y el índice de búsqueda."""
+    startup_profiler.import_module("google.cloud.firestore")
+    with startup_profiler.step("firestore"):
+        return FirestoreService(
+            project_id=settings.gcp_project_id,
+            fingerprint_cache_size=settings.fingerprint_cache_size,
+            report_cache=report_cache,
+            report_negative_ttl=settings.report_cache_negative_ttl,
+            search_index=search_index,
+            job_stale_after=settings.job_stale_after
+        )
+
+
+def warm_document_ai(settings: Settings):
+    """Pre-calienta el cliente de Document AI para que el primer upload no pague la conexión."""
+    if not settings.gcp_processor_id:
+        return
+    startup_profiler.import_module("google.cloud.documentai_v1")
+    with startup_profiler.step("documentai"):
+        get_documentai_manager().warm(
+            settings.gcp_project_id,
+            settings.gcp_location,
+            settings.gcp_processor_id
+        )
+
+
+async def initialize_services():
+    """
+    Construye los servicios. Corre en segundo plano al arrancar: los
+    clientes de Storage, Firestore y Document AI se crean en paralelo, cada
+    uno en un hilo (importarlos y buscar credenciales es lo que más tarda).
+    """
+    global settings, pdf_processor, storage_service, report_cache, search_index, firestore_service
+    global report_search, derivative_service, report_pipeline, job_queue, batch_transport, batch_ingestor
+    global upload_sessions, upload_sweeper, upload_admission, read_admission
+    
+    # Cargar configuración
+    with startup_profiler.step("settings"):
+        config = get_settings()
+    
+    # Caché de lectura de reportes: Redis si hay varias instancias, si no en memoria
+    with startup_profiler.step("report_cache"):
+        if config.report_cache_url:
+            cache = SharedCache.from_url(
+                config.report_cache_url,
+                timeout=config.report_cache_timeout,
+                default_ttl=config.report_cache_ttl
+            )
+        elif config.report_cache_size > 0:
+            cache = LRUCache(max_size=config.report_cache_size, default_ttl=config.report_cache_ttl)
+        else:
+            cache = None
+    
+    # Índice de búsqueda en memoria (SEARCH_BACKEND=memory, pruebas locales)
+    index = InMemoryReportSearch() if config.search_backend == "memory" else None
+    
+    # Reintentos y circuit breaker de Document AI y Cloud Storage
+    for dependency, retries, timeout in (
+        ("documentai", config.documentai_retries, config.documentai_timeout),
+        ("storage", config.gcs_retries, None)
+    ):
+        configure_guard(
+            dependency,
+            RetryPolicy(retries + 1, config.retry_base_delay, config.retry_max_delay),
+            failure_threshold=config.circuit_failure_threshold,
+            reset_timeout=config.circuit_reset_timeout,
+            timeout=timeout
+        )
+    
+    storage, firestore, _ = await asyncio.gather(
+        asyncio.to_thread(build_storage_service, config),
+        asyncio.to_thread(build_firestore_service, config, cache, index),
+        asyncio.to_thread(warm_document_ai, config)
+    )
+    
+    # Control de admisión: cupos separados para procesar uploads y para lecturas.
+    # El de uploads lo ocupa cada ejecución del pipeline (peticiones, workers y lotes)
+    upload_admission = AdmissionController(
+        "uploads",
+        max_concurrent=config.upload_concurrency,
+        max_queue=config.upload_queue_max_size,
+        queue_timeout=config.upload_queue_timeout
+    )
+    read_admission = AdmissionController(
+        "reads",
+        max_concurrent=config.read_concurrency,
+        max_queue=config.read_queue_max_size,
+        queue_timeout=config.read_queue_timeout
+    )
+    
+    with startup_profiler.step("pipeline"):
+        processor = PDFProcessor(
+            min_image_pixels=config.min_image_pixels,
+            ocr_shard_threshold_pages=config.ocr_shard_threshold_pages,
+            ocr_shard_pages=config.ocr_shard_pages,
+            ocr_shard_concurrency=config.ocr_shard_concurrency,
+            ocr_shard_retries=config.ocr_shard_retries
+        )
+        
+        # Miniaturas y vistas previas de las imágenes
+        derivatives = ImageDerivativeService(
+            storage,
+            specs=parse_derivative_specs(
+                config.image_derivative_sizes,
+                config.image_derivative_format,
+                config.image_derivative_quality
+            ),
+            workers=config.image_derivative_workers
+        )
+        
+        # Pipeline compartido por el modo síncrono y el asíncrono
+        pipeline = ReportPipeline(
+            processor,
+            storage,
+            firestore,
+            config,
+            max_workers=config.pipeline_max_workers,
+            derivative_service=derivatives,
+            read_workers=config.read_workers,
+            derivative_workers=config.image_derivative_workers,
+            derivative_queue_max_size=config.image_derivative_queue_max_size,
+            admission=upload_admission
+        )
+        
+        # Workers en segundo plano para el modo asíncrono
+        queue = JobQueue(
+            pipeline=pipeline,
+            firestore_service=firestore,
+            workers=config.job_workers,
+            max_size=config.job_queue_max_size
+        )
+        
+        # Carga en lote del histórico de una clínica. Con DOCUMENTAI_BATCH_TRANSPORT=local
+        # el OCR en lote se emula en memoria (para probar sin el procesador real)
+        transport = None
+        if config.documentai_batch_transport == "local":
+            transport = LocalBatchTransport(
+                read_input=lambda uri: storage.download_bytes(split_gcs_uri(uri)[1])
+            )
+        
+        ingestor = BatchIngestor(
+            pipeline=pipeline,
+            firestore_service=firestore,
+            concurrency=config.batch_concurrency,
+            write_batch_size=config.batch_write_size,
+            batch_transport=transport
+        )
+        
+        # GET /reports/search: consultas a Firestore salvo con el índice en memoria
+        search = index or FirestoreReportSearch(
+            firestore.db, firestore.collection_name, max_scan=config.search_max_scan
+        )
+        
+        # Subidas reanudables: los bloques quedan en el bucket (cualquier instancia las continúa)
+        sessions = UploadSessionStore(
+            storage,
+            prefix=config.upload_session_prefix,
+            ttl=config.upload_session_ttl,
+            chunk_size=config.upload_session_chunk_mb * 1024 * 1024
+        )
+    
+    # Métricas: cachés y cola se leen al consultar /metrics
+    metrics.CACHE_STATS.register("reports", cache)
+    metrics.CACHE_STATS.register("fingerprints", firestore.fingerprint_cache)
+    metrics.JOBS_WAITING.set_function(queue.qsize)
+    metrics.DERIVATIVES_PENDING.set_function(pipeline.derivatives_pending)
+    
+    # Arrancar los workers del modo asíncrono y la limpieza de subidas vencidas
+    queue.start()
+    upload_sweeper = asyncio.create_task(
+        sweep_upload_sessions(sessions, pipeline, config.upload_session_sweep_interval)
+    )
+    
+    settings, report_cache, search_index = config, cache, index
+    pdf_processor, storage_service, firestore_service = processor, storage, firestore
+    derivative_service, report_pipeline, job_queue = derivatives, pipeline, queue
+    batch_transport, batch_ingestor, report_search = transport, ingestor, search
+    upload_sessions = sessions
+    
+    startup_profiler.mark_ready()
+    print(f"🚀 Servicios listos en {startup_profiler.ready_seconds:.2f} s")
+    if config.startup_profile:
+        print(startup_profiler.report())
+
+
+async def sweep_upload_sessions(store: UploadSessionStore, pipeline: ReportPipeline, interval: float):
+    """Borra periódicamente las subidas reanudables que vencieron sin finalizar."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await pipeline.run_blocking(store.purge_expired)
+        except Exception as e:
+            print(f"⚠️  Error limpiando subidas vencidas: {str(e)}")
 
-# Inicializar servicios
-pdf_processor = PDFProcessor()
 
-# Inicializar Cloud Storage con el nombre del bucket y project_id configurado
-storage_service = GCPStorageService(
-    bucket_name=settings.gcs_bucket_name,
-    project_id=settings.gcp_project_id
+def exit_after_failed_startup():
+    """
+    Termina el proceso cuando la inicialización agotó sus intentos (o
+    falló por un error que no se reintenta, como la configuración): con
+    SIGTERM el servidor se apaga ordenadamente y el orquestador (Cloud Run,
+    el gestor de procesos) levanta una instancia nueva, en vez de dejar
+    viva una que solo responde 503.
+    """
+    print(f"💀 No se pudieron inicializar los servicios después de {services.attempt} intento(s); terminando el proceso")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+services = ServiceInitializer(
+    initialize_services,
+    attempts=STARTUP_ATTEMPTS,
+    retry_delay=STARTUP_RETRY_DELAY,
+    retry_max_delay=STARTUP_RETRY_MAX_DELAY,
+    on_give_up=exit_after_failed_startup,
+    # Configuración inválida (falta una variable, tipo incorrecto): no es pasajera
+    permanent_errors=(ValidationError,)
 )
 
-# Inicializar Firestore
-firestore_service = FirestoreService(project_id=settings.gcp_project_id)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranca la inicialización de los servicios sin esperarla (el servidor
+    acepta conexiones enseguida) y al apagar detiene los lotes en curso,
+    los workers del modo asíncrono, el executor del pipeline y los canales
+    de Document AI.
+    """
+    services.start()
+    yield
+    await services.stop()
+    if upload_sweeper is not None:
+        upload_sweeper.cancel()
+    if batch_ingestor is not None:
+        await batch_ingestor.stop()
+    if job_queue is not None:
+        await job_queue.stop()
+    if report_pipeline is not None:
+        report_pipeline.shutdown()
+    get_documentai_manager().close()
+
+
+# Inicializar la aplicación FastAPI
+app = FastAPI(
+    title="DiagnoVET PDF Processor API",
+    description="API para procesar reportes de ultrasonido veterinario",
+    version="1.0.0",
+    lifespan=lifespan
+)
 
 
 @app.get("/")
 async def root():
     """
     Endpoint de salud (health check).
-    Verifica que la API esté funcionando.
+    Verifica que la API esté funcionando. No espera a los servicios:
+    para saber si puede recibir tráfico se usa GET /ready.
     """
     return {
         "status": "online",
         "service": "DiagnoVET PDF Processor",
         "version": "1.0.0",
-        "environment": settings.environment
+        "environment": settings.environment if settings else None
     }
 
 
-@app.post("/upload-report", response_model=UploadResponse)
-async def upload_report(file: UploadFile = File(...)):
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 200 cuando los clientes de GCP están inicializados, 503
+    mientras arrancan o si la inicialización falló. Incluye el tiempo de
+    arranque de cada componente, la ocupación de los cupos de admisión y
+    el estado de los circuitos de Document AI y Cloud Storage.
+    """
+    status = services.status
+    content = {"status": status, "startup": startup_profiler.summary()}
+    if services.error is not None:
+        content["error"] = str(services.error)
+    if services.ready:
+        content["admission"] = {
+            "uploads": upload_admission.stats(),
+            "reads": read_admission.stats()
+        }
+        content["circuits"] = circuit_stats()
+    return JSONResponse(status_code=200 if status == "ready" else 503, content=content)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Métricas en formato Prometheus."""
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+def admission_budget(request: Request) -> Optional[AdmissionController]:
+    """
+    Cupo de admisión de una petición: uploads para las que terminan
+    ejecutando el pipeline, reads para las lecturas (GET) de reportes,
+    trabajos, subidas y lotes.
+    El resto (salud, métricas, bloques de subidas reanudables) no tiene cupo.
+    """
+    path = request.url.path
+    if request.method == "POST":
+        if path in ("/upload-report", "/upload-reports/batch"):
+            return upload_admission
+        if path.startswith("/uploads/") and path.endswith("/complete"):
+            return upload_admission
+        if path.startswith("/reports/") and path.endswith("/derivatives"):
+            return upload_admission
+    elif request.method in ("GET", "HEAD"):
+        if path.startswith(("/reports", "/jobs/", "/uploads/", "/batches/")):
+            return read_admission
+    return None
+
+
+def admission_rejected(error: AdmissionRejectedError) -> JSONResponse:
+    """Respuesta 429 con Retry-After para un cupo saturado."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """
+    Limita las peticiones que se ejecutan a la vez por cupo (uploads y
+    lecturas por separado, así una ráfaga de uploads no frena los GET).
+
+    Las lecturas ocupan su lugar durante toda la petición. Los uploads no:
+    el lugar lo ocupa ReportPipeline.run (así también cuentan los workers y
+    los lotes, y un cuerpo que llega lento no retiene un lugar). Acá solo se
+    rechaza con 429 y Retry-After, antes de leer el cuerpo, si no hay lugar
+    ni en la cola de espera.
+    """
+    budget = admission_budget(request)
+    if budget is None:
+        return await call_next(request)
+    try:
+        if budget is upload_admission:
+            budget.check()
+            return await call_next(request)
+        async with budget.admit():
+            return await call_next(request)
+    except AdmissionRejectedError as e:
+        return admission_rejected(e)
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """
+    Rechaza con 413 antes de leer el cuerpo si Content-Length ya supera
+    el máximo. Los uploads sin Content-Length se cortan al leerlos por bloques.
+    La carga en lote tiene su propio máximo (BATCH_MAX_MB).
+    """
+    content_length = request.headers.get("content-length")
+    if settings is None:
+        # Sin configuración todavía (iniciando o falló): no hay máximo que
+        # aplicar; wait_for_services responde 503 a las rutas que lo necesitan
+        return await call_next(request)
+    if request.method == "POST" and content_length and content_length.isdigit():
+        max_mb = settings.batch_max_mb if request.url.path == "/upload-reports/batch" else settings.max_upload_mb
+        # Margen para las cabeceras del multipart
+        if int(content_length) > max_mb * 1024 * 1024 + 64 * 1024:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"El archivo supera el máximo de {max_mb} MB"}
+            )
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def wait_for_services(request: Request, call_next):
+    """
+    Las peticiones que llegan mientras los servicios se inicializan esperan
+    hasta READY_WAIT_TIMEOUT segundos; si no están listos, 503 con Retry-After.
+    """
+    if request.url.path in ALWAYS_AVAILABLE_PATHS or services.ready:
+        return await call_next(request)
+    if not await services.wait(READY_WAIT_TIMEOUT):
+        detail = "El servicio está iniciando"
+        if services.status == "failed":
+            detail = "No se pudieron inicializar los servicios (ver GET /ready)"
+        return JSONResponse(status_code=503, content={"detail": detail}, headers={"Retry-After": "5"})
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """
+    Mide la duración de cada petición por endpoint (la ruta con
+    parámetros, ej: /reports/{report_id}) y las peticiones en curso.
+
+    Se registra último para ser el middleware más externo: también cuenta
+    los 429, 413 y 503 que responden los otros middlewares sin llegar a
+    la ruta.
+    """
+    start = time.perf_counter()
+    status = 500
+    metrics.HTTP_IN_PROGRESS.inc()
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_IN_PROGRESS.dec()
+        metrics.HTTP_DURATION.labels(request.method, route_path(request), str(status)).observe(
+            time.perf_counter() - start
+        )
+
+
+def route_path(request: Request) -> str:
+    """
+    Ruta con parámetros de una petición. Si un middleware respondió antes
+    del router (429, 413, 503) se busca entre las rutas de la app.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        for candidate in app.router.routes:
+            match, _ = candidate.matches(request.scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return route.path if route is not None else "unmatched"
+
+
+@app.post("/upload-report", response_model=UploadResponse, responses={202: {"model": JobResponse}})
+async def upload_report(
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, description="Encolar el procesamiento y responder 202 de inmediato")
+):
     """
     Endpoint para subir un PDF de reporte veterinario.
     
     Flujo:
-    1. Recibe el PDF
-    2. Lo guarda temporalmente
-    3. Extrae texto con Document AI (o OCR local por ahora)
+    1. Recibe el PDF por bloques (máximo MAX_UPLOAD_MB, si no 413)
+    2. Valida la firma %PDF- (si no 400)
+    3. Extrae campos con Document AI
     4. Extrae imágenes del PDF
     5. Sube imágenes a Cloud Storage
     6. Guarda metadata en Firestore
     7. Retorna el ID del reporte
+    
+    Con async_mode=true solo se ejecutan los pasos 1 y 2: se guarda un
+    trabajo con status "queued", se responde 202 y un worker en segundo
+    plano ejecuta el resto. El avance se consulta en GET /jobs/{id}.
     """
     try:
-        # Validar que sea un PDF
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(status_code=400, detail="Solo se aceptan archivos PDF")
-        
         # Generar ID único para este reporte
         report_id = str(uuid.uuid4())[:8]  # Usamos solo los primeros 8 caracteres
+        pdf_filename = file.filename or f"{report_id}.pdf"
         
-        # Guardar PDF temporalmente
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        pdf_path = os.path.join(upload_dir, f"{report_id}_{file.filename}")
+        # Leer el PDF por bloques en un único buffer (valida firma y tamaño)
+        upload = await read_upload(file)
+        print(f"✅ PDF recibido: {pdf_filename} ({len(upload.content)} bytes)")
         
-        # Leer y guardar el archivo
-        with open(pdf_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        return await process_upload(report_id, upload, pdf_filename, async_mode)
         
-        print(f"✅ PDF guardado en: {pdf_path}")
+    except HTTPException:
+        raise
+    except AdmissionRejectedError as e:
+        return admission_rejected(e)
+    except Exception as e:
+        print(f"❌ Error procesando PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error procesando PDF: {str(e)}")
+
+
+@app.post("/upload-reports/batch", response_model=BatchResponse, status_code=202)
+async def upload_reports_batch(
+    files: List[UploadFile] = File(..., description="PDFs y/o archivos ZIP con PDFs"),
+    ocr_mode: Literal["online", "batch"] = Query(
+        "online", description="online: una llamada a Document AI por PDF; batch: operaciones en lote"
+    )
+):
+    """
+    Carga en lote: varios PDFs, uno o más ZIP, o una mezcla.
+    
+    Responde 202 enseguida con el batch_id: los archivos se copian a Cloud
+    Storage (BATCH_INPUT_PREFIX) y se procesan en segundo plano. El avance
+    y el resultado de cada archivo se consultan en GET /batches/{batch_id}.
+    
+    Cada PDF pasa por el mismo pipeline que /upload-report, con un máximo
+    de BATCH_CONCURRENCY a la vez, y los reportes se guardan en Firestore
+    con escrituras en lote. Un archivo que falla no detiene el lote.
+    
+    Con ocr_mode=batch los PDFs se procesan con operaciones en lote de
+    Document AI (no consumen la cuota en línea; tardan minutos).
+    """
+    try:
+        if ocr_mode == "batch" and not (settings.gcp_processor_id or batch_transport):
+            raise HTTPException(status_code=400, detail="ocr_mode=batch requiere GCP_PROCESSOR_ID")
         
-        # FASE 1 (LOCAL): Solo extraer texto básico por ahora
-        extracted_text = pdf_processor.extract_text(pdf_path)
-        print(f"📄 Texto extraído: {len(extracted_text)} caracteres")
+        batch_id = str(uuid.uuid4())[:8]
+        max_bytes = settings.max_upload_mb * 1024 * 1024
         
-        # FASE 1 (LOCAL): Extraer imágenes del PDF
-        image_paths = pdf_processor.extract_images(pdf_path, report_id)
-        print(f"🖼️  Imágenes extraídas: {len(image_paths)}")
+        # Solo se cuentan los PDFs (y se validan los ZIP): el contenido se lee al procesarlos
+        total = 0
+        for file in files:
+            try:
+                # Lee el directorio del ZIP (archivo en disco): bloqueante
+                items = await report_pipeline.run_blocking(
+                    file_items, file.filename or "archivo.pdf", file.file, max_bytes
+                )
+                total += len(items)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"ZIP inválido: {file.filename}")
         
-        # FASE 2 (CLOUD): Subir imágenes a Cloud Storage
-        image_urls = []
-        if storage_service and len(image_paths) > 0:
-            print(f"☁️  Subiendo {len(image_paths)} imágenes a Cloud Storage...")
-            image_urls = storage_service.upload_multiple_images(image_paths, report_id)
-            print(f"✅ Imágenes disponibles en Cloud Storage")
+        if not total:
+            raise HTTPException(status_code=400, detail="El lote no contiene PDFs")
+        if total > settings.batch_max_files:
+            raise HTTPException(
+                status_code=400,
+                detail=f"El lote tiene {total} PDFs; el máximo es {settings.batch_max_files}"
+            )
         
-        # FASE 3 (DOCUMENT AI): Extraer campos específicos del PDF
-        extracted_fields = {}
-        try:
-            if settings.gcp_processor_id:
-                print(f"🤖 Extrayendo campos con Document AI...")
-                extracted_fields = pdf_processor.extract_fields_with_document_ai(
-                    pdf_path=pdf_path,
-                    project_id=settings.gcp_project_id,
-                    location=settings.gcp_location,
-                    processor_id=settings.gcp_processor_id
-                )
-                print(f"✅ Campos extraídos por Document AI")
-        except Exception as ai_error:
-            print(f"⚠️  Error en Document AI, continuando sin extracción: {ai_error}")
-            extracted_fields = {
-                "patient_name": None,
-                "owner_name": None,
-                "veterinarian_name": None,
-                "diagnosis": None,
-                "recommendations": None
-            }
-        
-        # FASE 2 (FIRESTORE): Guardar metadata en Firestore
-        report_data = {
-            "id": report_id,
-            "pdf_filename": file.filename,
-            "patient_name": extracted_fields.get("patient_name"),
-            "owner_name": extracted_fields.get("owner_name"),
-            "veterinarian_name": extracted_fields.get("veterinarian_name"),
-            "diagnosis": extracted_fields.get("diagnosis"),
-            "recommendations": extracted_fields.get("recommendations"),
-            "image_urls": image_urls,
-            "upload_date": datetime.utcnow(),
-            "status": "processed"
+        batch = {
+            "batch_id": batch_id,
+            "status": "queued",
+            "ocr_mode": ocr_mode,
+            "total": total,
+            "processed": 0,
+            "duplicates": 0,
+            "failed": 0,
+            "results": [],
+            "created_at": datetime.utcnow()
         }
+        try:
+            sources = await batch_ingestor.stage(
+                batch_id, [(file.filename or "archivo.pdf", file.file) for file in files]
+            )
+            await report_pipeline.run_blocking(firestore_service.save_batch, batch)
+        except Exception:
+            await batch_ingestor.discard_inputs(batch_id)
+            raise
         
-        if firestore_service:
-            firestore_service.save_report(report_data)
+        batch_ingestor.submit(batch_id, sources, max_bytes, ocr_mode=ocr_mode)
+        print(f"📦 Lote {batch_id} recibido: {total} PDFs")
+        return BatchResponse(**batch)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error recibiendo lote: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error recibiendo lote: {str(e)}")
+
+
+@app.get("/batches/{batch_id}", response_model=BatchResponse)
+async def get_batch(batch_id: str):
+    """
+    Estado de una carga en lote: avance (processed, duplicates y failed se
+    actualizan mientras se procesa) y, al terminar, el resultado de cada
+    archivo.
+    """
+    try:
+        batch = await report_pipeline.run_read(firestore_service.get_batch, batch_id)
+        if not batch:
+            raise HTTPException(status_code=404, detail=f"Lote '{batch_id}' no encontrado")
+        return BatchResponse(**batch)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo lote: {str(e)}")
+
+
+async def process_upload(report_id: str, upload: PDFUpload, pdf_filename: str, async_mode: bool):
+    """
+    Procesa un PDF ya recibido (por /upload-report o al finalizar una subida
+    reanudable): deduplica por huella y lo procesa o lo encola.
+    
+    Args:
+        report_id: ID del reporte nuevo
+        upload: PDF recibido (contenido y huella)
+        pdf_filename: Nombre original del PDF
+        async_mode: Encolar y responder 202 en vez de procesar
         
+    Returns:
+        UploadResponse, o JSONResponse 202 en modo asíncrono
+        
+    Raises:
+        AdmissionRejectedError: Si el cupo de uploads está saturado (429)
+    """
+    # Si este mismo PDF ya se procesó, devolver el reporte existente
+    existing_id = await report_pipeline.run_blocking(
+        firestore_service.find_report_by_fingerprint, upload.sha256
+    )
+    if existing_id:
+        print(f"♻️  PDF duplicado: ya procesado como {existing_id}")
         return UploadResponse(
+            report_id=existing_id,
+            message=f"Este PDF ya fue procesado en el reporte {existing_id}. No se volvió a procesar.",
+            duplicate=True
+        )
+    
+    if async_mode:
+        return await enqueue_report(report_id, upload, pdf_filename)
+    
+    # FASES 1-3: Imágenes, Cloud Storage, Document AI y Firestore (fuera del event loop)
+    report_data = await report_pipeline.run(
+        report_id, upload.content, pdf_filename, content_sha256=upload.sha256
+    )
+    
+    return UploadResponse(
+        report_id=report_id,
+        message=f"Reporte procesado. {report_data['image_count']} imágenes extraídas y {len(report_data['image_urls'])} subidas a Cloud Storage."
+    )
+
+
+async def read_upload(file: UploadFile) -> PDFUpload:
+    """
+    Lee el PDF subido y traduce los errores de validación a respuestas HTTP.
+    
+    Args:
+        file: Archivo recibido
+        
+    Returns:
+        PDFUpload: Contenido del PDF y su huella SHA-256
+    """
+    try:
+        return await read_pdf_upload(
+            file,
+            max_bytes=settings.max_upload_mb * 1024 * 1024,
+            chunk_size=settings.upload_chunk_size
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPDFError:
+        raise HTTPException(status_code=400, detail="Solo se aceptan archivos PDF")
+
+
+async def enqueue_report(report_id: str, upload: PDFUpload, pdf_filename: str) -> JSONResponse:
+    """
+    Copia el PDF a Cloud Storage (JOB_INPUT_PREFIX), guarda el registro del
+    trabajo con status "queued" y encola solo la referencia al PDF.
+    
+    La huella se registra al encolar, así un reenvío mientras el trabajo
+    sigue en curso devuelve el mismo reporte. Si el trabajo falla (o queda
+    abandonado más de JOB_STALE_AFTER) el PDF se puede volver a subir.
+    
+    Args:
+        report_id: ID del reporte
+        upload: PDF recibido (contenido y huella)
+        pdf_filename: Nombre original del PDF
+        
+    Returns:
+        JSONResponse 202 con el ID del reporte
+    """
+    input_blob = f"{settings.job_input_prefix.strip('/')}/{report_id}.pdf"
+    await report_pipeline.run_blocking(
+        storage_service.upload_bytes, upload.content, input_blob, "application/pdf"
+    )
+    await report_pipeline.run_blocking(firestore_service.save_report, {
+        "id": report_id,
+        "pdf_filename": pdf_filename,
+        "image_urls": [],
+        "upload_date": datetime.utcnow(),
+        "status": "queued",
+        "progress": JobQueue.initial_progress(),
+        "content_sha256": upload.sha256
+    })
+    await report_pipeline.run_blocking(firestore_service.save_fingerprint, upload.sha256, report_id, False)
+    
+    try:
+        job_queue.submit(Job(
             report_id=report_id,
-            message=f"Reporte procesado. {len(image_paths)} imágenes extraídas y {len(image_urls)} subidas a Cloud Storage."
+            input_blob=input_blob,
+            pdf_filename=pdf_filename,
+            content_sha256=upload.sha256
+        ))
+    except JobQueueFullError as e:
+        await report_pipeline.run_blocking(firestore_service.delete_report, report_id)
+        await report_pipeline.run_blocking(storage_service.delete_image, input_blob)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    response = JobResponse(
+        report_id=report_id,
+        status="queued",
+        message=f"Reporte encolado. Consulta el avance en /jobs/{report_id}"
+    )
+    return JSONResponse(status_code=202, content=response.model_dump())
+
+
+def upload_session_status(session: UploadSession) -> UploadSessionStatus:
+    """Respuesta de los endpoints de /uploads."""
+    return UploadSessionStatus(
+        upload_id=session.upload_id,
+        filename=session.filename,
+        size=session.size,
+        offset=session.offset,
+        chunk_size=upload_sessions.chunk_size,
+        expires_at=session.expires_at
+    )
+
+
+def upload_session_error(error: Exception) -> JSONResponse:
+    """
+    Traduce los errores de una subida reanudable a respuestas HTTP. Los 409
+    incluyen el offset confirmado para que el cliente continúe desde ahí;
+    con el circuito de Cloud Storage abierto, 503 con Retry-After.
+    """
+    if isinstance(error, CircuitOpenError):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(error)},
+            headers={"Retry-After": str(max(1, round(error.retry_in)))}
+        )
+    if isinstance(error, UploadSessionNotFoundError):
+        return JSONResponse(status_code=404, content={"detail": str(error)})
+    if isinstance(error, ChunkOffsetError):
+        return JSONResponse(status_code=409, content={"detail": str(error), "offset": error.offset})
+    return JSONResponse(status_code=400, content={"detail": str(error)})
+
+
+async def read_chunk(request: Request) -> bytes:
+    """
+    Lee el cuerpo de un PUT de bloque, cortando con 413 si supera el
+    tamaño máximo de bloque.
+    """
+    max_bytes = upload_sessions.chunk_size
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"El bloque supera el máximo de {max_bytes} bytes")
+    
+    buffer = bytearray()
+    async for part in request.stream():
+        buffer.extend(part)
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"El bloque supera el máximo de {max_bytes} bytes")
+    return bytes(buffer)
+
+
+@app.post("/uploads", response_model=UploadSessionStatus, status_code=201)
+async def create_upload_session(body: UploadSessionCreate, response: Response):
+    """
+    Inicia una subida reanudable para PDFs grandes o conexiones inestables.
+    
+    Flujo:
+    1. POST /uploads con el nombre y tamaño del PDF → upload_id y chunk_size
+    2. PUT /uploads/{upload_id} por cada bloque, en orden, con Content-Range
+       y X-Chunk-SHA256 (SHA-256 del bloque en hex)
+    3. Si se corta la conexión: GET /uploads/{upload_id} devuelve el offset
+       confirmado y se continúa desde ahí
+    4. POST /uploads/{upload_id}/complete procesa el PDF como /upload-report
+    
+    Las subidas sin finalizar se descartan después de UPLOAD_SESSION_TTL.
+    """
+    try:
+        max_bytes = settings.max_upload_mb * 1024 * 1024
+        if body.size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"El archivo supera el máximo de {settings.max_upload_mb} MB")
+        
+        session = await report_pipeline.run_blocking(
+            upload_sessions.create, body.filename, body.size, body.sha256
+        )
+        response.headers["Location"] = f"/uploads/{session.upload_id}"
+        return upload_session_status(session)
+    
+    except HTTPException:
+        raise
+    except CircuitOpenError as e:
+        return upload_session_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error creando la subida: {str(e)}")
+
+
+@app.put("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def put_upload_chunk(
+    upload_id: str,
+    request: Request,
+    content_range: Optional[str] = Header(None, description="Bytes del bloque: bytes inicio-fin/total"),
+    x_chunk_sha256: Optional[str] = Header(None, description="SHA-256 del bloque en hex")
+):
+    """
+    Guarda un bloque de una subida reanudable. El cuerpo son los bytes del
+    bloque (no multipart).
+    
+    Responde con el offset confirmado. 409 si el bloque no empieza en ese
+    offset (la respuesta lo incluye); reenviar un bloque ya guardado no es
+    un error.
+    """
+    try:
+        data = await read_chunk(request)
+        session = await report_pipeline.run_blocking(
+            upload_sessions.put_chunk, upload_id, content_range, data, x_chunk_sha256
         )
+        return upload_session_status(session)
+    
+    except HTTPException:
+        raise
+    except (UploadSessionNotFoundError, InvalidChunkError, ChunkChecksumError, ChunkOffsetError, CircuitOpenError) as e:
+        return upload_session_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error guardando el bloque: {str(e)}")
+
+
+@app.get("/uploads/{upload_id}", response_model=UploadSessionStatus)
+async def get_upload_session(upload_id: str):
+    """
+    Estado de una subida reanudable: offset es la cantidad de bytes ya
+    confirmados (el próximo PUT empieza ahí).
+    """
+    try:
+        session = await report_pipeline.run_read(upload_sessions.get, upload_id)
+        return upload_session_status(session)
+    
+    except (UploadSessionNotFoundError, CircuitOpenError) as e:
+        return upload_session_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error consultando la subida: {str(e)}")
+
+
+@app.post("/uploads/{upload_id}/complete", response_model=UploadResponse, responses={202: {"model": JobResponse}})
+async def complete_upload_session(
+    upload_id: str,
+    async_mode: bool = Query(False, description="Encolar el procesamiento y responder 202 de inmediato")
+):
+    """
+    Finaliza una subida reanudable: une los bloques, valida el PDF (y el
+    SHA-256 declarado al crearla) y lo procesa igual que /upload-report.
+    La sesión se borra cuando el PDF quedó procesado o encolado; si el
+    procesamiento falla se puede volver a finalizar.
+    """
+    try:
+        session, content = await report_pipeline.run_blocking(upload_sessions.read, upload_id)
+        try:
+            upload = pdf_upload_from_bytes(content, settings.max_upload_mb * 1024 * 1024)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidPDFError:
+            raise HTTPException(status_code=400, detail="Solo se aceptan archivos PDF")
+        print(f"✅ PDF recibido por bloques: {session.filename} ({len(upload.content)} bytes)")
+        
+        report_id = str(uuid.uuid4())[:8]
+        result = await process_upload(report_id, upload, session.filename, async_mode)
         
+        await report_pipeline.run_blocking(upload_sessions.delete, upload_id)
+        return result
+    
+    except HTTPException:
+        raise
+    except AdmissionRejectedError as e:
+        # La sesión se conserva: se puede volver a finalizar después de Retry-After
+        return admission_rejected(e)
+    except (UploadSessionNotFoundError, ChunkChecksumError, ChunkOffsetError, CircuitOpenError) as e:
+        return upload_session_error(e)
     except Exception as e:
         print(f"❌ Error procesando PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error procesando PDF: {str(e)}")
 
 
+@app.get("/jobs/{report_id}", response_model=JobStatus)
+async def get_job(report_id: str):
+    """
+    Consulta el estado de un trabajo asíncrono y el avance de cada etapa.
+    """
+    try:
+        report_data = None
+        if firestore_service:
+            report_data = await report_pipeline.run_read(firestore_service.get_report, report_id)
+        
+        if not report_data:
+            raise HTTPException(status_code=404, detail=f"Trabajo '{report_id}' no encontrado")
+        
+        return JobStatus(
+            report_id=report_id,
+            status=report_data.get("status", "processed"),
+            progress=report_data.get("progress", {}),
+            error=report_data.get("error")
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo trabajo: {str(e)}")
+
+
+@app.get("/reports/search", response_model=ReportPage)
+async def search_reports(
+    patient_name: Optional[str] = Query(None, description="Nombre del paciente"),
+    owner_name: Optional[str] = Query(None, description="Nombre del propietario"),
+    veterinarian_name: Optional[str] = Query(None, description="Veterinario que refiere"),
+    match: Literal["exact", "prefix"] = Query(
+        "exact", description="exact: nombre completo; prefix: cada palabra es el comienzo de una palabra del nombre"
+    ),
+    date_from: Optional[datetime] = Query(None, description="Cargados desde (incluido, ISO 8601)"),
+    date_to: Optional[datetime] = Query(None, description="Cargados hasta (no incluido, ISO 8601)"),
+    q: Optional[str] = Query(None, description="Palabras del diagnóstico o las recomendaciones (todas deben aparecer)"),
+    page_size: int = Query(20, ge=1, le=100, description="Reportes por página"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor por la página anterior")
+):
+    """
+    Busca reportes por paciente, propietario, veterinario, fecha de carga y
+    palabras del diagnóstico. Los criterios se combinan (AND) y los nombres
+    no distinguen mayúsculas ni acentos ("perez" encuentra "Pérez").
+    
+    Resultados del más reciente al más antiguo, paginados con cursor.
+    """
+    try:
+        names = {
+            name: value for name, value in (
+                ("patient_name", patient_name),
+                ("owner_name", owner_name),
+                ("veterinarian_name", veterinarian_name)
+            ) if value
+        }
+        query = ReportSearchQuery(
+            names=names,
+            match=match,
+            date_from=date_from,
+            date_to=date_to,
+            text=q,
+            page_size=page_size,
+            cursor=cursor
+        )
+        page = await report_pipeline.run_read(report_search.search, query)
+        return ReportPage(
+            reports=page.reports,
+            next_cursor=page.next_cursor,
+            page_size=page_size,
+            truncated=page.truncated
+        )
+    
+    except (InvalidSearchError, InvalidCursorError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error buscando reportes: {str(e)}")
+
+
 @app.get("/reports/{report_id}", response_model=VeterinaryReport)
 async def get_report(report_id: str):
     """
@@ -159,7 +1039,7 @@ async def get_report(report_id: str):
     try:
         # Consultar Firestore
         if firestore_service:
-            report_data = firestore_service.get_report(report_id)
+            report_data = await report_pipeline.run_read(firestore_service.get_report, report_id)
             
             if report_data:
                 # Convertir a modelo Pydantic
@@ -174,25 +1054,72 @@ async def get_report(report_id: str):
         raise HTTPException(status_code=500, detail=f"Error obteniendo reporte: {str(e)}")
 
 
-@app.get("/reports")
-async def list_reports():
+@app.post("/reports/{report_id}/derivatives")
+async def generate_report_derivatives(report_id: str):
     """
-    Lista todos los reportes disponibles.
-    Útil para debugging y demostración.
+    Genera las miniaturas/vistas previas que falten de un reporte existente.
+    Es idempotente: sirve para completar reportes anteriores (backfill).
     """
     try:
-        if firestore_service:
-            reports = firestore_service.list_reports()
-            return {
-                "total_reports": len(reports),
-                "reports": reports
-            }
-        
-        return {
-            "message": "Firestore no inicializado",
-            "total_reports": 0
-        }
+        if not derivative_service.specs:
+            raise HTTPException(status_code=400, detail="No hay tamaños de derivados configurados")
+        
+        async with report_pipeline.slot():
+            derivatives = await report_pipeline.run_derivatives(report_pipeline.backfill_derivatives, report_id)
+        if derivatives is None:
+            raise HTTPException(status_code=404, detail=f"Reporte '{report_id}' no encontrado")
+        
+        return {"report_id": report_id, "image_derivatives": derivatives}
     
+    except HTTPException:
+        raise
+    except AdmissionRejectedError as e:
+        return admission_rejected(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generando derivados: {str(e)}")
+
+
+@app.get("/reports", response_model=ReportPage)
+async def list_reports(
+    page_size: int = Query(20, ge=1, le=100, description="Reportes por página"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor por la página anterior"),
+    order_by: Literal["upload_date"] = Query("upload_date", description="Campo de orden"),
+    direction: Literal["desc", "asc"] = Query("desc", description="desc = más recientes primero"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por coma (ej: id,patient_name,upload_date,status)")
+):
+    """
+    Lista los reportes por páginas, ordenados por fecha de carga.
+    
+    Para la página siguiente se envía el next_cursor recibido. Con fields
+    solo se leen esos campos de Firestore (el listado del dashboard no
+    necesita el diagnóstico ni las URLs de imágenes).
+    """
+    try:
+        projection = None
+        if fields:
+            projection = [field.strip() for field in fields.split(",") if field.strip()]
+            unknown = sorted(set(projection) - set(VeterinaryReport.model_fields))
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(unknown)}")
+        
+        reports, next_cursor = await report_pipeline.run_read(
+            firestore_service.list_reports,
+            page_size,
+            cursor,
+            projection,
+            direction == "desc"
+        )
+        
+        if projection:
+            keep = set(projection) | {"id"}
+            reports = [{key: value for key, value in report.items() if key in keep} for report in reports]
+        
+        return ReportPage(reports=reports, next_cursor=next_cursor, page_size=page_size)
+    
+    except HTTPException:
+        raise
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listando reportes: {str(e)}")
 
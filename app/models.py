@@ -3,7 +3,7 @@ Modelos de datos de la aplicación.
 Define la estructura de los datos que entran y salen de la API.
 """
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -23,10 +23,19 @@ class VeterinaryReport(BaseModel):
     
     # Imágenes extraídas
     image_urls: List[str] = Field(default_factory=list, description="URLs de las imágenes en Cloud Storage")
+    image_derivatives: Dict[str, List[Optional[str]]] = Field(
+        default_factory=dict,
+        description="URLs de miniaturas/vistas previas por tamaño, en el mismo orden que image_urls"
+    )
     
     # Metadata
     pdf_filename: str = Field(..., description="Nombre original del PDF")
     upload_date: datetime = Field(default_factory=datetime.utcnow, description="Fecha de carga")
+    status: str = Field("processed", description="Estado del procesamiento (queued, processing, processed, failed)")
+    extraction_tier: Optional[str] = Field(
+        None,
+        description="Origen de los campos: text_layer (texto del PDF), document_ai, document_ai_batch o none"
+    )
     
     class Config:
         json_schema_extra = {
@@ -41,8 +50,16 @@ class VeterinaryReport(BaseModel):
                     "https://storage.googleapis.com/bucket/image1.png",
                     "https://storage.googleapis.com/bucket/image2.png"
                 ],
+                "image_derivatives": {
+                    "thumb": [
+                        "https://storage.googleapis.com/bucket/thumb/image1.webp",
+                        "https://storage.googleapis.com/bucket/thumb/image2.webp"
+                    ]
+                },
                 "pdf_filename": "reporte_ultrasonido_max.pdf",
-                "upload_date": "2026-02-04T10:30:00"
+                "upload_date": "2026-02-04T10:30:00",
+                "status": "processed",
+                "extraction_tier": "text_layer"
             }
         }
 
@@ -53,12 +70,174 @@ class UploadResponse(BaseModel):
     """
     report_id: str = Field(..., description="ID del reporte creado")
     message: str = Field(..., description="Mensaje de confirmación")
+    duplicate: bool = Field(False, description="True si el PDF ya se había procesado y se devuelve el reporte existente")
     
     class Config:
         json_schema_extra = {
             "example": {
                 "report_id": "abc123xyz",
-                "message": "Reporte procesado exitosamente"
+                "message": "Reporte procesado exitosamente",
+                "duplicate": False
+            }
+        }
+
+
+class JobResponse(BaseModel):
+    """
+    Respuesta del endpoint de upload en modo asíncrono (202 Accepted).
+    """
+    report_id: str = Field(..., description="ID del reporte (y del trabajo)")
+    status: str = Field(..., description="Estado inicial del trabajo")
+    message: str = Field(..., description="Mensaje de confirmación")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "report_id": "abc123xyz",
+                "status": "queued",
+                "message": "Reporte encolado para procesamiento"
+            }
+        }
+
+
+class JobStatus(BaseModel):
+    """
+    Estado de un trabajo de procesamiento asíncrono.
+    """
+    report_id: str = Field(..., description="ID del reporte")
+    status: str = Field(..., description="queued, processing, processed o failed")
+    progress: Dict[str, str] = Field(default_factory=dict, description="Estado de cada etapa del pipeline")
+    error: Optional[str] = Field(None, description="Mensaje de error si el trabajo falló")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "report_id": "abc123xyz",
+                "status": "processing",
+                "progress": {
+                    "extract_images": "done",
+                    "upload_images": "running",
+                    "document_ai": "pending",
+                    "save": "pending"
+                },
+                "error": None
+            }
+        }
+
+
+class BatchFileResult(BaseModel):
+    """
+    Resultado de un archivo dentro de una carga en lote.
+    """
+    filename: str = Field(..., description="Nombre del archivo (o ruta dentro del ZIP)")
+    status: str = Field(..., description="processed, duplicate o failed")
+    report_id: Optional[str] = Field(None, description="ID del reporte creado (o del existente si es duplicado)")
+    error: Optional[str] = Field(None, description="Motivo del fallo")
+
+
+class BatchResponse(BaseModel):
+    """
+    Estado de una carga en lote (POST /upload-reports/batch y GET /batches/{batch_id}).
+    """
+    batch_id: str = Field(..., description="ID del lote (guardado en cada reporte como batch_id)")
+    status: str = Field(..., description="queued, processing, completed o failed")
+    total: int = Field(..., description="PDFs recibidos")
+    processed: int = Field(0, description="Reportes creados")
+    duplicates: int = Field(0, description="PDFs que ya estaban procesados")
+    failed: int = Field(0, description="PDFs que no se pudieron procesar")
+    results: List[BatchFileResult] = Field(default_factory=list, description="Resultado de cada archivo, en orden (al terminar el lote)")
+    error: Optional[str] = Field(None, description="Motivo si el lote completo falló")
+    created_at: Optional[datetime] = Field(None, description="Momento en que se recibió el lote")
+    finished_at: Optional[datetime] = Field(None, description="Momento en que terminó el lote")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "batch_id": "b7e21c04",
+                "status": "completed",
+                "total": 3,
+                "processed": 1,
+                "duplicates": 1,
+                "failed": 1,
+                "results": [
+                    {"filename": "2024/max.pdf", "status": "processed", "report_id": "abc123xyz", "error": None},
+                    {"filename": "2024/luna.pdf", "status": "duplicate", "report_id": "62b7d119", "error": None},
+                    {"filename": "2024/roto.pdf", "status": "failed", "report_id": None, "error": "El archivo no es un PDF válido"}
+                ],
+                "error": None,
+                "created_at": "2026-09-14T10:30:00",
+                "finished_at": "2026-09-14T10:34:12"
+            }
+        }
+
+
+class UploadSessionCreate(BaseModel):
+    """
+    Pedido para iniciar una subida reanudable (POST /uploads).
+    """
+    filename: str = Field(..., description="Nombre original del PDF")
+    size: int = Field(..., gt=0, description="Tamaño total del PDF en bytes")
+    sha256: Optional[str] = Field(None, description="SHA-256 del PDF completo (se verifica al finalizar)")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "filename": "reporte_max.pdf",
+                "size": 41943040,
+                "sha256": "a095c73e725a9c0d7b1f0c4d3e2a1b0c9d8e7f6a5b4c3d2e1f0a9b8c7d6e5f4a"
+            }
+        }
+
+
+class UploadSessionStatus(BaseModel):
+    """
+    Estado de una subida reanudable: cuántos bytes ya se guardaron.
+    """
+    upload_id: str = Field(..., description="ID de la sesión de subida")
+    filename: str = Field(..., description="Nombre original del PDF")
+    size: int = Field(..., description="Tamaño total del PDF en bytes")
+    offset: int = Field(..., description="Bytes confirmados: el próximo bloque empieza aquí")
+    chunk_size: int = Field(..., description="Tamaño máximo de cada bloque (PUT) en bytes")
+    expires_at: datetime = Field(..., description="Momento en que la sesión se descarta si no se finalizó")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "upload_id": "3f9c2a7be1d04c5f",
+                "filename": "reporte_max.pdf",
+                "size": 41943040,
+                "offset": 16777216,
+                "chunk_size": 8388608,
+                "expires_at": "2026-02-05T10:30:00"
+            }
+        }
+
+
+class ReportPage(BaseModel):
+    """
+    Página del listado de reportes (paginación por cursor).
+    """
+    reports: List[Dict] = Field(default_factory=list, description="Reportes de esta página (solo los campos pedidos)")
+    next_cursor: Optional[str] = Field(None, description="Cursor para pedir la página siguiente, o null si no hay más")
+    page_size: int = Field(..., description="Tamaño de página usado")
+    truncated: bool = Field(
+        False,
+        description="Solo en /reports/search: se alcanzó el máximo de reportes leídos y la página puede venir incompleta (seguir con next_cursor)"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "reports": [
+                    {
+                        "id": "abc123xyz",
+                        "patient_name": "Max",
+                        "upload_date": "2026-02-04T10:30:00",
+                        "status": "processed"
+                    }
+                ],
+                "next_cursor": "eyJkIjoiMjAyNi0wMi0wNFQxMDozMDowMCIsImlkIjoiYWJjMTIzeHl6In0",
+                "page_size": 20
             }
         }
 
@@ -0,0 +1,136 @@
+"""
+Control de admisión (backpressure).
+
+Cada presupuesto (procesamiento de uploads, lecturas) limita cuántas
+peticiones se ejecutan a la vez y cuántas esperan turno. Con la cola
+llena, o si la espera supera el timeout, la petición se rechaza enseguida
+(429 con Retry-After) en vez de sumarse a la carga y hacer más lento todo.
+
+El cupo de uploads lo ocupa cada ejecución del pipeline
+(ReportPipeline.run), venga de una petición, de un worker del modo
+asíncrono o de un lote; el trabajo en segundo plano espera su turno en
+vez de ser rechazado.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from app.services import metrics
+
+
+class AdmissionRejectedError(Exception):
+    """No hay lugar para ejecutar ni para esperar."""
+
+    def __init__(self, budget: str, reason: str, retry_after: int):
+        super().__init__(f"Servicio saturado ({budget}): reintentar en {retry_after} s")
+        self.budget = budget
+        self.reason = reason  # queue_full | timeout
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Cupo de ejecuciones concurrentes con una cola de espera acotada.
+
+    Las esperas se atienden en orden de llegada (asyncio.Semaphore es
+    FIFO). Retry-After se estima con la duración promedio reciente de las
+    ejecuciones y la cantidad de peticiones por delante.
+    """
+
+    # Peso de cada ejecución en el promedio móvil de duración
+    DURATION_SMOOTHING = 0.2
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        """
+        Args:
+            name: Nombre del presupuesto (etiqueta de las métricas)
+            max_concurrent: Ejecuciones a la vez
+            max_queue: Peticiones esperando turno como máximo (0 = rechazar si no hay lugar)
+            queue_timeout: Segundos de espera en la cola antes de rechazar
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._avg_seconds: Optional[float] = None
+
+        metrics.ADMISSION_IN_FLIGHT.labels(name).set_function(lambda: self.in_flight)
+        metrics.ADMISSION_QUEUED.labels(name).set_function(lambda: self.waiting)
+        metrics.ADMISSION_LIMIT.labels(name).set(max_concurrent)
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos antes de reintentar (al menos 1)."""
+        average = self._avg_seconds if self._avg_seconds is not None else 1.0
+        ahead = self.waiting + 1
+        return max(1, math.ceil(average * ahead / self.max_concurrent))
+
+    def _reject(self, reason: str):
+        metrics.ADMISSION_REJECTED.labels(self.name, reason).inc()
+        raise AdmissionRejectedError(self.name, reason, self.retry_after())
+
+    def check(self):
+        """
+        Rechaza enseguida si no hay lugar ni en la cola, sin ocupar uno
+        (ej: antes de leer el cuerpo de un upload).
+
+        Raises:
+            AdmissionRejectedError: Si la cola está llena
+        """
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self._reject("queue_full")
+
+    @asynccontextmanager
+    async def admit(self, wait: bool = False):
+        """
+        Ocupa un lugar durante el bloque.
+
+        Args:
+            wait: True = esperar turno sin límite de cola ni de tiempo
+                  (trabajos en segundo plano, que no tienen a quién devolver un 429)
+
+        Raises:
+            AdmissionRejectedError: Si la cola está llena o la espera supera
+                queue_timeout (solo con wait=False)
+        """
+        if self._semaphore.locked():
+            if not wait and self.waiting >= self.max_queue:
+                self._reject("queue_full")
+            self.waiting += 1
+            try:
+                if wait:
+                    await self._semaphore.acquire()
+                else:
+                    await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("timeout")
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+            elapsed = time.perf_counter() - start
+            if self._avg_seconds is None:
+                self._avg_seconds = elapsed
+            else:
+                self._avg_seconds += self.DURATION_SMOOTHING * (elapsed - self._avg_seconds)
+
+    def stats(self) -> Dict:
+        """Ocupación actual (para decisiones de autoescalado)."""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue
+        }
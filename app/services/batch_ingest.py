@@ -0,0 +1,568 @@
+"""
+Ingesta de PDFs en lote (varios archivos o un ZIP).
+Pensada para cargar el histórico de una clínica de una sola vez.
+"""
+import asyncio
+import os
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Set, Tuple
+
+from app.services.upload_ingest import PDFUpload, pdf_upload_from_bytes
+
+
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+@dataclass
+class BatchItem:
+    """Un PDF del lote. load es bloqueante y devuelve sus bytes."""
+    filename: str
+    load: Callable[[], bytes]
+
+
+@dataclass
+class BatchFileOutcome:
+    """Resultado de un archivo del lote: processed, duplicate o failed."""
+    filename: str
+    status: str
+    report_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchSource:
+    """Archivo recibido en un lote (un PDF o un ZIP), ya copiado a Cloud Storage."""
+    filename: str
+    blob_name: str
+
+
+# Avance de un lote: recibe los resultados hasta el momento (None = pendiente)
+ProgressCallback = Callable[[List[Optional[BatchFileOutcome]]], Awaitable[None]]
+
+
+def summarize(outcomes: List[Optional[BatchFileOutcome]]) -> Dict[str, int]:
+    """Cantidad de archivos procesados, duplicados y fallidos (los pendientes no cuentan)."""
+    statuses = [outcome.status for outcome in outcomes if outcome is not None]
+    return {
+        "processed": statuses.count("processed"),
+        "duplicates": statuses.count("duplicate"),
+        "failed": statuses.count("failed")
+    }
+
+
+def is_zip(filename: str, head: bytes) -> bool:
+    """True si el archivo es un ZIP (por la firma, o por la extensión si no hay bytes)."""
+    if head:
+        return head.startswith(ZIP_MAGIC)
+    return filename.lower().endswith(".zip")
+
+
+def file_items(filename: str, fileobj: BinaryIO, max_bytes: int) -> List[BatchItem]:
+    """
+    Arma los elementos del lote a partir de un archivo subido.
+
+    Si es un ZIP se devuelve un elemento por cada PDF que contiene
+    (se ignoran carpetas, archivos ocultos y los metadatos de macOS).
+    Los contenidos se leen recién al procesar cada elemento.
+
+    Args:
+        filename: Nombre del archivo subido
+        fileobj: Archivo (con seek), ej: UploadFile.file
+        max_bytes: Tamaño máximo de cada PDF
+
+    Returns:
+        Lista de BatchItem
+
+    Raises:
+        zipfile.BadZipFile: Si parece un ZIP pero está dañado
+    """
+    head = fileobj.read(len(ZIP_MAGIC))
+    fileobj.seek(0)
+
+    def read_limited(stream: BinaryIO) -> bytes:
+        # Un byte de más basta para detectar que se pasó del máximo
+        return stream.read(max_bytes + 1)
+
+    if not is_zip(filename, head):
+        def load():
+            fileobj.seek(0)  # en modo OCR en lote se lee dos veces
+            return read_limited(fileobj)
+
+        return [BatchItem(filename, load)]
+
+    archive = zipfile.ZipFile(fileobj)
+    items = []
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/") or os.path.basename(name).startswith("."):
+            continue
+        if not name.lower().endswith(".pdf"):
+            continue
+
+        def load(info=info):
+            with archive.open(info) as member:
+                return read_limited(member)
+
+        items.append(BatchItem(name, load))
+    return items
+
+
+class _BatchRun:
+    """Estado de un lote en curso: resultados, huellas vistas y reportes por escribir."""
+
+    def __init__(
+        self,
+        ingestor: "BatchIngestor",
+        batch_id: str,
+        items: List[BatchItem],
+        max_bytes: int,
+        on_progress: Optional[ProgressCallback] = None
+    ):
+        self.ingestor = ingestor
+        self.batch_id = batch_id
+        self.items = items
+        self.max_bytes = max_bytes
+        self.on_progress = on_progress
+        self.outcomes: List[Optional[BatchFileOutcome]] = [None] * len(items)
+        # huella → ID del reporte ya guardado (None = el primero todavía no se guardó)
+        self.seen: Dict[str, Optional[str]] = {}
+        self.owners: Dict[int, str] = {}  # índice → huella que reservó
+        self.waiting: List[Tuple[int, str]] = []  # repetidos de un PDF todavía sin guardar
+        self.pending: List[Tuple[int, Dict]] = []
+        self.flush_lock = asyncio.Lock()
+
+    async def prepare(self, index: int) -> Optional[Tuple[str, PDFUpload]]:
+        """
+        Lee, valida y deduplica un elemento.
+
+        Un repetido de un PDF que todavía no se guardó no se procesa: queda
+        en espera hasta el final de la ronda (ver settle_waiting).
+
+        Returns:
+            (ID del nuevo reporte, PDF) o None si no hay que procesarlo
+            (duplicado, en espera o inválido; su resultado ya quedó registrado)
+        """
+        item = self.items[index]
+        pipeline = self.ingestor.pipeline
+        report_id = str(uuid.uuid4())[:8]
+        try:
+            content = await pipeline.run_blocking(item.load)
+            upload = pdf_upload_from_bytes(content, self.max_bytes)
+        except Exception as e:
+            self.fail(index, e)
+            return None
+
+        if upload.sha256 in self.seen:
+            # Repetido dentro del lote
+            existing_id = self.seen[upload.sha256]
+            if existing_id is None:
+                self.waiting.append((index, upload.sha256))
+                return None
+        else:
+            # Reservar antes de consultar: los repetidos no consultan de nuevo
+            self.seen[upload.sha256] = None
+            self.owners[index] = upload.sha256
+            try:
+                existing_id = await pipeline.run_blocking(
+                    self.ingestor.firestore_service.find_report_by_fingerprint, upload.sha256
+                )
+            except Exception as e:
+                self.fail(index, e)
+                return None
+            if existing_id:
+                self.seen[upload.sha256] = existing_id
+                del self.owners[index]
+        if existing_id:
+            self.outcomes[index] = BatchFileOutcome(item.filename, "duplicate", report_id=existing_id)
+            return None
+        return report_id, upload
+
+    def settle_waiting(self) -> List[int]:
+        """
+        Resuelve los repetidos en espera, después del flush final de una ronda.
+
+        Returns:
+            Índices a procesar en otra ronda (el primero de su huella falló)
+        """
+        retry = []
+        for index, sha256 in self.waiting:
+            report_id = self.seen.get(sha256)
+            if report_id:
+                self.outcomes[index] = BatchFileOutcome(self.items[index].filename, "duplicate", report_id=report_id)
+            else:
+                retry.append(index)
+        self.waiting.clear()
+        return retry
+
+    async def build(
+        self,
+        index: int,
+        report_id: str,
+        upload: PDFUpload,
+        extracted_fields: Optional[Dict[str, Optional[str]]] = None
+    ):
+        """Ejecuta el pipeline (sin guardar) y deja el reporte pendiente de escritura."""
+        try:
+            report_data = await self.ingestor.pipeline.run(
+                report_id, upload.content, os.path.basename(self.items[index].filename),
+                content_sha256=upload.sha256, persist=False, extracted_fields=extracted_fields,
+                wait_for_slot=True
+            )
+        except Exception as e:
+            self.fail(index, e)
+            return
+
+        report_data.pop("image_count", None)
+        report_data["batch_id"] = self.batch_id
+        self.pending.append((index, report_data))
+        if len(self.pending) >= self.ingestor.write_batch_size:
+            await self.flush()
+
+    def fail(self, index: int, error: Exception):
+        """Registra un archivo fallido (y libera su huella para otro intento)."""
+        item = self.items[index]
+        sha256 = self.owners.pop(index, None)
+        if sha256:
+            self.seen.pop(sha256, None)
+        print(f"⚠️  {item.filename}: {error}")
+        self.outcomes[index] = BatchFileOutcome(item.filename, "failed", error=str(error))
+
+    async def flush(self):
+        """Guarda los reportes pendientes con una escritura en lote."""
+        async with self.flush_lock:
+            chunk = self.pending[:]
+            self.pending.clear()
+            if not chunk:
+                return
+            try:
+                await self.ingestor.pipeline.run_blocking(
+                    self.ingestor.firestore_service.save_reports_bulk, [report for _, report in chunk]
+                )
+            except Exception as e:
+                print(f"❌ Error guardando lote {self.batch_id}: {e}")
+                for index, _ in chunk:
+                    self.fail(index, e)
+                return
+            for index, report in chunk:
+                sha256 = self.owners.pop(index, None)
+                if sha256:
+                    self.seen[sha256] = report["id"]
+                self.outcomes[index] = BatchFileOutcome(self.items[index].filename, "processed", report_id=report["id"])
+            if self.on_progress:
+                await self.on_progress(self.outcomes)
+
+
+class BatchIngestor:
+    """
+    Procesa muchos PDFs con el mismo ReportPipeline que /upload-report.
+
+    - Como máximo `concurrency` PDFs a la vez (y en memoria), y cada uno
+      espera su turno en el cupo de uploads del pipeline
+    - Los reportes no se escriben uno por uno: se acumulan y se guardan
+      con FirestoreService.save_reports_bulk cada `write_batch_size`
+    - Un archivo que falla no detiene el lote: queda como "failed"
+    - Los duplicados (ya procesados o repetidos dentro del lote) no se
+      procesan de nuevo
+
+    Con ocr_mode="batch" los PDFs se copian a Cloud Storage y Document AI
+    los procesa todos juntos en operaciones en lote
+    (PDFProcessor.start/poll/collect_document_ai_batch); luego cada PDF
+    sigue por el pipeline con esos campos. Los PDFs que Document AI no
+    pudo procesar siguen sin campos y el pipeline los extrae como en el
+    modo en línea.
+
+    Las miniaturas no se generan en el lote; se completan después con
+    POST /reports/{id}/derivatives.
+
+    POST /upload-reports/batch no espera al lote: copia los archivos a
+    Cloud Storage (stage), guarda el registro del lote y lo procesa en
+    segundo plano (submit). El avance queda en Firestore
+    (FirestoreService.update_batch) para GET /batches/{batch_id}.
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        firestore_service,
+        concurrency: int = 4,
+        write_batch_size: int = 200,
+        batch_transport=None
+    ):
+        """
+        Args:
+            pipeline: Instancia de ReportPipeline
+            firestore_service: Instancia de FirestoreService
+            concurrency: PDFs procesados a la vez
+            write_batch_size: Reportes acumulados antes de escribir en Firestore
+            batch_transport: BatchTransport para ocr_mode="batch" (None = API de Google)
+        """
+        self.pipeline = pipeline
+        self.firestore_service = firestore_service
+        self.concurrency = concurrency
+        self.write_batch_size = write_batch_size
+        self.batch_transport = batch_transport
+        self._tasks: Set[asyncio.Task] = set()
+
+    def input_prefix(self, batch_id: str) -> str:
+        """Carpeta del bucket con los archivos recibidos de un lote."""
+        return f"{self.pipeline.settings.batch_input_prefix.strip('/')}/{batch_id}/"
+
+    async def stage(self, batch_id: str, files: List[Tuple[str, BinaryIO]]) -> List[BatchSource]:
+        """
+        Copia los archivos recibidos (PDFs o ZIPs, tal cual) a Cloud Storage
+        para procesarlos después de responder.
+
+        Args:
+            batch_id: ID del lote
+            files: (nombre, archivo con seek) por archivo recibido
+
+        Returns:
+            Un BatchSource por archivo, en el mismo orden
+        """
+        storage_service = self.pipeline.storage_service
+        prefix = self.input_prefix(batch_id)
+        sources = []
+        for index, (filename, fileobj) in enumerate(files):
+            blob_name = f"{prefix}{index:04d}-{os.path.basename(filename)}"
+            await self.pipeline.run_blocking(storage_service.upload_file, fileobj, blob_name)
+            sources.append(BatchSource(filename, blob_name))
+        return sources
+
+    async def discard_inputs(self, batch_id: str):
+        """Borra los archivos recibidos de un lote (al terminarlo o si no se pudo encolar)."""
+        storage_service = self.pipeline.storage_service
+        prefix = self.input_prefix(batch_id)
+        try:
+            blob_names = await self.pipeline.run_blocking(storage_service.list_blob_names, prefix)
+            await self.pipeline.run_blocking(storage_service.delete_images, blob_names)
+        except Exception as e:
+            print(f"⚠️  No se pudieron borrar los archivos de {prefix}: {e}")
+
+    def submit(self, batch_id: str, sources: List[BatchSource], max_bytes: int, ocr_mode: str = "online"):
+        """
+        Procesa en segundo plano un lote ya copiado con stage (sin esperarlo).
+
+        Args:
+            batch_id: ID del lote (su registro ya debe estar guardado)
+            sources: Archivos del lote en Cloud Storage
+            max_bytes: Tamaño máximo de cada PDF
+            ocr_mode: "online" o "batch"
+        """
+        task = asyncio.ensure_future(self._run_staged(batch_id, sources, max_bytes, ocr_mode))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        """Cancela los lotes en curso (quedan como failed)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_staged(self, batch_id: str, sources: List[BatchSource], max_bytes: int, ocr_mode: str):
+        """Procesa un lote copiado a Cloud Storage y guarda su avance y su resultado."""
+        storage_service = self.pipeline.storage_service
+        firestore_service = self.firestore_service
+        opened: List[BinaryIO] = []
+
+        async def update(updates: Dict):
+            await self.pipeline.run_blocking(firestore_service.update_batch, batch_id, updates)
+
+        async def on_progress(outcomes: List[Optional[BatchFileOutcome]]):
+            await update(summarize(outcomes))
+
+        try:
+            await update({"status": "processing"})
+            items = []
+            for source in sources:
+                # Los ZIP se leen por partes desde el bucket, sin descargarlos enteros
+                fileobj = await self.pipeline.run_blocking(storage_service.open_blob, source.blob_name)
+                opened.append(fileobj)
+                items.extend(await self.pipeline.run_blocking(file_items, source.filename, fileobj, max_bytes))
+
+            outcomes = await self.ingest(batch_id, items, max_bytes, ocr_mode=ocr_mode, on_progress=on_progress)
+            await update({
+                "status": "completed",
+                **summarize(outcomes),
+                "results": [outcome.__dict__ for outcome in outcomes],
+                "finished_at": datetime.utcnow()
+            })
+        except asyncio.CancelledError:
+            await update({
+                "status": "failed",
+                "error": "La instancia se detuvo antes de terminar el lote; volver a enviar los archivos",
+                "finished_at": datetime.utcnow()
+            })
+            raise
+        except Exception as e:
+            print(f"❌ Error procesando lote {batch_id}: {e}")
+            await update({"status": "failed", "error": str(e), "finished_at": datetime.utcnow()})
+        finally:
+            for fileobj in opened:
+                fileobj.close()
+            await self.discard_inputs(batch_id)
+
+    async def ingest(
+        self,
+        batch_id: str,
+        items: List[BatchItem],
+        max_bytes: int,
+        ocr_mode: str = "online",
+        on_progress: Optional[ProgressCallback] = None
+    ) -> List[BatchFileOutcome]:
+        """
+        Procesa todos los elementos del lote.
+
+        Args:
+            batch_id: ID del lote (se guarda en cada reporte como batch_id)
+            items: PDFs a procesar
+            max_bytes: Tamaño máximo de cada PDF
+            ocr_mode: "online" (una llamada a Document AI por PDF) o "batch"
+            on_progress: Callback opcional que recibe los resultados hasta el
+                         momento después de cada escritura en Firestore
+
+        Returns:
+            Un BatchFileOutcome por elemento, en el mismo orden
+        """
+        run = _BatchRun(self, batch_id, items, max_bytes, on_progress)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process(index: int):
+            async with semaphore:
+                prepared = await run.prepare(index)
+                if prepared:
+                    await run.build(index, *prepared)
+
+        # Los repetidos de un PDF cuyo primer ejemplar falló se procesan en
+        # otra ronda; cada ronda guarda o descarta al menos uno por huella
+        indexes = list(range(len(items)))
+        while indexes:
+            if ocr_mode == "batch":
+                await self._ingest_with_batch_ocr(run, semaphore, indexes)
+            else:
+                await asyncio.gather(*(process(index) for index in indexes))
+            await run.flush()
+            indexes = run.settle_waiting()
+
+        processed = sum(1 for outcome in run.outcomes if outcome.status == "processed")
+        print(f"📦 Lote {batch_id}: {processed}/{len(items)} reportes procesados")
+        return run.outcomes
+
+    async def _ingest_with_batch_ocr(self, run: _BatchRun, semaphore: asyncio.Semaphore, indexes: List[int]):
+        """
+        Modo OCR en lote (para los elementos `indexes`):
+        1. Valida, deduplica y copia cada PDF a Cloud Storage
+        2. Una sola tanda de operaciones de Document AI para todos
+        3. Cada PDF sigue por el pipeline con sus campos ya extraídos
+        4. Borra las copias y la salida de Document AI
+        """
+        storage_service = self.pipeline.storage_service
+        settings = self.pipeline.settings
+        prefix = f"{settings.documentai_batch_prefix.strip('/')}/{run.batch_id}"
+        staged: Dict[int, Tuple[str, str]] = {}  # índice → (report_id, URI)
+
+        async def stage(index: int):
+            async with semaphore:
+                prepared = await run.prepare(index)
+                if not prepared:
+                    return
+                report_id, upload = prepared
+                blob_name = f"{prefix}/input/{report_id}.pdf"
+                try:
+                    await self.pipeline.run_blocking(
+                        storage_service.upload_bytes, upload.content, blob_name, "application/pdf"
+                    )
+                except Exception as e:
+                    run.fail(index, e)
+                    return
+                staged[index] = (report_id, storage_service.gcs_uri(blob_name))
+
+        await asyncio.gather(*(stage(index) for index in indexes))
+        if not staged:
+            return
+
+        uris = [uri for _, uri in staged.values()]
+        try:
+            fields, errors = await self._document_ai_batch(uris, storage_service.gcs_uri(f"{prefix}/output"))
+        except Exception as e:
+            print(f"❌ Error en Document AI en lote: {e}")
+            fields, errors = {}, {uri: str(e) for uri in uris}
+
+        async def build(index: int, report_id: str, uri: str):
+            async with semaphore:
+                if uri in errors:
+                    # Sin campos del lote el pipeline los extrae como en el
+                    # modo en línea (capa de texto si Document AI falla)
+                    print(f"⚠️  Document AI en lote falló para {run.items[index].filename}: {errors[uri]}")
+                try:
+                    content = await self.pipeline.run_blocking(run.items[index].load)
+                    upload = pdf_upload_from_bytes(content, run.max_bytes)
+                except Exception as e:
+                    run.fail(index, e)
+                    return
+                await run.build(index, report_id, upload, fields.get(uri))
+
+        await asyncio.gather(*(build(index, report_id, uri) for index, (report_id, uri) in staged.items()))
+
+        try:
+            blob_names = await self.pipeline.run_blocking(storage_service.list_blob_names, f"{prefix}/")
+            await self.pipeline.run_blocking(storage_service.delete_images, blob_names)
+        except Exception as e:
+            print(f"⚠️  No se pudieron borrar los archivos temporales de {prefix}: {e}")
+
+    async def _document_ai_batch(
+        self,
+        uris: List[str],
+        output_uri: str
+    ) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+        """
+        Lanza las operaciones en lote de Document AI y espera a que terminen.
+
+        Las consultas se espacian con espera creciente (poll_initial, ×2,
+        hasta poll_max) usando asyncio.sleep: la espera, que puede durar
+        hasta documentai_batch_timeout, no ocupa un hilo del executor del
+        pipeline; solo las llamadas a la API pasan por run_blocking.
+
+        Args:
+            uris: PDFs ya copiados a Cloud Storage
+            output_uri: Carpeta de salida de Document AI
+
+        Returns:
+            (campos por URI, error por URI de los PDFs que fallaron)
+
+        Raises:
+            TimeoutError: Si las operaciones no terminan dentro de documentai_batch_timeout
+        """
+        settings = self.pipeline.settings
+        pdf_processor = self.pipeline.pdf_processor
+        transport = await self.pipeline.run_blocking(
+            pdf_processor.document_ai_batch_transport,
+            settings.gcp_project_id, settings.gcp_location, self.batch_transport
+        )
+        operations = await self.pipeline.run_blocking(
+            pdf_processor.start_document_ai_batch,
+            uris, settings.gcp_project_id, settings.gcp_location, settings.gcp_processor_id,
+            output_uri, transport, settings.documentai_batch_max_documents
+        )
+
+        statuses = []
+        deadline = time.monotonic() + settings.documentai_batch_timeout
+        delay = settings.documentai_batch_poll_initial
+        while operations:
+            if time.monotonic() + delay > deadline:
+                raise TimeoutError(
+                    f"Las operaciones de Document AI no terminaron en {settings.documentai_batch_timeout:.0f}s"
+                )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.documentai_batch_poll_max)
+            operations, finished = await self.pipeline.run_blocking(
+                pdf_processor.poll_document_ai_batch, operations, transport
+            )
+            statuses.extend(finished)
+
+        return await self.pipeline.run_blocking(
+            pdf_processor.collect_document_ai_batch, uris, statuses, transport
+        )
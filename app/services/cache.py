@@ -0,0 +1,340 @@
+"""
+Caché en memoria del proceso y caché compartida entre instancias.
+Evitan consultas repetidas a Firestore (huellas de PDFs y reportes).
+
+Todas las cachés implementan la misma interfaz (CacheBackend), así el
+servicio que las usa no sabe si la caché vive en el proceso o en Redis.
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class CacheBackend:
+    """
+    Interfaz común de las cachés.
+
+    get/set/delete más contadores de aciertos, fallos, descartes y errores
+    del almacén.
+
+    Para leer de la fuente y guardar sin pisar una invalidación (read-through):
+    tomar generation(key) antes de leer la fuente y pasarla a set. Si la
+    clave se borró (delete) entre medio, el valor leído puede ser viejo y
+    set no lo guarda.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor guardado o None si no está (o venció)."""
+        raise NotImplementedError
+
+    def generation(self, key: Hashable) -> Any:
+        """Versión actual de una clave (cambia con cada delete), para set."""
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, generation: Any = None):
+        """
+        Guarda un valor.
+
+        Args:
+            key: Clave
+            value: Valor
+            ttl: Segundos que vive (None = el TTL por defecto de la caché)
+            generation: Resultado de generation(key) antes de leer el valor;
+                        si la clave se invalidó desde entonces no se guarda
+                        (None = guardar siempre)
+        """
+        raise NotImplementedError
+
+    def delete(self, key: Hashable):
+        """Elimina un valor si existe."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de uso de la caché."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+        }
+
+
+class LRUCache(CacheBackend):
+    """
+    Caché LRU (Least Recently Used) con tamaño máximo y TTL opcional.
+
+    Cuando se llena, descarta el elemento usado hace más tiempo.
+    Los elementos vencidos se descartan al leerlos.
+    Es thread-safe: lo usan los hilos del executor del pipeline.
+    """
+
+    def __init__(self, max_size: int = 1024, default_ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: Número máximo de elementos guardados
+            default_ttl: Segundos que vive cada elemento (None = sin vencimiento)
+        """
+        super().__init__()
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        # clave → (valor, momento de vencimiento o None)
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        # Invalidaciones: número de la última de cada clave (solo las
+        # max_size más recientes; de las olvidadas se recuerda la mayor)
+        self._invalidations = 0
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor (y lo marca como usado) o None si no está."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self, key: Hashable) -> int:
+        """Cantidad de invalidaciones hasta ahora (alcanza como versión de cualquier clave)."""
+        with self._lock:
+            return self._invalidations
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None):
+        """Guarda un valor, descartando el más antiguo si se supera el máximo."""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            # Si no se sabe cuándo se invalidó la clave, se asume lo peor
+            if generation is not None and self._invalidated.get(key, self._forgotten) > generation:
+                return
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """Elimina un valor si existe (y anula los set con una generación anterior)."""
+        with self._lock:
+            self._data.pop(key, None)
+            self._invalidations += 1
+            self._invalidated[key] = self._invalidations
+            self._invalidated.move_to_end(key)
+            if len(self._invalidated) > self.max_size:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        stats = super().stats()
+        stats["size"] = len(self)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _encode_value(value: Any) -> Any:
+    """json.dumps: guarda las fechas con una marca para recuperarlas como datetime."""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    raise TypeError(f"No se puede guardar en la caché: {type(value).__name__}")
+
+
+def _decode_value(obj: Dict) -> Any:
+    """json.loads: inverso de _encode_value."""
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__bytes__" in obj and len(obj) == 1:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def serialize(value: Any) -> bytes:
+    """Serializa un valor (dicts de Firestore) para una caché compartida."""
+    return json.dumps(value, default=_encode_value, separators=(",", ":")).encode()
+
+
+def deserialize(data: bytes) -> Any:
+    """Inverso de serialize."""
+    return json.loads(data, object_hook=_decode_value)
+
+
+class SharedCache(CacheBackend):
+    """
+    Caché compartida entre instancias, sobre un almacén clave-valor con TTL.
+
+    El almacén necesita get(clave), set(clave, bytes, px=ms),
+    delete(clave), mget, incr y pexpire: la interfaz de redis.Redis.
+    Los valores se guardan serializados en JSON (no pickle: el almacén es
+    compartido).
+    El almacén aplica su propia política de descarte, por eso
+    evictions se queda en 0.
+
+    Si el almacén falla (Redis caído o lento) la caché no falla: get
+    responde como un fallo de caché (se lee de Firestore), set y delete no
+    hacen nada, y el error se cuenta en errors. Un delete perdido deja el
+    valor anterior hasta que vence su TTL.
+
+    Versiones entre instancias: cada clave tiene un contador
+    ({prefix}gen:{clave}) que delete incrementa antes de borrar el valor.
+    El valor se guarda junto con la generación leída antes de ir a la
+    fuente, y get lo descarta si el contador cambió: así un set que llega
+    después de un delete (lectura vieja) nunca se sirve. El contador vive
+    el doble del TTL por defecto (más que cualquier valor guardado).
+    """
+
+    def __init__(self, store, default_ttl: Optional[float] = None, prefix: str = "diagnovet:"):
+        """
+        Args:
+            store: Cliente del almacén (ej: redis.Redis o InMemoryStore)
+            default_ttl: Segundos que vive cada elemento (None = sin vencimiento)
+            prefix: Prefijo de las claves (para compartir el almacén con otros datos)
+        """
+        super().__init__()
+        self.store = store
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def _generation_key(self, key: Hashable) -> str:
+        return f"{self.prefix}gen:{key}"
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        try:
+            data, current = self.store.mget([f"{self.prefix}{key}", self._generation_key(key)])
+            entry = deserialize(data) if data is not None else None
+        except Exception as e:
+            self._store_error("get", e)
+            return None
+        if not isinstance(entry, list) or len(entry) != 2:
+            # Vacío (o guardado por una versión anterior, sin generación)
+            self.misses += 1
+            return None
+        generation, value = entry
+        if generation is not None and generation != int(current or 0):
+            # Guardado con una lectura anterior a la última invalidación
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def generation(self, key: Hashable) -> int:
+        try:
+            return int(self.store.get(self._generation_key(key)) or 0)
+        except Exception as e:
+            self._store_error("generation", e)
+            return -1  # no coincide con ninguna: lo que se guarde no se sirve
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        px = max(1, int(ttl * 1000)) if ttl is not None else None
+        try:
+            self.store.set(f"{self.prefix}{key}", serialize([generation, value]), px=px)
+        except Exception as e:
+            self._store_error("set", e)
+
+    def delete(self, key: Hashable):
+        generation_key = self._generation_key(key)
+        try:
+            self.store.incr(generation_key)
+            if self.default_ttl is not None:
+                self.store.pexpire(generation_key, max(1, int(self.default_ttl * 2000)))
+            self.store.delete(f"{self.prefix}{key}")
+        except Exception as e:
+            self._store_error("delete", e)
+
+    def _store_error(self, operation: str, error: Exception):
+        """Cuenta y registra un error del almacén (la operación se omite)."""
+        self.errors += 1
+        print(f"⚠️  Caché compartida no disponible ({operation}): {error}")
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 0.25, **kwargs) -> "SharedCache":
+        """
+        Crea la caché sobre Redis (requiere el paquete opcional redis).
+
+        Args:
+            url: URL de Redis (ej: redis://10.0.0.3:6379/0)
+            timeout: Segundos máximos para conectar y para cada operación;
+                     pasado ese tiempo se lee de Firestore
+
+        Returns:
+            SharedCache
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("Para REPORT_CACHE_URL hace falta instalar el paquete 'redis'") from e
+        client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        return cls(client, **kwargs)
+
+
+class InMemoryStore:
+    """
+    Almacén clave-valor en memoria con la interfaz de redis.Redis que usa
+    SharedCache. Sirve para probar la caché compartida sin un servidor.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, px: Optional[int] = None):
+        expires_at = time.monotonic() + px / 1000 if px is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        return [self.get(key) for key in keys]
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value, expires_at = self._data.get(key, (b"0", None))
+            if expires_at is not None and expires_at <= time.monotonic():
+                value, expires_at = b"0", None
+            value = str(int(value) + 1).encode()
+            self._data[key] = (value, expires_at)
+            return int(value)
+
+    def pexpire(self, key: str, px: int):
+        with self._lock:
+            if key in self._data:
+                self._data[key] = (self._data[key][0], time.monotonic() + px / 1000)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
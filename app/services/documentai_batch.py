@@ -0,0 +1,243 @@
+"""
+Procesamiento en lote (asíncrono) de Document AI.
+Agrupa muchos PDFs guardados en Cloud Storage en una sola operación
+batch_process_documents en vez de una llamada process_document por PDF.
+
+El acceso a Google pasa por un "transporte" intercambiable:
+GoogleBatchTransport habla con la API real y LocalBatchTransport emula
+la operación y el formato de salida en memoria (pruebas locales).
+"""
+import itertools
+import json
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.pdf_processor import ParsedPDF
+
+
+@dataclass
+class BatchDocumentStatus:
+    """Resultado de un documento dentro de una operación en lote."""
+    input_uri: str
+    output_uri: Optional[str] = None
+    error: Optional[str] = None
+
+
+def split_gcs_uri(uri: str) -> Tuple[str, str]:
+    """
+    Separa una URI gs://bucket/ruta en (bucket, ruta).
+
+    Args:
+        uri: URI de Cloud Storage
+
+    Returns:
+        (nombre del bucket, prefijo/nombre del blob)
+    """
+    if not uri.startswith("gs://"):
+        raise ValueError(f"URI de Cloud Storage inválida: {uri}")
+    bucket, _, path = uri[len("gs://"):].partition("/")
+    return bucket, path
+
+
+def stitch_shards(shards: List[Dict]) -> str:
+    """
+    Une el texto de los fragmentos (shards) de salida de un documento.
+
+    Document AI divide la salida de los PDFs grandes en varios JSON; cada
+    uno trae el texto de sus páginas y shardInfo.shardIndex.
+
+    Args:
+        shards: Documentos JSON de salida (en cualquier orden)
+
+    Returns:
+        str: Texto completo en orden de páginas
+    """
+    def shard_index(shard: Dict) -> int:
+        info = shard.get("shardInfo") or shard.get("shard_info") or {}
+        return int(info.get("shardIndex") or info.get("shard_index") or 0)
+
+    return "".join(shard.get("text", "") for shard in sorted(shards, key=shard_index))
+
+
+class BatchTransport:
+    """
+    Interfaz del transporte del modo en lote.
+
+    start inicia una operación, poll devuelve None mientras sigue en curso
+    (o el estado de cada documento al terminar) y read_output lee los
+    JSON de salida de un documento.
+    """
+
+    def start(self, processor_name: str, input_uris: List[str], output_uri: str) -> str:
+        """Inicia la operación y retorna su nombre."""
+        raise NotImplementedError
+
+    def poll(self, operation_name: str) -> Optional[List[BatchDocumentStatus]]:
+        """None si la operación sigue en curso; si terminó, el estado de cada documento."""
+        raise NotImplementedError
+
+    def read_output(self, output_uri: str) -> List[Dict]:
+        """Documentos JSON de salida (shards) bajo output_uri."""
+        raise NotImplementedError
+
+
+class GoogleBatchTransport(BatchTransport):
+    """Transporte real: DocumentProcessorServiceClient + Cloud Storage."""
+
+    def __init__(self, documentai_client, storage_client):
+        """
+        Args:
+            documentai_client: DocumentProcessorServiceClient (ej: DocumentAIClientManager.get_client)
+            storage_client: google.cloud.storage.Client para leer la salida
+        """
+        self.documentai_client = documentai_client
+        self.storage_client = storage_client
+        self._operations: Dict[str, object] = {}
+
+    def start(self, processor_name: str, input_uris: List[str], output_uri: str) -> str:
+        from google.cloud import documentai_v1 as documentai
+
+        request = documentai.BatchProcessRequest(
+            name=processor_name,
+            input_documents=documentai.BatchDocumentsInputConfig(
+                gcs_documents=documentai.GcsDocuments(documents=[
+                    documentai.GcsDocument(gcs_uri=uri, mime_type="application/pdf") for uri in input_uris
+                ])
+            ),
+            document_output_config=documentai.DocumentOutputConfig(
+                gcs_output_config=documentai.DocumentOutputConfig.GcsOutputConfig(gcs_uri=output_uri)
+            )
+        )
+        operation = self.documentai_client.batch_process_documents(request=request)
+        name = operation.operation.name
+        self._operations[name] = operation
+        return name
+
+    def poll(self, operation_name: str) -> Optional[List[BatchDocumentStatus]]:
+        operation = self._operations[operation_name]
+        if not operation.done():  # consulta el estado a la API
+            return None
+
+        self._operations.pop(operation_name, None)
+        error = operation.exception()
+        if error and not operation.metadata:
+            raise RuntimeError(f"Operación {operation_name} fallida: {error}")
+
+        statuses = []
+        for status in operation.metadata.individual_process_statuses:
+            if status.status.code != 0:
+                statuses.append(BatchDocumentStatus(
+                    input_uri=status.input_gcs_source,
+                    error=status.status.message or f"código {status.status.code}"
+                ))
+            else:
+                statuses.append(BatchDocumentStatus(
+                    input_uri=status.input_gcs_source,
+                    output_uri=status.output_gcs_destination
+                ))
+        return statuses
+
+    def read_output(self, output_uri: str) -> List[Dict]:
+        bucket, prefix = split_gcs_uri(output_uri)
+        shards = []
+        for blob in self.storage_client.list_blobs(bucket, prefix=prefix.rstrip("/") + "/"):
+            if blob.name.endswith(".json"):
+                shards.append(json.loads(blob.download_as_bytes()))
+        return shards
+
+
+class LocalBatchTransport(BatchTransport):
+    """
+    Transporte falso en memoria que emula batch_process_documents.
+
+    - La operación termina después de `polls_until_done` consultas
+    - El "OCR" es el texto local de PyPDF2
+    - La salida imita el formato de Google: un JSON por cada
+      `pages_per_shard` páginas, en {output_uri}/{operación}/{índice}/,
+      con text y shardInfo (shardIndex, shardCount, textOffset)
+    - Las URIs de fail_uris terminan con error individual
+    - read_output entrega cada salida una sola vez y la descarta (la
+      salida real queda en el bucket y la borra BatchIngestor)
+    """
+
+    def __init__(
+        self,
+        read_input: Callable[[str], bytes],
+        pages_per_shard: int = 2,
+        polls_until_done: int = 2,
+        fail_uris: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            read_input: Función gs:// URI → bytes del PDF
+            pages_per_shard: Páginas por JSON de salida
+            polls_until_done: Consultas antes de que la operación termine
+            fail_uris: Entradas que deben fallar
+        """
+        self.read_input = read_input
+        self.pages_per_shard = pages_per_shard
+        self.polls_until_done = polls_until_done
+        self.fail_uris = set(fail_uris or [])
+        self.outputs: Dict[str, bytes] = {}  # URI del JSON → contenido
+        self._operations: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, processor_name: str, input_uris: List[str], output_uri: str) -> str:
+        with self._lock:
+            operation_id = str(next(self._ids))
+            name = f"{processor_name}/operations/{operation_id}"
+            self._operations[name] = {
+                "id": operation_id,
+                "inputs": list(input_uris),
+                "output_uri": output_uri.rstrip("/"),
+                "polls_left": self.polls_until_done
+            }
+        return name
+
+    def poll(self, operation_name: str) -> Optional[List[BatchDocumentStatus]]:
+        with self._lock:
+            operation = self._operations[operation_name]
+            if operation["polls_left"] > 0:
+                operation["polls_left"] -= 1
+                return None
+            del self._operations[operation_name]
+
+        statuses = []
+        for index, uri in enumerate(operation["inputs"]):
+            if uri in self.fail_uris:
+                statuses.append(BatchDocumentStatus(uri, error="Documento no procesable"))
+                continue
+            destination = f"{operation['output_uri']}/{operation['id']}/{index}"
+            self._write_output(uri, destination)
+            statuses.append(BatchDocumentStatus(uri, output_uri=destination))
+        return statuses
+
+    def _write_output(self, input_uri: str, destination: str):
+        """Escribe los JSON de salida de un documento como lo haría Document AI."""
+        document = ParsedPDF(self.read_input(input_uri))
+        pages = [document.page_text(i) + "\n" for i in range(document.num_pages)] or [""]
+        shards = [pages[i:i + self.pages_per_shard] for i in range(0, len(pages), self.pages_per_shard)]
+        stem = split_gcs_uri(input_uri)[1].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+
+        offset = 0
+        for shard_index, shard_pages in enumerate(shards):
+            text = "".join(shard_pages)
+            output = json.dumps({
+                "text": text,
+                "shardInfo": {
+                    "shardIndex": str(shard_index),
+                    "shardCount": str(len(shards)),
+                    "textOffset": str(offset)
+                }
+            }).encode()
+            with self._lock:
+                self.outputs[f"{destination}/{stem}-{shard_index}.json"] = output
+            offset += len(text)
+
+    def read_output(self, output_uri: str) -> List[Dict]:
+        prefix = output_uri.rstrip("/") + "/"
+        with self._lock:
+            uris = [uri for uri in self.outputs if uri.startswith(prefix)]
+            return [json.loads(self.outputs.pop(uri)) for uri in uris]
@@ -0,0 +1,153 @@
+"""
+Cliente de Document AI compartido por todo el proceso.
+Crea un cliente por endpoint una sola vez y reutiliza su canal gRPC.
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+
+class DocumentAIClientManager:
+    """
+    Administra los clientes de Document AI del proceso.
+
+    Crear un DocumentProcessorServiceClient abre un canal gRPC nuevo
+    (handshake TLS + obtención de token). Aquí se crea uno por región
+    (endpoint) y se reutiliza en todas las peticiones e hilos: el cliente
+    de Google es thread-safe.
+
+    Las credenciales se refrescan en un hilo en segundo plano antes de que
+    expiren, así ninguna petición paga el refresco del token.
+    """
+
+    # Margen antes de la expiración del token para refrescarlo
+    REFRESH_MARGIN = timedelta(minutes=5)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, object] = {}
+        self._processor_names: Dict[Tuple[str, str, str], str] = {}
+        self._credentials = None
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def endpoint_for(location: str) -> str:
+        """Endpoint regional de Document AI (ej: us-documentai.googleapis.com)."""
+        return f"{location}-documentai.googleapis.com"
+
+    def get_client(self, location: str):
+        """
+        Retorna el cliente de la región, creándolo la primera vez.
+
+        Args:
+            location: Región del procesador (us, eu)
+
+        Returns:
+            DocumentProcessorServiceClient compartido
+        """
+        endpoint = self.endpoint_for(location)
+        client = self._clients.get(endpoint)
+        if client is not None:
+            return client
+
+        with self._lock:
+            if endpoint not in self._clients:
+                from google.cloud import documentai_v1 as documentai
+
+                self._clients[endpoint] = documentai.DocumentProcessorServiceClient(
+                    credentials=self._get_credentials(),
+                    client_options={"api_endpoint": endpoint}
+                )
+                print(f"✅ Cliente de Document AI creado: {endpoint}")
+            return self._clients[endpoint]
+
+    def processor_name(self, project_id: str, location: str, processor_id: str) -> str:
+        """
+        Nombre completo del procesador (se calcula una vez).
+
+        Returns:
+            str: projects/{project}/locations/{location}/processors/{id}
+        """
+        key = (project_id, location, processor_id)
+        if key not in self._processor_names:
+            client = self.get_client(location)
+            self._processor_names[key] = client.processor_path(project_id, location, processor_id)
+        return self._processor_names[key]
+
+    def warm(self, project_id: str, location: str, processor_id: str):
+        """
+        Pre-calienta el cliente: crea el canal y hace una llamada barata
+        (get_processor) para completar TLS y obtener el token.
+
+        Un fallo aquí no es fatal: se registra y la primera petición
+        reintentará la conexión.
+        """
+        try:
+            client = self.get_client(location)
+            client.get_processor(name=self.processor_name(project_id, location, processor_id))
+            print(f"🔥 Document AI pre-calentado: {self.endpoint_for(location)}")
+        except Exception as e:
+            print(f"⚠️  No se pudo pre-calentar Document AI: {e}")
+
+    def _get_credentials(self):
+        """Obtiene las credenciales (ADC) y arranca el refresco en segundo plano."""
+        if self._credentials is None:
+            import google.auth
+
+            self._credentials, _ = google.auth.default(
+                scopes=["https://www.googleapis.com/auth/cloud-platform"]
+            )
+            self._start_refresher()
+        return self._credentials
+
+    def _start_refresher(self):
+        """Arranca el hilo que refresca el token antes de que expire."""
+        if self._refresher is not None:
+            return
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, name="documentai-credentials", daemon=True
+        )
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        """Refresca las credenciales poco antes de su expiración."""
+        import google.auth.transport.requests
+
+        request = google.auth.transport.requests.Request()
+        while not self._stop.is_set():
+            try:
+                expiry = getattr(self._credentials, "expiry", None)
+                if expiry is None or expiry - datetime.utcnow() < self.REFRESH_MARGIN:
+                    self._credentials.refresh(request)
+                    expiry = self._credentials.expiry
+                wait = (expiry - datetime.utcnow() - self.REFRESH_MARGIN).total_seconds() if expiry else 300
+            except Exception as e:
+                print(f"⚠️  Error refrescando credenciales de Document AI: {e}")
+                wait = 30
+            self._stop.wait(max(wait, 30))
+
+    def close(self):
+        """Detiene el refresco y cierra los canales gRPC."""
+        self._stop.set()
+        with self._lock:
+            for client in self._clients.values():
+                try:
+                    client.transport.close()
+                except Exception:
+                    pass
+            self._clients.clear()
+
+
+# Instancia única del proceso
+_manager: Optional[DocumentAIClientManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_documentai_manager() -> DocumentAIClientManager:
+    """Retorna el DocumentAIClientManager del proceso (lo crea la primera vez)."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DocumentAIClientManager()
+        return _manager
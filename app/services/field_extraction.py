@@ -0,0 +1,223 @@
+"""
+Motor de extracción de campos del texto de un reporte.
+Compila las reglas una sola vez y recorre el texto en una sola pasada.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from heapq import merge
+from typing import Dict, List, Optional, Tuple
+
+
+FLAGS = re.IGNORECASE | re.DOTALL
+
+# Cualquier secuencia de espacios/saltos de línea (para limpiar valores)
+WHITESPACE = re.compile(r"\s+")
+
+# Longitud máxima de un valor extraído
+MAX_VALUE_LENGTH = 500
+
+
+# Etiquetas de sección: dónde puede empezar el valor de un campo.
+# (etiqueta, literal en minúsculas, resto del patrón)
+# Ninguna etiqueta puede coincidir en la misma posición que otra, así el
+# escáner asigna una sola etiqueta a cada posición sin perder ninguna.
+SECTION_LABELS: List[Tuple[str, str, str]] = [
+    ("PACIENTE", "paciente", ""),
+    ("NOMBRE_PACIENTE", "nombre", r"\s+(?:del\s+)?paciente"),
+    ("PATIENT", "patient", ""),
+    ("PROPIETARIO", "propietario", ""),
+    ("TUTOR", "tutor", ""),
+    ("DUEÑO", "dueño", ""),
+    ("OWNER", "owner", ""),
+    ("REFERIDO", "referido", r"\s+por"),
+    ("DERIVANTE", "derivante", ""),
+    ("MÉDICO", "médico", ""),
+    ("VETERINARIO", "veterinario", ""),
+    ("DOCTOR", "doctor", ""),
+    ("MVZ", "mvz", ""),
+    ("ELABORÓ", "elaboró", ""),
+    ("HALLAZGOS", "hallazgo", ""),
+    ("SE_OBSERVA", "se", r"\s+observa"),
+    ("DIAGNÓSTICO", "diagnóstico", ""),
+    ("IMPRESIÓN", "impresión", r"\s+diagnóstica"),
+    ("DIAGNOSIS", "diagnosis", ""),
+    ("CONCLUSIÓN", "conclusión", ""),
+    ("INDICACIONES", "indicaciones", ""),
+    ("RECOMENDACIONES", "recomendaciones", ""),
+    ("RECOMENDACIÓN", "recomendación", ""),
+    ("TRATAMIENTO", "tratamiento", ""),
+    ("RECOMMENDATION", "recommendation", ""),
+]
+
+
+def _build_trie(items: List[Tuple[str, str, str]]) -> str:
+    """
+    Arma una alternancia en forma de árbol de prefijos:
+    p(?:aciente|atient|ropietario)|t(?:utor|ratamiento)|...
+
+    Con una alternancia plana el motor de re prueba las 25 ramas en cada
+    posición; con el árbol solo sigue la rama de la letra actual. Cada hoja
+    lleva un grupo vacío (?P<gN>) que identifica la etiqueta.
+    """
+    branches = []
+    by_char: Dict[str, List[Tuple[str, str, str]]] = {}
+    for group, literal, tail in items:
+        if literal:
+            by_char.setdefault(literal[0], []).append((group, literal[1:], tail))
+        else:
+            branches.append(f"(?P<{group}>){tail}")
+    for char, children in by_char.items():
+        sub = _build_trie(children)
+        branches.append(re.escape(char) + (f"(?:{sub})" if "|" in sub else sub))
+    return "|".join(branches)
+
+
+_TRIE = _build_trie([(f"g{i}", literal, tail) for i, (_, literal, tail) in enumerate(SECTION_LABELS)])
+_GROUP_LABELS = {f"g{i}": label for i, (label, _, _) in enumerate(SECTION_LABELS)}
+
+# Escáner de secciones: un lookahead por posición (las etiquetas pueden
+# solaparse, ej. "paciente" dentro de "nombre del paciente"), una sola pasada
+# sobre el texto en minúsculas. IGNORECASE es varias veces más lento, así que
+# solo se usa como respaldo.
+SECTION_SCANNER = re.compile(f"(?=(?:{_TRIE}))", re.DOTALL)
+SECTION_SCANNER_IGNORECASE = re.compile(f"(?=(?:{_TRIE}))", FLAGS)
+
+
+@lru_cache(maxsize=1)
+def _special_case_chars() -> frozenset:
+    """
+    Caracteres que IGNORECASE iguala a una letra de las etiquetas pero que
+    str.lower() no convierte en esa letra (ej. "ſ" con "s", "ı" con "i").
+    Si el texto tiene alguno, el atajo de minúsculas no es equivalente.
+    Se calcula la primera vez que se usa (recorre el plano básico Unicode).
+    """
+    label_chars = "".join(sorted({c for _, literal, _ in SECTION_LABELS for c in literal}))
+    candidates = "".join(chr(code) for code in range(0x10000) if not 0xD800 <= code <= 0xDFFF)
+    matcher = re.compile(f"[{re.escape(label_chars)}]", re.IGNORECASE)
+    return frozenset(
+        match.group() for match in matcher.finditer(candidates)
+        if match.group().lower() not in label_chars
+    )
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    """
+    Regla de extracción: un patrón compilado y las secciones donde puede
+    empezar a coincidir.
+    """
+    pattern: "re.Pattern"
+    sections: Tuple[str, ...]
+
+
+def _rule(pattern: str, *sections: str) -> FieldRule:
+    return FieldRule(re.compile(pattern, FLAGS), sections)
+
+
+# Reglas por campo, en orden de prioridad (se compilan al importar el módulo)
+FIELD_RULES: Dict[str, List[FieldRule]] = {
+    "patient_name": [
+        _rule(r"paciente[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Propietario|Tutor|Raza|Especie|Edad|Sexo|\n)", "PACIENTE"),
+        _rule(r"nombre\s+(?:del\s+)?paciente[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Raza|Especie|Edad|\n)", "NOMBRE_PACIENTE"),
+        _rule(r"patient[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Owner|Breed|Species|Age|\n)", "PATIENT"),
+    ],
+    "owner_name": [
+        _rule(r"propietario[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Especie|Raza|Tel|Dirección|Teléfono|Sexo|Edad|\n)", "PROPIETARIO"),
+        _rule(r"tutor[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Raza|Tel|Dirección|Teléfono|\n)", "TUTOR"),
+        _rule(r"dueño[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Tel|Dirección|\n)", "DUEÑO"),
+        _rule(r"owner[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Species|Phone|Address|\n)", "OWNER"),
+    ],
+    "veterinarian_name": [
+        _rule(r"referido\s+por[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\n|\s+ANTECEDENTES)", "REFERIDO"),
+        _rule(r"derivante[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\n|Solicitud)", "DERIVANTE"),
+        _rule(r"(?:médico\s+)?veterinario[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|Tel|\n)", "MÉDICO", "VETERINARIO"),
+        _rule(r"médico[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)", "MÉDICO"),
+        _rule(r"doctor[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+License|Date|\n)", "DOCTOR"),
+        _rule(r"MVZ[:\s\.]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)", "MVZ"),
+        _rule(r"elaboró[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)", "ELABORÓ"),
+    ],
+    "diagnosis": [
+        _rule(r"(?:hallazgo|hallazgos)[s\s]*(?:bidimensional|radiográfico)?[:\s]*\n*(.{20,1500}?)(?:\n\s*CONCLUS|\n\s*©|\n\s*DiagnoVet|INDICACIONES|RECOMENDACIONES|$)", "HALLAZGOS"),
+        _rule(r"se\s+observa[:\s]*(.{20,1500}?)(?:\n\s*©|\n\s*DiagnoVet|\n\s*CONCLUS|\n\s*INDICACIONES|$)", "SE_OBSERVA"),
+        _rule(r"diagnóstico[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*Tratamiento|\n\s*Observación|$)", "DIAGNÓSTICO"),
+        _rule(r"impresión\s+diagnóstica[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*Tratamiento|$)", "IMPRESIÓN"),
+        _rule(r"diagnosis[:\s]*(.{20,800}?)(?:\n\s*Recommendation|\n\s*Treatment|$)", "DIAGNOSIS"),
+        _rule(r"conclusión[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*INDICACIONES|$)", "CONCLUSIÓN"),
+    ],
+    "recommendations": [
+        _rule(r"(?:indicaciones|recomendaciones)[:\s]*(.{20,1000}?)(?:\n\s*©|\n\s*DiagnoVet|\n\s*Firma|\n\s*Elaboró|\n\s*M\.V\.|$)", "INDICACIONES", "RECOMENDACIONES"),
+        _rule(r"recomendación(?:es)?[:\s]*(.{20,800}?)(?:\n\s*Firma|\n\s*Fecha\s+de\s+emisión|\n\s*Elaboró|$)", "RECOMENDACIÓN"),
+        _rule(r"tratamiento[:\s]*(.{20,800}?)(?:\n\s*Firma|\n\s*Fecha|$)", "TRATAMIENTO"),
+        _rule(r"recommendation(?:s)?[:\s]*(.{20,800}?)(?:\n\s*Signature|\n\s*Date|$)", "RECOMMENDATION"),
+        _rule(r"conclusión[:\s]*(.{20,800}?)(?:\n\s*Indicaciones|\n\s*Recomendación|\n\s*Firma|$)", "CONCLUSIÓN"),
+    ],
+}
+
+
+def segment_sections(text: str) -> Dict[str, List[int]]:
+    """
+    Divide el texto en secciones etiquetadas con una sola pasada.
+
+    Args:
+        text: Texto completo del reporte
+
+    Returns:
+        Dict etiqueta → posiciones (en orden) donde empieza esa sección
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text) and _special_case_chars().isdisjoint(text):
+        matches = SECTION_SCANNER.finditer(lowered)
+    else:
+        # lower() cambió posiciones o hay plegados especiales de mayúsculas
+        matches = SECTION_SCANNER_IGNORECASE.finditer(text)
+
+    sections: Dict[str, List[int]] = {}
+    for match in matches:
+        label = _GROUP_LABELS[match.lastgroup]
+        sections.setdefault(label, []).append(match.start())
+    return sections
+
+
+def _first_match(rule: FieldRule, text: str, sections: Dict[str, List[int]]) -> Optional["re.Match"]:
+    """
+    Primera coincidencia de la regla: la prueba solo donde empieza una de
+    sus secciones, en orden. Equivale a rule.pattern.search(text) porque
+    una coincidencia solo puede empezar en una de esas posiciones.
+    """
+    starts = [sections.get(label, []) for label in rule.sections]
+    positions = starts[0] if len(starts) == 1 else merge(*starts)
+    for position in positions:
+        match = rule.pattern.match(text, position)
+        if match:
+            return match
+    return None
+
+
+def extract_fields(text: str) -> Dict[str, Optional[str]]:
+    """
+    Extrae los cinco campos del reporte.
+
+    Args:
+        text: Texto completo extraído del PDF
+
+    Returns:
+        Dict con patient_name, owner_name, veterinarian_name, diagnosis y
+        recommendations (None si no se detectó)
+    """
+    fields: Dict[str, Optional[str]] = {field: None for field in FIELD_RULES}
+    sections = segment_sections(text)
+
+    for field, rules in FIELD_RULES.items():
+        for rule in rules:
+            match = _first_match(rule, text, sections)
+            if match:
+                # Limpiar el valor (múltiples espacios y saltos de línea)
+                value = WHITESPACE.sub(" ", match.group(1).strip()).strip()
+                value = value[:MAX_VALUE_LENGTH]
+
+                if len(value) > 2:  # Solo si tiene contenido válido
+                    fields[field] = value
+                    break  # Ya encontramos este campo, pasar al siguiente
+
+    return fields
@@ -2,9 +2,71 @@
 Servicio para interactuar con Firestore (base de datos).
 Guarda y consulta la información de los reportes.
 """
-from typing import Optional, List, Dict
-from datetime import datetime
-from google.cloud import firestore
+import base64
+import binascii
+import copy
+import json
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timezone
+
+from app.services.cache import CacheBackend, LRUCache
+from app.services.search_keys import NAME_FIELDS, TEXT_FIELDS, search_fields, strip_search_fields
+
+
+# Campo especial de Firestore: el ID del documento
+DOCUMENT_ID = "__name__"
+
+# Máximo de escrituras que admite un WriteBatch de Firestore
+MAX_BATCH_WRITES = 500
+
+# Marca de "el reporte no existe" en la caché de reportes
+REPORT_NOT_FOUND = {"__not_found__": True}
+
+# Estados de un trabajo asíncrono que todavía no terminó
+PENDING_STATUSES = ("queued", "processing")
+
+# Estados que ya no cambian solos: solo estos reportes se guardan en la caché
+TERMINAL_STATUSES = ("processed", "failed")
+
+
+class InvalidCursorError(ValueError):
+    """El cursor de paginación no es válido."""
+
+
+def encode_cursor(upload_date: datetime, report_id: str) -> str:
+    """
+    Construye el cursor opaco de paginación.
+    
+    Args:
+        upload_date: Fecha de carga del último reporte de la página
+        report_id: ID del último reporte de la página
+        
+    Returns:
+        str: Cursor en base64 (seguro para URLs)
+    """
+    payload = json.dumps({"d": upload_date.isoformat(), "id": report_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Lee un cursor construido por encode_cursor.
+    
+    Args:
+        cursor: Cursor opaco
+        
+    Returns:
+        (fecha de carga, ID del reporte)
+        
+    Raises:
+        InvalidCursorError: Si el cursor no es válido
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["d"]), str(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("Cursor de paginación inválido") from e
 
 
 class FirestoreService:
@@ -21,19 +83,70 @@ class FirestoreService:
            ├─ owner_name: "Juan Pérez"
            ├─ diagnosis: "Cálculos renales..."
            ├─ image_urls: ["url1", "url2"]
-           └─ upload_date: 2026-02-04T10:30:00
+           ├─ upload_date: 2026-02-04T10:30:00
+           ├─ search_keys: {"patient_name": "max", ...}
+           └─ search_terms: ["patient_name:ma", "text:calculos", ...]
+    
+    search_keys y search_terms se calculan al guardar (GET /reports/search,
+    ver app/services/report_search.py). Los reportes guardados antes de
+    que existieran se completan con backfill_search_fields.
+    
+    Índice de huellas (deduplicación de PDFs reenviados):
+    report_fingerprints/
+      └─ {sha256 del PDF}/
+           └─ report_id: "abc123"
+    
+    Una huella solo cuenta como duplicado si su reporte está procesado o
+    es un trabajo en curso reciente (ver find_report_by_fingerprint).
+    
+    Estado de las cargas en lote (GET /batches/{batch_id}):
+    report_batches/
+      └─ {batch_id}/
+           ├─ status: "processing"
+           ├─ total, processed, duplicates, failed
+           └─ results: [{"filename": ..., "status": ..., "report_id": ...}]
     """
     
-    def __init__(self, project_id: str = None):
+    def __init__(
+        self,
+        project_id: str = None,
+        fingerprint_cache_size: int = 1024,
+        report_cache: Optional[CacheBackend] = None,
+        report_negative_ttl: float = 5.0,
+        search_index=None,
+        job_stale_after: float = 3600.0
+    ):
         """
         Inicializa el servicio de Firestore.
         
         Args:
             project_id: ID del proyecto de GCP
+            fingerprint_cache_size: Huellas recientes que se guardan en memoria
+            report_cache: Caché de lectura de get_report (None = sin caché)
+            report_negative_ttl: Segundos que se recuerda que un reporte no existe
+            search_index: Índice de búsqueda que se actualiza en cada escritura
+                (InMemoryReportSearch). None = solo los campos del documento
+            job_stale_after: Segundos tras los que un trabajo queued/processing
+                se considera abandonado y su PDF se puede volver a procesar
         """
+        # google.cloud.firestore se importa aquí (pesado, fuera del arranque)
+        from google.cloud import firestore
+        
         # Inicializar cliente de Firestore
         self.db = firestore.Client(project=project_id)
         self.collection_name = "reports"
+        self.fingerprints_collection_name = "report_fingerprints"
+        self.batches_collection_name = "report_batches"
+        
+        # LRU delante del índice: los duplicados frecuentes no consultan Firestore
+        self.fingerprint_cache = LRUCache(max_size=fingerprint_cache_size)
+        
+        # Caché de reportes: se invalida en save/update/delete_report
+        self.report_cache = report_cache
+        self.report_negative_ttl = report_negative_ttl
+        
+        self.search_index = search_index
+        self.job_stale_after = job_stale_after
         
         print(f"✅ Firestore inicializado: colección '{self.collection_name}' en proyecto '{project_id}'")
     
@@ -51,48 +164,179 @@ class FirestoreService:
         if 'upload_date' in report_data and isinstance(report_data['upload_date'], datetime):
             report_data['upload_date'] = report_data['upload_date']
         
-        # Crear documento en Firestore con el ID del reporte
+        # Crear documento en Firestore con el ID del reporte (y sus claves de búsqueda)
+        document = {**report_data, **search_fields(report_data)}
         doc_ref = self.db.collection(self.collection_name).document(report_data['id'])
-        doc_ref.set(report_data)
+        doc_ref.set(document)
+        self._invalidate_report(report_data['id'])
+        if self.search_index is not None:
+            self.search_index.index(document)
         
         print(f"💾 Reporte guardado en Firestore: {report_data['id']}")
         return report_data['id']
     
+    def save_reports_bulk(self, reports: List[Dict]) -> List[str]:
+        """
+        Guarda varios reportes con escrituras en lote (WriteBatch).
+        
+        Cada lote es atómico y admite hasta 500 escrituras; un reporte con
+        content_sha256 usa dos (el reporte y su huella). Si un lote falla se
+        lanza la excepción: los lotes anteriores ya quedaron guardados.
+        
+        Args:
+            reports: Diccionarios con los datos de cada reporte
+            
+        Returns:
+            Lista con los IDs guardados
+        """
+        saved = []
+        batch = self.db.batch()
+        writes = 0
+        pending = []
+        
+        for report_data in reports:
+            needed = 2 if report_data.get("content_sha256") else 1
+            if writes + needed > MAX_BATCH_WRITES:
+                batch.commit()
+                saved.extend(self._after_bulk_commit(pending))
+                batch, writes, pending = self.db.batch(), 0, []
+            
+            batch.set(
+                self.db.collection(self.collection_name).document(report_data["id"]),
+                {**report_data, **search_fields(report_data)}
+            )
+            if report_data.get("content_sha256"):
+                batch.set(
+                    self.db.collection(self.fingerprints_collection_name).document(report_data["content_sha256"]),
+                    {"report_id": report_data["id"], "created_at": datetime.utcnow()}
+                )
+            writes += needed
+            pending.append(report_data)
+        
+        if pending:
+            batch.commit()
+            saved.extend(self._after_bulk_commit(pending))
+        
+        print(f"💾 {len(saved)} reportes guardados en Firestore (escritura en lote)")
+        return saved
+    
+    def _after_bulk_commit(self, reports: List[Dict]) -> List[str]:
+        """Actualiza las cachés después de confirmar un lote."""
+        for report_data in reports:
+            self._invalidate_report(report_data["id"])
+            if self.search_index is not None:
+                self.search_index.index(report_data)
+            if report_data.get("content_sha256"):
+                self.fingerprint_cache.set(report_data["content_sha256"], report_data["id"])
+        return [report_data["id"] for report_data in reports]
+    
     def get_report(self, report_id: str) -> Optional[Dict]:
         """
         Obtiene un reporte por su ID.
         
+        Si hay caché de reportes, se lee primero de ella (read-through).
+        Solo se guardan los reportes terminados (processed/failed): los
+        trabajos en curso cambian de estado y GET /jobs/{id} debe verlo.
+        Los reportes inexistentes también se recuerdan, con un TTL corto.
+        
         Args:
             report_id: ID del reporte a buscar
             
         Returns:
             Dict con los datos del reporte, o None si no existe
         """
+        if self.report_cache is not None:
+            cached = self.report_cache.get(report_id)
+            if cached == REPORT_NOT_FOUND:
+                return None
+            if cached is not None:
+                # Copia: quien lo recibe puede modificarlo
+                return copy.deepcopy(cached)
+            # Versión antes de leer: si una escritura invalida el reporte
+            # mientras se lee, la copia leída (vieja) no se guarda
+            generation = self.report_cache.generation(report_id)
+        
         doc_ref = self.db.collection(self.collection_name).document(report_id)
         doc = doc_ref.get()
         
         if doc.exists:
             print(f"🔍 Reporte encontrado en Firestore: {report_id}")
-            return doc.to_dict()
+            report = strip_search_fields(doc.to_dict())
+            if self.report_cache is not None and report.get("status", "processed") in TERMINAL_STATUSES:
+                self.report_cache.set(report_id, copy.deepcopy(report), generation=generation)
+            return report
         
         print(f"⚠️  Reporte no encontrado: {report_id}")
+        if self.report_cache is not None:
+            self.report_cache.set(report_id, REPORT_NOT_FOUND, ttl=self.report_negative_ttl, generation=generation)
         return None
     
-    def list_reports(self, limit: int = 100) -> List[Dict]:
+    def _invalidate_report(self, report_id: str):
+        """Descarta un reporte de la caché (después de escribirlo)."""
+        if self.report_cache is not None:
+            self.report_cache.delete(report_id)
+    
+    def list_reports(
+        self,
+        page_size: int = 20,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        descending: bool = True
+    ) -> Tuple[List[Dict], Optional[str]]:
         """
-        Lista todos los reportes.
+        Lista una página de reportes ordenados por fecha de carga.
+        
+        Usa un cursor (start_after) en vez de offset: cada página cuesta lo
+        mismo sin importar cuántos reportes haya antes. El desempate por ID
+        de documento hace el orden estable aunque dos reportes tengan la
+        misma fecha.
         
         Args:
-            limit: Número máximo de reportes a retornar
+            page_size: Número máximo de reportes a retornar
+            cursor: Cursor opaco devuelto por la página anterior (None = primera)
+            fields: Campos a traer (proyección con select). None = documento completo
+            descending: Más recientes primero
             
         Returns:
-            Lista de diccionarios con los reportes
+            (reportes, cursor de la página siguiente o None si no hay más)
+            
+        Raises:
+            InvalidCursorError: Si el cursor no es válido
         """
-        docs = self.db.collection(self.collection_name).limit(limit).stream()
-        reports = [doc.to_dict() for doc in docs]
+        from google.cloud import firestore
+        
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = (
+            self.db.collection(self.collection_name)
+            .order_by("upload_date", direction=direction)
+            .order_by(DOCUMENT_ID, direction=direction)
+        )
+        
+        if fields:
+            # upload_date hace falta para construir el cursor siguiente
+            query = query.select(sorted(set(fields) | {"id", "upload_date"}))
+        
+        if cursor:
+            upload_date, report_id = decode_cursor(cursor)
+            query = query.start_after({"upload_date": upload_date, DOCUMENT_ID: report_id})
+        
+        # Se pide uno de más para saber si hay otra página sin contar la colección
+        docs = list(query.limit(page_size + 1).stream())
+        has_more = len(docs) > page_size
+        docs = docs[:page_size]
+        
+        reports = []
+        for doc in docs:
+            report = strip_search_fields(doc.to_dict())
+            report.setdefault("id", doc.id)
+            reports.append(report)
+        
+        next_cursor = None
+        if has_more and docs:
+            next_cursor = encode_cursor(reports[-1]["upload_date"], docs[-1].id)
         
         print(f"📋 Listando {len(reports)} reportes desde Firestore")
-        return reports
+        return reports, next_cursor
     
     def update_report(self, report_id: str, updates: Dict) -> bool:
         """
@@ -107,16 +351,78 @@ class FirestoreService:
         """
         try:
             doc_ref = self.db.collection(self.collection_name).document(report_id)
+            if set(updates) & set(NAME_FIELDS + TEXT_FIELDS):
+                # Cambian campos buscables: recalcular las claves de búsqueda
+                current = doc_ref.get().to_dict() or {}
+                updates = {**updates, **search_fields({**current, **updates})}
             doc_ref.update(updates)
+            self._invalidate_report(report_id)
+            if self.search_index is not None:
+                self.search_index.index({"id": report_id, **(doc_ref.get().to_dict() or {})})
             print(f"✏️  Reporte actualizado: {report_id}")
             return True
         except Exception as e:
             print(f"❌ Error actualizando reporte: {e}")
             return False
     
+    def backfill_search_fields(self, page_size: int = MAX_BATCH_WRITES, dry_run: bool = False) -> Dict[str, int]:
+        """
+        Completa search_keys y search_terms en los reportes que no los
+        tienen o los tienen desactualizados (guardados antes de
+        GET /reports/search o con otra versión de search_keys.py).
+        
+        Recorre la colección por ID de a page_size documentos y escribe
+        solo los campos de búsqueda (set con merge) con una escritura en
+        lote por página. Se puede volver a ejecutar: los reportes al día
+        no se escriben.
+        
+        Args:
+            page_size: Documentos por página (máximo MAX_BATCH_WRITES)
+            dry_run: True = solo cuenta los reportes a actualizar
+            
+        Returns:
+            {"scanned": reportes leídos, "updated": reportes actualizados (o a actualizar)}
+        """
+        page_size = max(1, min(page_size, MAX_BATCH_WRITES))
+        collection = self.db.collection(self.collection_name)
+        scanned = updated = 0
+        last_id = None
+        
+        while True:
+            query = collection.order_by(DOCUMENT_ID).limit(page_size)
+            if last_id is not None:
+                query = query.start_after({DOCUMENT_ID: last_id})
+            docs = list(query.stream())
+            
+            batch = self.db.batch()
+            changed = []
+            for doc in docs:
+                report = doc.to_dict() or {}
+                fields = search_fields(report)
+                if all(report.get(name) == value for name, value in fields.items()):
+                    continue
+                changed.append({"id": doc.id, **report, **fields})
+                batch.set(collection.document(doc.id), fields, merge=True)
+            
+            scanned += len(docs)
+            updated += len(changed)
+            if changed and not dry_run:
+                batch.commit()
+                if self.search_index is not None:
+                    for report in changed:
+                        self.search_index.index(report)
+            
+            if len(docs) < page_size:
+                break
+            last_id = docs[-1].id
+        
+        action = "a actualizar" if dry_run else "actualizados"
+        print(f"🔎 Campos de búsqueda: {scanned} reportes leídos, {updated} {action}")
+        return {"scanned": scanned, "updated": updated}
+    
     def delete_report(self, report_id: str) -> bool:
         """
-        Elimina un reporte.
+        Elimina un reporte y su huella (así el mismo PDF se puede volver a subir).
         
         Args:
             report_id: ID del reporte a eliminar
@@ -126,9 +432,167 @@ class FirestoreService:
         """
         try:
             doc_ref = self.db.collection(self.collection_name).document(report_id)
+            doc = doc_ref.get()
+            sha256 = (doc.to_dict() or {}).get("content_sha256") if doc.exists else None
             doc_ref.delete()
+            if sha256:
+                self.delete_fingerprint(sha256, report_id)
+            self._invalidate_report(report_id)
+            if self.search_index is not None:
+                self.search_index.remove(report_id)
             print(f"🗑️  Reporte eliminado: {report_id}")
             return True
         except Exception as e:
             print(f"❌ Error eliminando reporte: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    def find_report_by_fingerprint(self, sha256: str) -> Optional[str]:
+        """
+        Busca un reporte ya procesado con el mismo contenido.
+        
+        La huella se registra al encolar un trabajo, antes de procesarlo, así
+        que se verifica el estado del reporte al que apunta:
+        - processed: es un duplicado
+        - queued/processing: es un duplicado mientras el trabajo sea reciente;
+          pasado job_stale_after se marca como failed (el worker que lo tenía
+          se perdió, ej: la instancia se apagó) y el PDF se vuelve a procesar
+        - failed o reporte borrado: el PDF se vuelve a procesar
+        
+        Solo las huellas de reportes procesados se guardan en la caché.
+        
+        Args:
+            sha256: Huella SHA-256 del PDF
+            
+        Returns:
+            ID del reporte existente, o None si el PDF hay que procesarlo
+        """
+        report_id = self.fingerprint_cache.get(sha256)
+        if report_id:
+            return report_id
+        
+        doc = self.db.collection(self.fingerprints_collection_name).document(sha256).get()
+        if not doc.exists:
+            return None
+        
+        report_id = doc.to_dict().get("report_id")
+        if not report_id:
+            return None
+        
+        report_doc = self.db.collection(self.collection_name).document(report_id).get()
+        if not report_doc.exists:
+            # El reporte se borró sin su huella
+            self.delete_fingerprint(sha256, report_id)
+            return None
+        
+        report = report_doc.to_dict() or {}
+        status = report.get("status", "processed")
+        if status == "processed":
+            self.fingerprint_cache.set(sha256, report_id)
+            return report_id
+        if status in PENDING_STATUSES:
+            if not self._is_stale(report.get("upload_date")):
+                return report_id
+            print(f"⚠️  Trabajo abandonado: {report_id} sigue '{status}', se vuelve a procesar")
+            self.update_report(report_id, {
+                "status": "failed",
+                "error": "El trabajo no terminó a tiempo (la instancia que lo procesaba se detuvo)"
+            })
+        return None
+    
+    def _is_stale(self, upload_date: Optional[datetime]) -> bool:
+        """True si un trabajo encolado en upload_date ya superó job_stale_after."""
+        if not isinstance(upload_date, datetime):
+            return True
+        if upload_date.tzinfo is not None:
+            # Firestore devuelve las fechas en UTC con zona horaria
+            upload_date = upload_date.astimezone(timezone.utc).replace(tzinfo=None)
+        return (datetime.utcnow() - upload_date).total_seconds() > self.job_stale_after
+    
+    def save_fingerprint(self, sha256: str, report_id: str, processed: bool = True):
+        """
+        Registra la huella de un PDF en el índice.
+        
+        Args:
+            sha256: Huella SHA-256 del PDF
+            report_id: ID del reporte que lo procesó
+            processed: False si el reporte es un trabajo encolado (la huella
+                       no se guarda en la caché hasta que esté procesado)
+        """
+        doc_ref = self.db.collection(self.fingerprints_collection_name).document(sha256)
+        doc_ref.set({"report_id": report_id, "created_at": datetime.utcnow()})
+        if processed:
+            self.fingerprint_cache.set(sha256, report_id)
+        else:
+            self.fingerprint_cache.delete(sha256)
+        print(f"🔑 Huella registrada: {sha256[:12]}… → {report_id}")
+    
+    def delete_fingerprint(self, sha256: str, report_id: Optional[str] = None) -> bool:
+        """
+        Elimina una huella (ej: si el procesamiento falló y debe reintentarse).
+        
+        Args:
+            sha256: Huella SHA-256 del PDF
+            report_id: Si se indica, solo se elimina si la huella apunta a
+                       ese reporte (otro upload pudo registrarla después)
+            
+        Returns:
+            bool: True si se eliminó correctamente
+        """
+        try:
+            doc_ref = self.db.collection(self.fingerprints_collection_name).document(sha256)
+            if report_id is not None:
+                doc = doc_ref.get()
+                if doc.exists and (doc.to_dict() or {}).get("report_id") != report_id:
+                    return False
+            self.fingerprint_cache.delete(sha256)
+            doc_ref.delete()
+            return True
+        except Exception as e:
+            print(f"❌ Error eliminando huella: {e}")
+            return False
+    
+    def save_batch(self, batch_data: Dict) -> str:
+        """
+        Guarda el registro de una carga en lote.
+        
+        Args:
+            batch_data: Datos del lote (incluye "batch_id")
+            
+        Returns:
+            str: ID del lote
+        """
+        doc_ref = self.db.collection(self.batches_collection_name).document(batch_data["batch_id"])
+        doc_ref.set(batch_data)
+        print(f"💾 Lote guardado en Firestore: {batch_data['batch_id']}")
+        return batch_data["batch_id"]
+    
+    def update_batch(self, batch_id: str, updates: Dict) -> bool:
+        """
+        Actualiza el estado o el avance de una carga en lote.
+        
+        Args:
+            batch_id: ID del lote
+            updates: Campos a actualizar
+            
+        Returns:
+            bool: True si se actualizó correctamente
+        """
+        try:
+            self.db.collection(self.batches_collection_name).document(batch_id).update(updates)
+            return True
+        except Exception as e:
+            print(f"❌ Error actualizando lote {batch_id}: {e}")
+            return False
+    
+    def get_batch(self, batch_id: str) -> Optional[Dict]:
+        """
+        Obtiene el estado de una carga en lote.
+        
+        Args:
+            batch_id: ID del lote
+            
+        Returns:
+            Dict con los datos del lote, o None si no existe
+        """
+        doc = self.db.collection(self.batches_collection_name).document(batch_id).get()
+        return doc.to_dict() if doc.exists else None
@@ -2,9 +2,27 @@
 Servicio para interactuar con Google Cloud Storage.
 Maneja la subida y descarga de archivos (imágenes).
 """
-from typing import List
+from typing import BinaryIO, Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import os
-from google.cloud import storage
+
+from app.services import metrics
+from app.services.pdf_processor import ExtractedImage
+from app.services.resilience import Deadline, get_guard
+
+
+@dataclass
+class ImageUploadResult:
+    """Resultado de subir una imagen dentro de una subida masiva."""
+    index: int
+    filename: str
+    url: Optional[str] = None
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 class GCPStorageService:
@@ -15,29 +33,69 @@ class GCPStorageService:
     Aquí guardaremos las imágenes extraídas de los PDFs.
     """
     
-    def __init__(self, bucket_name: str = "diagnovet-reports-images", project_id: str = None):
+    def __init__(
+        self,
+        bucket_name: str = "diagnovet-reports-images",
+        project_id: str = None,
+        upload_concurrency: int = 8,
+        upload_timeout: float = 60.0
+    ):
         """
         Inicializa el servicio de Storage.
         
         Args:
             bucket_name: Nombre del "contenedor" donde guardaremos archivos
             project_id: ID del proyecto de GCP
+            upload_concurrency: Imágenes que se suben a la vez en una subida masiva
+            upload_timeout: Timeout en segundos de cada subida individual
         """
         self.bucket_name = bucket_name
+        self.upload_timeout = upload_timeout
+        
+        # google.cloud.storage se importa aquí: es pesado y no debe
+        # demorar el arranque (la app lo construye en segundo plano)
+        from google.cloud import storage
         
         # Inicializar cliente de Storage con el project_id explícito
         self.client = storage.Client(project=project_id)
         self.bucket = self.client.bucket(bucket_name)
         
+        # Pool de hilos para subidas/borrados en paralelo. Todos comparten la
+        # sesión HTTP del cliente, cuyo pool de conexiones se dimensiona para
+        # que cada hilo tenga una conexión reutilizable.
+        self.executor = ThreadPoolExecutor(max_workers=upload_concurrency, thread_name_prefix="gcs")
+        self._size_connection_pool(upload_concurrency)
+        
         print(f"✅ Cloud Storage inicializado: bucket '{bucket_name}' en proyecto '{project_id}'")
     
-    def upload_image(self, local_path: str, destination_blob_name: str) -> str:
+    def _size_connection_pool(self, pool_size: int):
+        """Ajusta el pool de conexiones HTTPS de la sesión del cliente."""
+        from requests.adapters import HTTPAdapter
+        
+        http = getattr(self.client, "_http", None)
+        if http is not None and hasattr(http, "mount"):
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            http.mount("https://", adapter)
+    
+    def _guarded(self, call, deadline: Optional[Deadline] = None):
+        """
+        Llamada a Cloud Storage con reintentos ante errores transitorios,
+        circuit breaker y el deadline de la petición (app/services/resilience.py).
+        
+        Args:
+            call: Función que recibe el timeout del intento
+            deadline: Presupuesto de la petición (opcional)
+        """
+        return get_guard("storage").call(call, deadline, timeout=self.upload_timeout)
+    
+    def upload_image(self, local_path: str, destination_blob_name: str, deadline: Optional[Deadline] = None) -> str:
         """
         Sube una imagen a Cloud Storage.
         
         Args:
             local_path: Ruta local de la imagen (ej: "./extracted_images/abc123_image_1.jpg")
             destination_blob_name: Nombre que tendrá en la nube (ej: "reports/abc123/image_1.jpg")
+            deadline: Presupuesto de la petición (opcional)
             
         Returns:
             str: URL pública de la imagen subida
@@ -46,7 +104,8 @@ class GCPStorageService:
         blob = self.bucket.blob(destination_blob_name)
         
         # Subir el archivo
-        blob.upload_from_filename(local_path)
+        self._guarded(lambda timeout: blob.upload_from_filename(local_path, timeout=timeout), deadline)
+        metrics.BYTES_UPLOADED.inc(os.path.getsize(local_path))
         
         # No llamamos make_public() porque el bucket tiene Uniform Access habilitado
         # La URL pública funciona si el bucket está configurado como público
@@ -55,29 +114,121 @@ class GCPStorageService:
         
         return blob.public_url
     
-    def upload_multiple_images(self, image_paths: List[str], report_id: str) -> List[str]:
+    def upload_image_bytes(
+        self, data: bytes, destination_blob_name: str, content_type: str, deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Sube una imagen que está en memoria, sin archivo local intermedio.
+        
+        Args:
+            data: Bytes de la imagen
+            destination_blob_name: Nombre que tendrá en la nube (ej: "reports/abc123/image_1.jpg")
+            content_type: Tipo MIME (ej: "image/jpeg")
+            deadline: Presupuesto de la petición (opcional)
+            
+        Returns:
+            str: URL pública de la imagen subida
+        """
+        blob = self.bucket.blob(destination_blob_name)
+        self._guarded(
+            lambda timeout: blob.upload_from_string(data, content_type=content_type, timeout=timeout), deadline
+        )
+        metrics.BYTES_UPLOADED.inc(len(data))
+        
+        print(f"  ☁️  Imagen subida: {destination_blob_name}")
+        
+        return blob.public_url
+    
+    def upload_bytes(self, data: bytes, destination_blob_name: str, content_type: str = "application/octet-stream"):
+        """
+        Sube datos en memoria que no son imágenes (ej: bloques de una subida reanudable).
+        
+        Args:
+            data: Bytes a subir
+            destination_blob_name: Nombre que tendrá en la nube
+            content_type: Tipo MIME
+        """
+        blob = self.bucket.blob(destination_blob_name)
+        self._guarded(lambda timeout: blob.upload_from_string(data, content_type=content_type, timeout=timeout))
+        metrics.BYTES_UPLOADED.inc(len(data))
+    
+    def upload_file(self, fileobj: BinaryIO, destination_blob_name: str, content_type: str = "application/octet-stream"):
         """
-        Sube múltiples imágenes de un reporte.
+        Sube un archivo abierto sin cargarlo entero en memoria (ej: un ZIP de una carga en lote).
         
         Args:
-            image_paths: Lista de rutas locales de imágenes
+            fileobj: Archivo binario con seek (se sube desde el principio)
+            destination_blob_name: Nombre que tendrá en la nube
+            content_type: Tipo MIME
+        """
+        blob = self.bucket.blob(destination_blob_name)
+        self._guarded(lambda timeout: blob.upload_from_file(
+            fileobj, rewind=True, content_type=content_type, timeout=timeout
+        ))
+        metrics.BYTES_UPLOADED.inc(fileobj.tell())
+    
+    def upload_multiple_images(self, images: List[Union[str, ExtractedImage]], report_id: str) -> List[str]:
+        """
+        Sube múltiples imágenes de un reporte en paralelo.
+        
+        Args:
+            images: Rutas locales de imágenes o ExtractedImage en memoria
             report_id: ID del reporte (para organizar en carpetas)
             
         Returns:
-            List[str]: Lista de URLs públicas de las imágenes
+            List[str]: URLs públicas de las imágenes subidas, en el orden original
+                       (las que fallaron se omiten; ver upload_images_bulk)
         """
-        image_urls = []
+        results = self.upload_images_bulk(images, report_id)
+        return [result.url for result in results if result.ok]
+    
+    def upload_images_bulk(
+        self, images: List[Union[str, ExtractedImage]], report_id: str, deadline: Optional[Deadline] = None
+    ) -> List[ImageUploadResult]:
+        """
+        Sube múltiples imágenes en paralelo con concurrencia acotada.
+        
+        Un error en una imagen no aborta las demás: queda reportado en su
+        resultado.
         
-        for idx, image_path in enumerate(image_paths):
+        Args:
+            images: Rutas locales de imágenes o ExtractedImage en memoria
+            report_id: ID del reporte (para organizar en carpetas)
+            deadline: Presupuesto de la petición; si se agota, las imágenes
+                      que faltan quedan como fallidas
+            
+        Returns:
+            List[ImageUploadResult]: Un resultado por imagen, en el orden original
+        """
+        def upload_one(index: int, image: Union[str, ExtractedImage]) -> ImageUploadResult:
+            filename = image.filename if isinstance(image, ExtractedImage) else os.path.basename(image)
             # Crear nombre en la nube: reports/{report_id}/image_1.jpg
-            filename = os.path.basename(image_path)
             destination = f"reports/{report_id}/{filename}"
-            
-            # Subir imagen
-            url = self.upload_image(image_path, destination)
-            image_urls.append(url)
+            try:
+                if isinstance(image, ExtractedImage):
+                    url = self.upload_image_bytes(image.data, destination, image.content_type, deadline)
+                else:
+                    url = self.upload_image(image, destination, deadline)
+                return ImageUploadResult(index=index, filename=filename, url=url)
+            except Exception as e:
+                print(f"  ⚠️  Error subiendo imagen {filename}: {e}")
+                return ImageUploadResult(index=index, filename=filename, error=str(e))
         
-        return image_urls
+        # map conserva el orden original aunque terminen en otro orden
+        return list(self.executor.map(upload_one, range(len(images)), images))
+    
+    def delete_images(self, blob_names: List[str]) -> Dict[str, bool]:
+        """
+        Elimina varias imágenes en paralelo.
+        
+        Args:
+            blob_names: Nombres de los archivos en la nube
+            
+        Returns:
+            Dict nombre → True si se eliminó correctamente
+        """
+        results = self.executor.map(self.delete_image, blob_names)
+        return dict(zip(blob_names, results))
     
     def delete_image(self, blob_name: str) -> bool:
         """
@@ -91,9 +242,75 @@ class GCPStorageService:
         """
         try:
             blob = self.bucket.blob(blob_name)
-            blob.delete()
+            blob.delete(timeout=self.upload_timeout)
             print(f"  🗑️  Imagen eliminada: {blob_name}")
             return True
         except Exception as e:
             print(f"  ⚠️  Error eliminando imagen: {e}")
             return False
+    
+    def blob_name_from_url(self, url: str) -> str:
+        """
+        Convierte una URL pública en el nombre del archivo en el bucket.
+        
+        Args:
+            url: URL pública (https://storage.googleapis.com/{bucket}/{blob})
+            
+        Returns:
+            str: Nombre del blob (ej: "reports/abc123/abc123_image_1.jpg")
+        """
+        prefix = f"https://storage.googleapis.com/{self.bucket_name}/"
+        if url.startswith(prefix):
+            return url[len(prefix):]
+        return url.split(f"/{self.bucket_name}/", 1)[-1]
+    
+    def public_url(self, blob_name: str) -> str:
+        """URL pública de un blob (sin consultar la red)."""
+        return self.bucket.blob(blob_name).public_url
+    
+    def gcs_uri(self, blob_name: str) -> str:
+        """URI gs:// de un blob (la que usan Document AI y otras APIs de Google)."""
+        return f"gs://{self.bucket_name}/{blob_name}"
+    
+    def list_blob_names(self, prefix: str) -> List[str]:
+        """
+        Lista los archivos del bucket que empiezan con un prefijo.
+        
+        Args:
+            prefix: Prefijo (ej: "documentai-batch/abc123/")
+            
+        Returns:
+            List[str]: Nombres de los blobs
+        """
+        return [blob.name for blob in self.client.list_blobs(self.bucket_name, prefix=prefix, timeout=self.upload_timeout)]
+    
+    def blob_exists(self, blob_name: str) -> bool:
+        """Indica si un archivo ya existe en el bucket."""
+        return self.bucket.blob(blob_name).exists(timeout=self.upload_timeout)
+    
+    def open_blob(self, blob_name: str) -> BinaryIO:
+        """
+        Abre un archivo del bucket para leerlo por partes (admite seek), sin
+        descargarlo entero. Sirve para recorrer un ZIP guardado en el bucket.
+        
+        Args:
+            blob_name: Nombre del archivo en la nube
+            
+        Returns:
+            Archivo binario de solo lectura (hay que cerrarlo)
+        """
+        return self.bucket.blob(blob_name).open("rb", timeout=self.upload_timeout)
+    
+    def download_bytes(self, blob_name: str) -> bytes:
+        """
+        Descarga un archivo del bucket a memoria.
+        
+        Args:
+            blob_name: Nombre del archivo en la nube
+            
+        Returns:
+            bytes: Contenido del archivo
+        """
+        blob = self.bucket.blob(blob_name)
+        # retry=None: los reintentos los hace _guarded
+        return self._guarded(lambda timeout: blob.download_as_bytes(timeout=timeout, retry=None))
@@ -0,0 +1,175 @@
+"""
+Generación de derivados de imágenes (miniaturas y vistas previas web).
+Reduce lo que descargan los clientes móviles al ver la galería de un reporte.
+"""
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+@dataclass(frozen=True)
+class DerivativeSpec:
+    """Un tamaño de derivado: nombre, lado máximo en píxeles, formato y calidad."""
+    name: str
+    max_size: int
+    format: str = "webp"
+    quality: int = 80
+
+    @property
+    def content_type(self) -> str:
+        return "image/webp" if self.format == "webp" else "image/jpeg"
+
+    @property
+    def extension(self) -> str:
+        return "webp" if self.format == "webp" else "jpg"
+
+
+def parse_derivative_specs(sizes: str, image_format: str = "webp", quality: int = 80) -> List[DerivativeSpec]:
+    """
+    Lee la configuración de tamaños.
+
+    Args:
+        sizes: "nombre:lado,nombre:lado" (ej: "thumb:256,preview:1280"). Vacío = sin derivados
+        image_format: "webp" o "jpeg"
+        quality: Calidad de compresión (1-100)
+
+    Returns:
+        Lista de DerivativeSpec
+    """
+    specs = []
+    for item in sizes.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, max_size = item.split(":")
+        specs.append(DerivativeSpec(name.strip(), int(max_size), image_format.lower(), quality))
+    return specs
+
+
+def render_derivative(data: bytes, max_size: int, image_format: str, quality: int) -> bytes:
+    """
+    Redimensiona una imagen y la codifica (se ejecuta en un proceso aparte).
+
+    Args:
+        data: Bytes de la imagen original (JPEG, PNG, JPEG2000)
+        max_size: Lado máximo del resultado (no se agranda)
+        image_format: "webp" o "jpeg"
+        quality: Calidad de compresión
+
+    Returns:
+        bytes: Imagen derivada
+    """
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (max_size, max_size))  # JPEG: decodifica ya reducida
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.thumbnail((max_size, max_size))
+
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+class ImageDerivativeService:
+    """
+    Genera miniaturas y vistas previas de las imágenes de un reporte.
+
+    Los derivados se guardan junto a los originales:
+    reports/{report_id}/{nombre del tamaño}/{imagen}.webp
+
+    El redimensionado usa un pool de procesos (Pillow consume CPU y el GIL
+    bloquearía al resto de la API). Los nombres son determinísticos, así
+    generar dos veces el mismo reporte no duplica nada y se pueden
+    completar reportes antiguos (backfill) saltando los que ya existen.
+    """
+
+    def __init__(self, storage_service, specs: List[DerivativeSpec], workers: int = 2):
+        """
+        Args:
+            storage_service: Instancia de GCPStorageService
+            specs: Tamaños a generar
+            workers: Procesos para redimensionar
+        """
+        self.storage_service = storage_service
+        self.specs = specs
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Pool de procesos, creado la primera vez que se usa."""
+        if self._pool is None:
+            # spawn: hacer fork de un proceso con hilos y canales gRPC no es seguro
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def shutdown(self):
+        """Cierra el pool de procesos."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def blob_name(self, report_id: str, spec: DerivativeSpec, original_filename: str) -> str:
+        """Nombre del derivado en el bucket."""
+        stem = os.path.splitext(os.path.basename(original_filename))[0]
+        return f"reports/{report_id}/{spec.name}/{stem}.{spec.extension}"
+
+    def generate(
+        self,
+        report_id: str,
+        originals: List[Tuple[str, Callable[[], bytes]]],
+        skip_existing: bool = False
+    ) -> Dict[str, List[str]]:
+        """
+        Genera y sube los derivados de un reporte.
+
+        Args:
+            report_id: ID del reporte
+            originals: (nombre de archivo, función que devuelve sus bytes) por
+                       imagen, en el orden de image_urls
+            skip_existing: No regenerar derivados que ya están en el bucket
+
+        Returns:
+            Dict tamaño → URLs en el mismo orden que las imágenes originales
+        """
+        derivatives: Dict[str, List[Optional[str]]] = {
+            spec.name: [None] * len(originals) for spec in self.specs
+        }
+        pending = []
+
+        for index, (filename, load) in enumerate(originals):
+            missing = []
+            for spec in self.specs:
+                blob_name = self.blob_name(report_id, spec, filename)
+                if skip_existing and self.storage_service.blob_exists(blob_name):
+                    derivatives[spec.name][index] = self.storage_service.public_url(blob_name)
+                else:
+                    missing.append((spec, blob_name))
+            if not missing:
+                continue
+
+            data = load()
+            for spec, blob_name in missing:
+                future = self.pool.submit(render_derivative, data, spec.max_size, spec.format, spec.quality)
+                pending.append((index, spec, blob_name, future))
+
+        for index, spec, blob_name, future in pending:
+            try:
+                url = self.storage_service.upload_image_bytes(future.result(), blob_name, spec.content_type)
+                derivatives[spec.name][index] = url
+            except Exception as e:
+                print(f"  ⚠️  Error generando derivado {blob_name}: {e}")
+
+        print(f"🖼️  Derivados listos para {report_id}: {', '.join(spec.name for spec in self.specs)}")
+        return derivatives
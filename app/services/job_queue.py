@@ -0,0 +1,185 @@
+"""
+Cola de trabajos en segundo plano.
+Procesa los reportes subidos en modo asíncrono con un pool acotado de workers.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.services.report_pipeline import PIPELINE_STAGES
+
+
+# Error de los trabajos que no terminaron porque la instancia se detuvo
+STOPPED_ERROR = "La instancia se detuvo antes de terminar el trabajo; volver a subir el PDF"
+
+@dataclass
+class Job:
+    """
+    Trabajo pendiente: un PDF ya recibido esperando ser procesado.
+
+    El PDF no se guarda en la cola sino en Cloud Storage (input_blob): la
+    cola solo ocupa unos bytes por trabajo y el PDF no se pierde si la
+    instancia se apaga.
+    """
+    report_id: str
+    input_blob: str
+    pdf_filename: str
+    content_sha256: Optional[str] = None
+
+
+class JobQueueFullError(Exception):
+    """Se lanza cuando la cola de trabajos no admite más elementos."""
+
+
+class JobQueue:
+    """
+    Pool de workers en proceso que ejecuta el ReportPipeline.
+
+    Ciclo de vida de un trabajo (campo "status" en Firestore):
+    queued → processing → processed | failed
+
+    El progreso de cada etapa se guarda en el campo "progress" del reporte
+    usando FirestoreService.update_report, así GET /jobs/{id} puede
+    consultarlo desde cualquier instancia.
+
+    Cada worker descarga el PDF de Cloud Storage al empezar el trabajo y
+    borra la copia al terminar (procesado o fallido). El pipeline espera su
+    turno en el cupo de uploads como cualquier otro PDF.
+    """
+
+    def __init__(self, pipeline, firestore_service, workers: int = 2, max_size: int = 100):
+        """
+        Inicializa la cola (los workers arrancan con start()).
+
+        Args:
+            pipeline: Instancia de ReportPipeline
+            firestore_service: Instancia de FirestoreService
+            workers: Número de trabajos que se procesan a la vez
+            max_size: Máximo de trabajos esperando en la cola
+        """
+        self.pipeline = pipeline
+        self.firestore_service = firestore_service
+        self.workers = workers
+        self.max_size = max_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @staticmethod
+    def initial_progress() -> dict:
+        """Progreso inicial: todas las etapas pendientes."""
+        return {stage: "pending" for stage in PIPELINE_STAGES}
+
+    def start(self):
+        """Arranca los workers en el event loop actual."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        print(f"✅ Cola de trabajos iniciada: {self.workers} workers, máximo {self.max_size} en espera")
+
+    async def stop(self):
+        """
+        Detiene los workers. Los trabajos que no llegaron a terminar quedan
+        como failed (con su huella liberada y su PDF borrado): el cliente lo
+        ve en GET /jobs/{id} y puede volver a subir el PDF.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        abandoned = []
+        while self._queue is not None and not self._queue.empty():
+            abandoned.append(self._queue.get_nowait())
+        await asyncio.gather(*(self._abandon(job) for job in abandoned), return_exceptions=True)
+
+    def qsize(self) -> int:
+        """Trabajos esperando en la cola."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, job: Job):
+        """
+        Encola un trabajo sin bloquear.
+
+        Args:
+            job: Trabajo a procesar
+
+        Raises:
+            JobQueueFullError: Si la cola está llena o no se inició
+        """
+        if self._queue is None:
+            raise JobQueueFullError("La cola de trabajos no está iniciada")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError("La cola de trabajos está llena")
+        print(f"📥 Trabajo encolado: {job.report_id} ({self._queue.qsize()} en espera)")
+
+    async def _worker(self, worker_id: int):
+        """Toma trabajos de la cola y los procesa uno a la vez."""
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except Exception as e:
+                print(f"❌ Worker {worker_id}: error inesperado en {job.report_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: Job):
+        """Ejecuta el pipeline de un trabajo actualizando su estado en Firestore."""
+        progress = self.initial_progress()
+        await self._update(job.report_id, {"status": "processing"})
+
+        def on_stage(stage: str, state: str):
+            # Se llama desde el executor del pipeline: puede bloquear
+            progress[stage] = state
+            self.firestore_service.update_report(job.report_id, {f"progress.{stage}": state})
+
+        storage_service = self.pipeline.storage_service
+        try:
+            pdf_content = await self.pipeline.run_blocking(storage_service.download_bytes, job.input_blob)
+            report_data = await self.pipeline.run(
+                report_id=job.report_id,
+                pdf_content=pdf_content,
+                pdf_filename=job.pdf_filename,
+                on_stage=on_stage,
+                content_sha256=job.content_sha256,
+                wait_for_slot=True
+            )
+            await self._update(job.report_id, {
+                "status": "processed",
+                "progress": progress
+            })
+            print(f"✅ Trabajo completado: {job.report_id} ({report_data['image_count']} imágenes)")
+        except asyncio.CancelledError:
+            await self._fail(job, progress, STOPPED_ERROR)
+            raise
+        except Exception as e:
+            await self._fail(job, progress, str(e))
+            print(f"❌ Trabajo fallido: {job.report_id}: {e}")
+        finally:
+            await self.pipeline.run_blocking(storage_service.delete_image, job.input_blob)
+
+    async def _abandon(self, job: Job):
+        """Da por fallido un trabajo que seguía en la cola al detenerla."""
+        await self._fail(job, self.initial_progress(), STOPPED_ERROR)
+        await self.pipeline.run_blocking(self.pipeline.storage_service.delete_image, job.input_blob)
+
+    async def _fail(self, job: Job, progress: dict, error: str):
+        """Marca el trabajo como failed y libera su huella (el PDF debe poder reintentarse)."""
+        if job.content_sha256:
+            await self.pipeline.run_blocking(
+                self.firestore_service.delete_fingerprint, job.content_sha256, job.report_id
+            )
+        await self._update(job.report_id, {
+            "status": "failed",
+            "progress": progress,
+            "error": error
+        })
+
+    async def _update(self, report_id: str, updates: dict):
+        """Actualiza el registro del trabajo sin bloquear el event loop."""
+        await self.pipeline.run_blocking(self.firestore_service.update_report, report_id, updates)
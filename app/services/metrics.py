@@ -0,0 +1,194 @@
+"""
+Métricas de la aplicación en formato Prometheus (GET /metrics).
+Latencia por etapa del pipeline y por endpoint, contadores de imágenes,
+bytes subidos, errores de Document AI y uso de las cachés.
+
+Los histogramas y contadores de prometheus_client son un incremento bajo
+un lock por observación: se pueden dejar activos en producción.
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+# Buckets en segundos: desde lecturas de Firestore (ms) hasta OCR de PDFs grandes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_DURATION = Histogram(
+    "diagnovet_stage_duration_seconds",
+    "Duración de cada etapa del pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_FAILURES = Counter(
+    "diagnovet_stage_failures_total",
+    "Etapas del pipeline que terminaron con error",
+    ["stage"]
+)
+
+HTTP_DURATION = Histogram(
+    "diagnovet_http_request_duration_seconds",
+    "Duración de las peticiones HTTP por endpoint",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge(
+    "diagnovet_http_requests_in_progress",
+    "Peticiones HTTP en curso"
+)
+JOBS_WAITING = Gauge(
+    "diagnovet_jobs_waiting",
+    "Trabajos del modo asíncrono esperando en la cola"
+)
+
+DERIVATIVES_PENDING = Gauge(
+    "diagnovet_derivatives_pending",
+    "Reportes con miniaturas en curso o esperando hilo"
+)
+DERIVATIVES_SKIPPED = Counter(
+    "diagnovet_derivatives_skipped_total",
+    "Reportes guardados sin miniaturas porque la cola de derivados estaba llena"
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "diagnovet_admission_in_flight",
+    "Peticiones ejecutándose por presupuesto de admisión",
+    ["budget"]  # uploads | reads
+)
+ADMISSION_QUEUED = Gauge(
+    "diagnovet_admission_queued",
+    "Peticiones esperando turno por presupuesto de admisión",
+    ["budget"]
+)
+ADMISSION_LIMIT = Gauge(
+    "diagnovet_admission_limit",
+    "Ejecuciones concurrentes permitidas por presupuesto de admisión",
+    ["budget"]
+)
+ADMISSION_REJECTED = Counter(
+    "diagnovet_admission_rejected_total",
+    "Peticiones rechazadas con 429 por presupuesto de admisión",
+    ["budget", "reason"]  # queue_full | timeout
+)
+
+STARTUP_DURATION = Gauge(
+    "diagnovet_startup_duration_seconds",
+    "Tiempo de importación/inicialización de cada componente al arrancar",
+    ["component", "phase"]  # phase: import | init
+)
+STARTUP_READY = Gauge(
+    "diagnovet_startup_ready_seconds",
+    "Segundos desde la importación de app.main hasta que los servicios están listos"
+)
+
+IMAGES_EXTRACTED = Counter(
+    "diagnovet_images_extracted_total",
+    "Imágenes extraídas de los PDFs"
+)
+BYTES_UPLOADED = Counter(
+    "diagnovet_storage_uploaded_bytes_total",
+    "Bytes subidos a Cloud Storage"
+)
+
+DOCUMENTAI_REQUESTS = Counter(
+    "diagnovet_documentai_requests_total",
+    "Llamadas process_document a Document AI",
+    ["result"]  # ok | error
+)
+DOCUMENTAI_ERRORS = Counter(
+    "diagnovet_documentai_errors_total",
+    "Extracciones con Document AI que fallaron (el pipeline usa los campos de la capa de texto)"
+)
+EXTRACTION_TIER = Counter(
+    "diagnovet_extraction_tier_total",
+    "Reportes según el nivel que produjo sus campos",
+    ["tier"]
+)
+DOCUMENTAI_FALLBACKS = Counter(
+    "diagnovet_documentai_fallbacks_total",
+    "Veces que se descartó el resultado de Document AI y se usó la capa de texto",
+    ["reason"]  # fewer_fields | error | circuit_open
+)
+
+CIRCUIT_STATE = Gauge(
+    "diagnovet_circuit_state",
+    "Estado del circuit breaker de cada dependencia (0 = cerrado, 1 = prueba, 2 = abierto)",
+    ["dependency"]  # documentai | storage
+)
+CIRCUIT_REJECTED = Counter(
+    "diagnovet_circuit_rejected_total",
+    "Llamadas que no se hicieron porque el circuito estaba abierto",
+    ["dependency"]
+)
+DEPENDENCY_RETRIES = Counter(
+    "diagnovet_dependency_retries_total",
+    "Reintentos de llamadas a dependencias por errores transitorios",
+    ["dependency"]
+)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """
+    Mide la duración de una etapa y cuenta sus fallos.
+
+    Uso:
+        with timed_stage("parse"):
+            ...
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_FAILURES.labels(stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage).observe(time.perf_counter() - start)
+
+
+class CacheStatsCollector:
+    """
+    Expone los contadores de las cachés (CacheBackend.stats) al momento
+    de leer /metrics, sin sumar trabajo a cada get/set.
+    """
+
+    def __init__(self):
+        self._caches: Dict[str, object] = {}
+
+    def register(self, name: str, cache):
+        """Agrega una caché (si es None se ignora)."""
+        if cache is not None:
+            self._caches[name] = cache
+
+    def collect(self):
+        families = {
+            "hits": CounterMetricFamily("diagnovet_cache_hits", "Aciertos de caché", labels=["cache"]),
+            "misses": CounterMetricFamily("diagnovet_cache_misses", "Fallos de caché", labels=["cache"]),
+            "evictions": CounterMetricFamily("diagnovet_cache_evictions", "Elementos descartados por tamaño", labels=["cache"]),
+            "expirations": CounterMetricFamily("diagnovet_cache_expirations", "Elementos descartados por TTL", labels=["cache"]),
+            "errors": CounterMetricFamily("diagnovet_cache_errors", "Errores del almacén de la caché (se leyó de Firestore)", labels=["cache"]),
+        }
+        size = GaugeMetricFamily("diagnovet_cache_size", "Elementos en caché", labels=["cache"])
+
+        for name, cache in list(self._caches.items()):
+            stats = cache.stats()
+            for key, family in families.items():
+                family.add_metric([name], stats.get(key, 0))
+            if "size" in stats:
+                size.add_metric([name], stats["size"])
+
+        yield from families.values()
+        yield size
+
+
+CACHE_STATS = CacheStatsCollector()
+REGISTRY.register(CACHE_STATS)
+
+
+def render_metrics() -> bytes:
+    """Todas las métricas en formato de texto de Prometheus."""
+    return generate_latest(REGISTRY)
+
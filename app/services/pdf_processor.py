@@ -3,11 +3,165 @@ Servicio para procesar PDFs.
 Extrae texto e imágenes de archivos PDF.
 """
 import os
-from typing import List, Dict
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import List, Dict, Optional, Tuple, Union
 from PyPDF2 import PdfReader
+from PyPDF2.generic import IndirectObject, TextStringObject
 from PIL import Image
+import hashlib
 import io
 
+from app.services import metrics
+from app.services.documentai_client import get_documentai_manager
+from app.services.field_extraction import extract_fields
+from app.services.resilience import Deadline, get_guard
+
+
+class ParsedPDF:
+    """
+    PDF abierto una sola vez y compartido por todas las extracciones.
+    
+    Lee los bytes del archivo una vez, construye un único PdfReader y
+    calcula de forma perezosa (solo si alguien lo pide) el texto de cada
+    página y la lista de imágenes. Así extract_text, extract_images y
+    Document AI no vuelven a leer ni a parsear el archivo.
+    """
+    
+    def __init__(self, content: bytes, path: Optional[str] = None):
+        """
+        Args:
+            content: Bytes del PDF
+            path: Ruta de origen (solo informativa)
+        """
+        self.content = content
+        self.path = path
+        self.reader = PdfReader(io.BytesIO(content))
+        
+        # PdfReader comparte un único stream: serializamos el acceso
+        self._lock = threading.RLock()
+        self._page_texts: Dict[int, str] = {}
+        self._image_xobjects: Optional[List[Tuple[int, str, object]]] = None
+    
+    @classmethod
+    def from_path(cls, pdf_path: str) -> "ParsedPDF":
+        """Lee el PDF del disco una sola vez."""
+        with open(pdf_path, "rb") as pdf_file:
+            return cls(pdf_file.read(), path=pdf_path)
+    
+    @property
+    def pages(self):
+        """Páginas del PDF (PyPDF2)."""
+        return self.reader.pages
+    
+    @property
+    def num_pages(self) -> int:
+        """Número de páginas."""
+        return len(self.reader.pages)
+    
+    def page_text(self, page_num: int) -> str:
+        """
+        Texto de una página (se calcula la primera vez y se guarda).
+        
+        Args:
+            page_num: Índice de la página (desde 0)
+        """
+        with self._lock:
+            if page_num not in self._page_texts:
+                self._page_texts[page_num] = self.reader.pages[page_num].extract_text() or ""
+            return self._page_texts[page_num]
+    
+    def split_pages(self, pages_per_shard: int) -> List[Tuple[int, int, bytes]]:
+        """
+        Divide el PDF en PDFs más chicos por rangos de páginas.
+        
+        Args:
+            pages_per_shard: Páginas de cada fragmento
+            
+        Returns:
+            Lista de (primera página, última página + 1, bytes del fragmento)
+        """
+        from PyPDF2 import PdfWriter
+        
+        shards = []
+        with self._lock:
+            for start in range(0, self.num_pages, pages_per_shard):
+                end = min(start + pages_per_shard, self.num_pages)
+                writer = PdfWriter()
+                for page_num in range(start, end):
+                    writer.add_page(self.reader.pages[page_num])
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                shards.append((start, end, buffer.getvalue()))
+        return shards
+    
+    @property
+    def text(self) -> str:
+        """Texto completo con separadores de página."""
+        text = ""
+        for page_num in range(self.num_pages):
+            text += f"\n--- Página {page_num + 1} ---\n{self.page_text(page_num)}"
+        return text
+    
+    def image_xobjects(self) -> List[Tuple[int, str, object]]:
+        """
+        Imágenes (XObject con /Subtype /Image) de todas las páginas.
+        
+        Una imagen compartida por varias páginas (logo, marca de agua) es
+        un mismo objeto indirecto: se devuelve una sola vez, en la primera
+        página donde aparece.
+        
+        Returns:
+            Lista de (número de página, nombre del XObject, objeto)
+        """
+        with self._lock:
+            if self._image_xobjects is None:
+                images = []
+                seen_refs = set()
+                for page_num, page in enumerate(self.reader.pages):
+                    resources = page.get('/Resources')
+                    if resources is None or '/XObject' not in resources:
+                        continue
+                    x_objects = resources['/XObject'].get_object()
+                    for obj_name in x_objects:
+                        # Referencia indirecta (número de objeto, generación)
+                        raw = x_objects.raw_get(obj_name)
+                        if isinstance(raw, IndirectObject):
+                            ref = (raw.idnum, raw.generation)
+                            if ref in seen_refs:
+                                continue
+                            seen_refs.add(ref)
+                        obj = raw.get_object()
+                        if obj.get('/Subtype') == '/Image':
+                            images.append((page_num, obj_name, obj))
+                self._image_xobjects = images
+            return self._image_xobjects
+
+
+@dataclass
+class ExtractedImage:
+    """Imagen extraída en memoria, lista para subir sin pasar por el disco."""
+    data: bytes
+    content_type: str
+    filename: str
+
+
+# Las extracciones aceptan una ruta, los bytes del PDF o un ParsedPDF ya abierto
+PDFSource = Union[str, bytes, ParsedPDF]
+
+
+@dataclass
+class TextLayerExtraction:
+    """Campos extraídos de la capa de texto del PDF (sin OCR) y qué tan completos son."""
+    fields: Dict[str, Optional[str]]
+    fields_found: int
+    chars_per_page: float
+    
+    def is_confident(self, min_fields: int, min_chars_per_page: float) -> bool:
+        """True si alcanza para no llamar a Document AI."""
+        return self.fields_found >= min_fields and self.chars_per_page >= min_chars_per_page
+
 
 class PDFProcessor:
     """
@@ -17,158 +171,365 @@ class PDFProcessor:
     Fase 2 (GCP): Integrará Document AI para extracción avanzada
     """
     
-    def __init__(self):
-        """Inicializa el procesador de PDFs."""
+    # Imágenes que ya vienen codificadas y se copian byte a byte:
+    # filtro → (tipo MIME, extensión)
+    PASSTHROUGH_FILTERS = {
+        '/DCTDecode': ("image/jpeg", "jpg"),
+        '/JPXDecode': ("image/jp2", "jp2"),
+    }
+    
+    def __init__(
+        self,
+        min_image_pixels: int = 0,
+        ocr_shard_threshold_pages: int = 15,
+        ocr_shard_pages: int = 10,
+        ocr_shard_concurrency: int = 4,
+        ocr_shard_retries: int = 2
+    ):
+        """
+        Inicializa el procesador de PDFs.
+        
+        Args:
+            min_image_pixels: Las imágenes con menos píxeles (ancho × alto) se
+                              descartan (íconos, separadores decorativos)
+            ocr_shard_threshold_pages: PDFs con más páginas se envían a Document AI
+                                       en fragmentos (0 = nunca)
+            ocr_shard_pages: Páginas por fragmento
+            ocr_shard_concurrency: Fragmentos procesados a la vez
+            ocr_shard_retries: Reintentos de cada fragmento que falla
+        """
         self.output_dir = "extracted_images"
+        self.min_image_pixels = min_image_pixels
+        self.ocr_shard_threshold_pages = ocr_shard_threshold_pages
+        self.ocr_shard_pages = ocr_shard_pages
+        self.ocr_shard_retries = ocr_shard_retries
+        self.ocr_executor = ThreadPoolExecutor(max_workers=ocr_shard_concurrency, thread_name_prefix="ocr-shard")
         os.makedirs(self.output_dir, exist_ok=True)
     
-    def extract_text(self, pdf_path: str) -> str:
+    def shutdown(self):
+        """Libera los hilos del OCR por fragmentos."""
+        self.ocr_executor.shutdown(wait=False, cancel_futures=True)
+    
+    def open(self, pdf_path: str) -> ParsedPDF:
         """
-        Extrae todo el texto de un PDF.
+        Abre un PDF una sola vez para compartirlo entre extracciones.
         
         Args:
             pdf_path: Ruta al archivo PDF
             
+        Returns:
+            ParsedPDF: Documento parseado
+        """
+        return ParsedPDF.from_path(pdf_path)
+    
+    def _as_document(self, pdf: PDFSource) -> ParsedPDF:
+        """Acepta una ruta, bytes o un ParsedPDF y devuelve siempre el ParsedPDF."""
+        if isinstance(pdf, ParsedPDF):
+            return pdf
+        if isinstance(pdf, bytes):
+            return ParsedPDF(pdf)
+        return self.open(pdf)
+    
+    def extract_text(self, pdf: PDFSource) -> str:
+        """
+        Extrae todo el texto de un PDF.
+        
+        Args:
+            pdf: Ruta al archivo PDF o ParsedPDF ya abierto
+            
         Returns:
             str: Texto completo del PDF
         """
         try:
-            reader = PdfReader(pdf_path)
-            text = ""
-            
-            # Iterar por cada página y extraer texto
-            for page_num, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                text += f"\n--- Página {page_num + 1} ---\n{page_text}"
-            
-            return text
+            return self._as_document(pdf).text
         
         except Exception as e:
             print(f"❌ Error extrayendo texto del PDF: {e}")
             return ""
     
-    def extract_images(self, pdf_path: str, report_id: str) -> List[str]:
+    def extract_fields_from_text_layer(self, pdf: PDFSource) -> TextLayerExtraction:
         """
-        Extrae imágenes de un PDF.
+        Extrae los campos del texto que ya trae el PDF (PyPDF2), sin OCR.
+        
+        Los PDFs generados digitalmente tienen una capa de texto completa;
+        los escaneados casi no tienen texto y necesitan Document AI.
         
         Args:
-            pdf_path: Ruta al archivo PDF
+            pdf: Ruta al archivo PDF, sus bytes o un ParsedPDF ya abierto
+            
+        Returns:
+            TextLayerExtraction: campos, cuántos se encontraron y caracteres por página
+        """
+        document = self._as_document(pdf)
+        pages = [document.page_text(page_num) for page_num in range(document.num_pages)]
+        text = "\n".join(pages)
+        
+        fields = self._extract_fields_from_text(text)
+        return TextLayerExtraction(
+            fields=fields,
+            fields_found=sum(1 for value in fields.values() if value),
+            chars_per_page=len(text.strip()) / max(len(pages), 1)
+        )
+    
+    def extract_images(self, pdf: PDFSource, report_id: str) -> List[str]:
+        """
+        Extrae imágenes de un PDF y las guarda en disco.
+        
+        Args:
+            pdf: Ruta al archivo PDF o ParsedPDF ya abierto
             report_id: ID del reporte (para nombrar las imágenes)
             
         Returns:
             List[str]: Lista de rutas a las imágenes extraídas
         """
+        image_paths = []
+        
+        for image in self.extract_images_in_memory(pdf, report_id):
+            img_path = os.path.join(self.output_dir, image.filename)
+            with open(img_path, "wb") as img_file:
+                img_file.write(image.data)
+            image_paths.append(img_path)
+        
+        return image_paths
+    
+    def extract_images_in_memory(self, pdf: PDFSource, report_id: str) -> List[ExtractedImage]:
+        """
+        Extrae imágenes de un PDF sin tocar el disco.
+        
+        - JPEG y JPEG2000 se copian byte a byte (sin decodificar)
+        - Las demás se decodifican según /ColorSpace y /BitsPerComponent
+          y se codifican como PNG
+        - Las imágenes repetidas (mismo objeto o mismo contenido) se
+          extraen una sola vez
+        - Las menores a min_image_pixels se descartan
+        
+        Args:
+            pdf: Ruta al archivo PDF o ParsedPDF ya abierto
+            report_id: ID del reporte (para nombrar las imágenes)
+            
+        Returns:
+            List[ExtractedImage]: Bytes de cada imagen con su tipo y nombre sugerido
+        """
         try:
-            reader = PdfReader(pdf_path)
-            image_paths = []
+            document = self._as_document(pdf)
+            images = []
+            seen_hashes = set()
             image_counter = 0
             
-            # Iterar por cada página
-            for page_num, page in enumerate(reader.pages):
-                # Intentar extraer imágenes de la página
-                if '/XObject' in page['/Resources']:
-                    x_objects = page['/Resources']['/XObject'].get_object()
+            # Iterar por cada imagen (única) de cada página
+            for page_num, obj_name, obj in document.image_xobjects():
+                try:
+                    # Leer el diccionario de la imagen (/Width, /ColorSpace,
+                    # paleta, perfil ICC) puede resolver objetos indirectos
+                    # con el stream compartido del PdfReader: se hace con el
+                    # mismo lock que page_text y split_pages
+                    with document._lock:
+                        width, height = obj['/Width'], obj['/Height']
+                        if width * height < self.min_image_pixels:
+                            continue
+                        decoded = self._decode_image(obj)
                     
-                    for obj_name in x_objects:
-                        obj = x_objects[obj_name]
-                        
-                        # Verificar si es una imagen
-                        if obj['/Subtype'] == '/Image':
-                            try:
-                                # Extraer datos de la imagen
-                                size = (obj['/Width'], obj['/Height'])
-                                data = obj.get_data()
-                                
-                                # Determinar formato
-                                if '/Filter' in obj:
-                                    filter_type = obj['/Filter']
-                                    
-                                    # Imágenes JPEG
-                                    if filter_type == '/DCTDecode':
-                                        image_counter += 1
-                                        img_filename = f"{report_id}_image_{image_counter}.jpg"
-                                        img_path = os.path.join(self.output_dir, img_filename)
-                                        
-                                        with open(img_path, "wb") as img_file:
-                                            img_file.write(data)
-                                        
-                                        image_paths.append(img_path)
-                                        print(f"  ✅ Imagen extraída: {img_filename}")
-                                    
-                                    # Otras imágenes (PNG, etc.)
-                                    elif filter_type in ['/FlateDecode', '/JPXDecode']:
-                                        image_counter += 1
-                                        img_filename = f"{report_id}_image_{image_counter}.png"
-                                        img_path = os.path.join(self.output_dir, img_filename)
-                                        
-                                        # Convertir a imagen PIL y guardar
-                                        img = Image.frombytes('RGB', size, data)
-                                        img.save(img_path)
-                                        
-                                        image_paths.append(img_path)
-                                        print(f"  ✅ Imagen extraída: {img_filename}")
-                            
-                            except Exception as img_error:
-                                print(f"  ⚠️  Error extrayendo una imagen: {img_error}")
-                                continue
+                    encoded = self._encode_image(decoded)
+                    if encoded is None:
+                        continue
+                    data, content_type, extension = encoded
+                    
+                    # Misma imagen guardada en objetos distintos
+                    digest = hashlib.sha256(data).digest()
+                    if digest in seen_hashes:
+                        continue
+                    seen_hashes.add(digest)
+                    
+                    image_counter += 1
+                    img_filename = f"{report_id}_image_{image_counter}.{extension}"
+                    images.append(ExtractedImage(data, content_type, img_filename))
+                    print(f"  ✅ Imagen extraída: {img_filename}")
+                
+                except Exception as img_error:
+                    print(f"  ⚠️  Error extrayendo una imagen: {img_error}")
+                    continue
             
-            return image_paths
+            return images
         
         except Exception as e:
             print(f"❌ Error extrayendo imágenes del PDF: {e}")
             return []
     
+    def _decode_image(self, obj) -> Optional[Union[Tuple[bytes, str, str], Image.Image]]:
+        """
+        Lee los datos de un XObject de imagen.
+        
+        Es la única parte que toca el PdfReader: quien la llama tiene que
+        tener el lock del ParsedPDF.
+        
+        Args:
+            obj: XObject con /Subtype /Image
+            
+        Returns:
+            (bytes, tipo MIME, extensión) si la imagen ya es un archivo
+            (DCT/JPX), la imagen PIL decodificada, o None si el formato no
+            se soporta
+        """
+        filters = obj.get('/Filter', [])
+        if not isinstance(filters, list):
+            filters = [filters]
+        last_filter = filters[-1] if filters else None
+        
+        # get_data() aplica los filtros previos (ej. Flate) y deja el último
+        # (DCT/JPX) sin decodificar: son los bytes del .jpg/.jp2 originales
+        data = obj.get_data()
+        if last_filter in self.PASSTHROUGH_FILTERS:
+            content_type, extension = self.PASSTHROUGH_FILTERS[last_filter]
+            return data, content_type, extension
+        
+        return self._decode_raw_image(obj, data)
+    
+    @staticmethod
+    def _encode_image(decoded) -> Optional[Tuple[bytes, str, str]]:
+        """
+        Convierte el resultado de _decode_image en un archivo de imagen.
+        
+        Args:
+            decoded: Resultado de _decode_image
+            
+        Returns:
+            (bytes, tipo MIME, extensión), o None si el formato no se soporta
+        """
+        if decoded is None or isinstance(decoded, tuple):
+            return decoded
+        
+        buffer = io.BytesIO()
+        decoded.save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png", "png"
+    
+    def _decode_raw_image(self, obj, data: bytes) -> Optional[Image.Image]:
+        """
+        Interpreta los píxeles crudos (ya sin Flate) según el espacio de color.
+        
+        Soporta DeviceGray, DeviceRGB, DeviceCMYK, ICCBased, Indexed e
+        /ImageMask con 1, 2, 4 u 8 bits por componente.
+        
+        Returns:
+            Imagen PIL, o None si el formato no se soporta
+        """
+        size = (obj['/Width'], obj['/Height'])
+        bits = obj.get('/BitsPerComponent', 1 if obj.get('/ImageMask') else 8)
+        
+        if obj.get('/ImageMask'):
+            return Image.frombytes('1', size, data, 'raw', '1;I')
+        
+        color_space = obj.get('/ColorSpace', '/DeviceRGB')
+        if isinstance(color_space, IndirectObject):
+            color_space = color_space.get_object()
+        
+        if isinstance(color_space, list) and color_space[0] == '/Indexed':
+            return self._decode_indexed_image(size, bits, color_space, data)
+        
+        components = self._color_components(color_space)
+        if components == 1:
+            rawmode = 'L' if bits == 8 else f'L;{bits}'
+            if bits == 1:
+                return Image.frombytes('1', size, data, 'raw', '1')
+            return Image.frombytes('L', size, data, 'raw', rawmode)
+        if components == 3 and bits == 8:
+            return Image.frombytes('RGB', size, data)
+        if components == 4 and bits == 8:
+            # PNG no admite CMYK
+            return Image.frombytes('CMYK', size, data).convert('RGB')
+        
+        print(f"  ⚠️  Formato de imagen no soportado: {color_space} ({bits} bits)")
+        return None
+    
+    def _decode_indexed_image(self, size, bits: int, color_space: list, data: bytes) -> Optional[Image.Image]:
+        """Imagen con paleta: [/Indexed base hival lookup]."""
+        base = color_space[1].get_object() if isinstance(color_space[1], IndirectObject) else color_space[1]
+        lookup = color_space[3].get_object() if isinstance(color_space[3], IndirectObject) else color_space[3]
+        if hasattr(lookup, 'get_data'):
+            lookup = lookup.get_data()
+        elif isinstance(lookup, TextStringObject):
+            lookup = lookup.get_original_bytes()
+        else:
+            lookup = bytes(lookup)
+        
+        components = self._color_components(base)
+        if components == 1:
+            palette = b"".join(bytes([value]) * 3 for value in lookup)
+        elif components == 3:
+            palette = lookup
+        else:
+            print(f"  ⚠️  Paleta no soportada: {base}")
+            return None
+        
+        rawmode = 'P' if bits == 8 else f'P;{bits}'
+        img = Image.frombytes('P', size, data, 'raw', rawmode)
+        img.putpalette(palette[:768])
+        return img
+    
+    @staticmethod
+    def _color_components(color_space) -> Optional[int]:
+        """Número de componentes de un espacio de color (1, 3 o 4)."""
+        if isinstance(color_space, list):
+            if color_space[0] == '/ICCBased':
+                return int(color_space[1].get_object().get('/N', 3))
+            if color_space[0] in ('/CalRGB', '/Lab'):
+                return 3
+            if color_space[0] == '/CalGray':
+                return 1
+            return None
+        return {
+            '/DeviceGray': 1,
+            '/DeviceRGB': 3,
+            '/DeviceCMYK': 4,
+        }.get(color_space)
+    
     def extract_fields_with_document_ai(
         self, 
-        pdf_path: str, 
+        pdf_path: PDFSource, 
         project_id: str, 
         location: str, 
-        processor_id: str
+        processor_id: str,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, str]:
         """
         Extrae campos específicos usando Google Document AI OCR Processor.
         
+        Cada llamada tiene timeout (el menor entre DOCUMENTAI_TIMEOUT y lo
+        que queda del deadline), se reintenta ante errores transitorios y
+        pasa por el circuit breaker de Document AI.
+        
         Args:
-            pdf_path: Ruta al archivo PDF
+            pdf_path: Ruta al archivo PDF, sus bytes o un ParsedPDF ya abierto (reutiliza sus bytes)
             project_id: ID del proyecto de GCP
             location: Región del procesador (us, eu)
             processor_id: ID del procesador de Document AI
+            deadline: Presupuesto de la petición (opcional)
             
         Returns:
             Dict con los campos extraídos: patient_name, owner_name, etc.
+            
+        Raises:
+            CircuitOpenError: Si Document AI está degradado (no se llama)
+            DeadlineExceededError: Si se agotó el presupuesto de la petición
+            Exception: El error de Document AI si falla después de los reintentos
         """
         try:
-            from google.cloud import documentai_v1 as documentai
-            
-            # Inicializar cliente de Document AI
-            opts = {"api_endpoint": f"{location}-documentai.googleapis.com"}
-            client = documentai.DocumentProcessorServiceClient(client_options=opts)
+            # Cliente compartido del proceso (canal gRPC y token reutilizados)
+            manager = get_documentai_manager()
+            client = manager.get_client(location)
             
-            # Construir el nombre completo del procesador
-            processor_name = client.processor_path(project_id, location, processor_id)
+            # Nombre completo del procesador
+            processor_name = manager.processor_name(project_id, location, processor_id)
             
-            # Leer el contenido del PDF
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_content = pdf_file.read()
+            # PDF ya en memoria si viene un ParsedPDF
+            document = self._as_document(pdf_path)
             
-            # Crear la solicitud de procesamiento
-            raw_document = documentai.RawDocument(
-                content=pdf_content,
-                mime_type="application/pdf"
-            )
-            
-            request = documentai.ProcessRequest(
-                name=processor_name,
-                raw_document=raw_document
-            )
-            
-            # Procesar el documento
             print(f"🤖 Procesando documento con Document AI OCR...")
-            result = client.process_document(request=request)
-            document = result.document
+            if self.ocr_shard_threshold_pages and document.num_pages > self.ocr_shard_threshold_pages:
+                # PDFs grandes: por rangos de páginas en paralelo (y bajo el límite de páginas en línea)
+                full_text = self._ocr_sharded(client, processor_name, document, deadline)
+            else:
+                full_text = self._ocr(client, processor_name, document.content, deadline)
             
-            # Extraer el texto completo
-            full_text = document.text
             print(f"📄 Texto extraído por Document AI: {len(full_text)} caracteres")
             
             # Como el Custom Extractor no tiene esquema configurado,
@@ -185,21 +546,216 @@ class PDFProcessor:
             return extracted_fields
             
         except Exception as e:
+            # Quien llama decide qué hacer (ReportPipeline usa la capa de texto)
+            metrics.DOCUMENTAI_ERRORS.inc()
             print(f"❌ Error procesando con Document AI: {e}")
-            import traceback
-            traceback.print_exc()
-            # En caso de error, retornar campos vacíos
-            return {
-                "patient_name": None,
-                "owner_name": None,
-                "veterinarian_name": None,
-                "diagnosis": None,
-                "recommendations": None
-            }
+            raise
+    
+    def _ocr(self, client, processor_name: str, pdf_content: bytes,
+             deadline: Optional[Deadline] = None, attempts: Optional[int] = None) -> str:
+        """
+        Una llamada process_document de Document AI (con reintentos).
+        
+        Args:
+            attempts: Intentos en total (por defecto DOCUMENTAI_RETRIES + 1)
+        
+        Returns:
+            str: Texto reconocido
+        """
+        from google.cloud import documentai_v1 as documentai
+        
+        request = documentai.ProcessRequest(
+            name=processor_name,
+            raw_document=documentai.RawDocument(content=pdf_content, mime_type="application/pdf")
+        )
+        
+        def process(timeout: Optional[float]) -> str:
+            # retry=None: los reintentos los hace el guard (con jitter y circuit breaker)
+            options = {"retry": None}
+            if timeout:
+                options["timeout"] = timeout
+            try:
+                text = client.process_document(request=request, **options).document.text
+            except Exception:
+                metrics.DOCUMENTAI_REQUESTS.labels("error").inc()
+                raise
+            metrics.DOCUMENTAI_REQUESTS.labels("ok").inc()
+            return text
+        
+        return get_guard("documentai").call(process, deadline, attempts=attempts)
+    
+    def _ocr_sharded(self, client, processor_name: str, document: ParsedPDF,
+                     deadline: Optional[Deadline] = None) -> str:
+        """
+        OCR de un PDF grande dividido en rangos de páginas.
+        
+        Los fragmentos se procesan en paralelo (ocr_shard_concurrency) y cada
+        uno se reintenta por separado; el texto se une en orden de páginas.
+        Si un fragmento falla se cancelan los que todavía no empezaron (el
+        PDF ya no puede completarse) y se relanza el error.
+        
+        Returns:
+            str: Texto reconocido de todo el PDF
+        """
+        shards = document.split_pages(self.ocr_shard_pages)
+        print(f"🧩 PDF de {document.num_pages} páginas dividido en {len(shards)} fragmentos")
+        
+        futures = [
+            self.ocr_executor.submit(self._ocr_shard, client, processor_name, start, end, content, deadline)
+            for start, end, content in shards
+        ]
+        done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                for other in pending:
+                    other.cancel()
+                raise future.exception()
+        texts = [future.result() for future in futures]
+        return "".join(text if text.endswith("\n") else text + "\n" for text in texts)
+    
+    def _ocr_shard(self, client, processor_name: str, start: int, end: int, content: bytes,
+                   deadline: Optional[Deadline] = None) -> str:
+        """OCR de un fragmento, con OCR_SHARD_RETRIES reintentos ante errores transitorios."""
+        try:
+            return self._ocr(client, processor_name, content, deadline, attempts=self.ocr_shard_retries + 1)
+        except Exception as e:
+            print(f"  ⚠️  Fragmento páginas {start + 1}-{end} falló: {e}")
+            raise
+    
+    def document_ai_batch_transport(self, project_id: str, location: str, transport=None):
+        """
+        Transporte del modo en lote de Document AI.
+        
+        Args:
+            project_id: ID del proyecto de GCP
+            location: Región del procesador (us, eu)
+            transport: BatchTransport ya creado (None = GoogleBatchTransport)
+            
+        Returns:
+            BatchTransport a usar con start/poll/collect_document_ai_batch
+        """
+        if transport is not None:
+            return transport
+        from google.cloud import storage
+        from app.services.documentai_batch import GoogleBatchTransport
+        return GoogleBatchTransport(
+            get_documentai_manager().get_client(location), storage.Client(project=project_id)
+        )
+    
+    def start_document_ai_batch(
+        self,
+        gcs_uris: List[str],
+        project_id: str,
+        location: str,
+        processor_id: str,
+        output_uri: str,
+        transport,
+        max_documents_per_operation: int = 1000
+    ) -> List[str]:
+        """
+        Lanza las operaciones en lote de Document AI (batch_process_documents)
+        para muchos PDFs en vez de una llamada por PDF.
+        
+        Los PDFs tienen que estar en Cloud Storage. Quien llama consulta las
+        operaciones con poll_document_ai_batch (esperando entre consultas sin
+        ocupar un hilo) y al terminar lee los campos con
+        collect_document_ai_batch.
+        
+        Args:
+            gcs_uris: PDFs a procesar (gs://bucket/ruta.pdf)
+            project_id: ID del proyecto de GCP
+            location: Región del procesador (us, eu)
+            processor_id: ID del procesador de Document AI
+            output_uri: Carpeta de salida (gs://bucket/prefijo)
+            transport: BatchTransport (ver document_ai_batch_transport)
+            max_documents_per_operation: PDFs por operación
+            
+        Returns:
+            Nombres de las operaciones lanzadas
+        """
+        processor_name = f"projects/{project_id}/locations/{location}/processors/{processor_id}"
+        operations = []
+        for start in range(0, len(gcs_uris), max_documents_per_operation):
+            chunk = gcs_uris[start:start + max_documents_per_operation]
+            operations.append(transport.start(processor_name, chunk, output_uri))
+        print(f"🤖 Document AI en lote: {len(gcs_uris)} PDFs en {len(operations)} operaciones")
+        return operations
+    
+    def poll_document_ai_batch(self, operations: List[str], transport) -> Tuple[List[str], list]:
+        """
+        Consulta una vez cada operación en lote.
+        
+        Una operación que falla entera (la consulta lanza un error) se da
+        por terminada sin resultados: sus PDFs quedan como fallidos en
+        collect_document_ai_batch y no arrastran a las demás operaciones.
+        
+        Args:
+            operations: Operaciones todavía en curso
+            transport: BatchTransport con el que se lanzaron
+            
+        Returns:
+            (operaciones que siguen en curso, BatchDocumentStatus de las que terminaron)
+        """
+        still_running = []
+        statuses = []
+        for operation in operations:
+            try:
+                result = transport.poll(operation)
+            except Exception as e:
+                print(f"❌ Operación en lote {operation} fallida: {e}")
+                continue
+            if result is None:
+                still_running.append(operation)
+            else:
+                statuses.extend(result)
+        return still_running, statuses
+    
+    def collect_document_ai_batch(
+        self,
+        gcs_uris: List[str],
+        statuses: list,
+        transport
+    ) -> Tuple[Dict[str, Dict[str, str]], Dict[str, str]]:
+        """
+        Lee la salida de cada PDF de las operaciones terminadas, une sus
+        fragmentos y aplica la misma extracción de campos que en el modo en
+        línea.
+        
+        Args:
+            gcs_uris: PDFs enviados a start_document_ai_batch
+            statuses: Estados devueltos por poll_document_ai_batch
+            transport: BatchTransport con el que se lanzaron
+            
+        Returns:
+            (campos por URI, error por URI de los PDFs que fallaron)
+        """
+        from app.services.documentai_batch import stitch_shards
+        
+        fields: Dict[str, Dict[str, str]] = {}
+        errors: Dict[str, str] = {}
+        for status in statuses:
+            if status.error:
+                errors[status.input_uri] = status.error
+                continue
+            try:
+                text = stitch_shards(transport.read_output(status.output_uri))
+                fields[status.input_uri] = self._extract_fields_from_text(text)
+            except Exception as e:
+                errors[status.input_uri] = f"Error leyendo la salida: {e}"
+        
+        for uri in gcs_uris:
+            if uri not in fields and uri not in errors:
+                errors[uri] = "Document AI no devolvió resultado"
+        
+        print(f"✅ Document AI en lote: {len(fields)} PDFs procesados, {len(errors)} con error")
+        return fields, errors
     
     def _extract_fields_from_text(self, text: str) -> Dict[str, str]:
         """
-        Extrae campos específicos del texto usando patrones de regex.
+        Extrae campos específicos del texto.
+        
+        Usa el motor de app.services.field_extraction: reglas compiladas una
+        sola vez y segmentación del texto en secciones en una sola pasada.
         
         Args:
             text: Texto completo extraído del PDF
@@ -207,68 +763,4 @@ class PDFProcessor:
         Returns:
             Dict con los campos extraídos
         """
-        import re
-        
-        fields = {
-            "patient_name": None,
-            "owner_name": None,
-            "veterinarian_name": None,
-            "diagnosis": None,
-            "recommendations": None
-        }
-        
-        # Patrones para buscar (case insensitive)
-        patterns = {
-            "patient_name": [
-                r"paciente[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Propietario|Tutor|Raza|Especie|Edad|Sexo|\n)",
-                r"nombre\s+(?:del\s+)?paciente[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Raza|Especie|Edad|\n)",
-                r"patient[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Owner|Breed|Species|Age|\n)",
-            ],
-            "owner_name": [
-                r"propietario[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Especie|Raza|Tel|Dirección|Teléfono|Sexo|Edad|\n)",
-                r"tutor[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Raza|Tel|Dirección|Teléfono|\n)",
-                r"dueño[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Tel|Dirección|\n)",
-                r"owner[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Species|Phone|Address|\n)",
-            ],
-            "veterinarian_name": [
-                r"referido\s+por[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\n|\s+ANTECEDENTES)",
-                r"derivante[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\n|Solicitud)",
-                r"(?:médico\s+)?veterinario[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|Tel|\n)",
-                r"médico[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)",
-                r"doctor[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+License|Date|\n)",
-                r"MVZ[:\s\.]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)",
-                r"elaboró[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)",
-            ],
-            "diagnosis": [
-                r"(?:hallazgo|hallazgos)[s\s]*(?:bidimensional|radiográfico)?[:\s]*\n*(.{20,1500}?)(?:\n\s*CONCLUS|\n\s*©|\n\s*DiagnoVet|INDICACIONES|RECOMENDACIONES|$)",
-                r"se\s+observa[:\s]*(.{20,1500}?)(?:\n\s*©|\n\s*DiagnoVet|\n\s*CONCLUS|\n\s*INDICACIONES|$)",
-                r"diagnóstico[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*Tratamiento|\n\s*Observación|$)",
-                r"impresión\s+diagnóstica[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*Tratamiento|$)",
-                r"diagnosis[:\s]*(.{20,800}?)(?:\n\s*Recommendation|\n\s*Treatment|$)",
-                r"conclusión[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*INDICACIONES|$)",
-            ],
-            "recommendations": [
-                r"(?:indicaciones|recomendaciones)[:\s]*(.{20,1000}?)(?:\n\s*©|\n\s*DiagnoVet|\n\s*Firma|\n\s*Elaboró|\n\s*M\.V\.|$)",
-                r"recomendación(?:es)?[:\s]*(.{20,800}?)(?:\n\s*Firma|\n\s*Fecha\s+de\s+emisión|\n\s*Elaboró|$)",
-                r"tratamiento[:\s]*(.{20,800}?)(?:\n\s*Firma|\n\s*Fecha|$)",
-                r"recommendation(?:s)?[:\s]*(.{20,800}?)(?:\n\s*Signature|\n\s*Date|$)",
-                r"conclusión[:\s]*(.{20,800}?)(?:\n\s*Indicaciones|\n\s*Recomendación|\n\s*Firma|$)",
-            ],
-        }
-        
-        # Buscar cada campo con sus patrones
-        for field, field_patterns in patterns.items():
-            for pattern in field_patterns:
-                match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-                if match:
-                    value = match.group(1).strip()
-                    # Limpiar el valor (múltiples espacios y saltos de línea)
-                    value = re.sub(r'\s+', ' ', value)
-                    value = value.strip()
-                    value = value[:500]  # Limitar longitud
-                    
-                    if len(value) > 2:  # Solo si tiene contenido válido
-                        fields[field] = value
-                        break  # Ya encontramos este campo, pasar al siguiente
-        
-        return fields
+        return extract_fields(text)
@@ -0,0 +1,489 @@
+"""
+Pipeline de procesamiento de reportes.
+Agrupa las etapas que convierten un PDF en un reporte guardado en Firestore.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from datetime import datetime
+
+from app.services import metrics
+from app.services.pdf_processor import ParsedPDF
+from app.services.resilience import CircuitOpenError, Deadline
+
+
+# Etapas del pipeline, en el orden en que se reportan
+PIPELINE_STAGES = ["parse", "extract_images", "upload_images", "document_ai", "save"]
+
+# Niveles de extracción de campos (campo "extraction_tier" del reporte)
+EXTRACTION_TIERS = ["text_layer", "document_ai", "document_ai_batch", "none"]
+
+# Campos que se extraen del texto del PDF
+EMPTY_FIELDS = {
+    "patient_name": None,
+    "owner_name": None,
+    "veterinarian_name": None,
+    "diagnosis": None,
+    "recommendations": None
+}
+
+
+@dataclass
+class Stage:
+    """
+    Etapa del grafo del pipeline.
+
+    func recibe, en orden, los resultados de las etapas de depends_on.
+    Todas las funciones son bloqueantes y se ejecutan en el executor.
+    """
+    name: str
+    func: Callable[..., Any]
+    depends_on: List[str] = field(default_factory=list)
+
+
+class ReportPipeline:
+    """
+    Ejecuta el flujo completo de un reporte como un grafo de etapas:
+
+                 ┌→ extract_images → upload_images ─┐
+        parse ───┤                                  ├→ save
+                 └→ document_ai ────────────────────┘
+
+    parse abre el PDF una sola vez (ParsedPDF) y las dos ramas lo comparten.
+    La etapa document_ai solo llama a Document AI si la capa de texto del
+    PDF no alcanza (ver extract_fields).
+
+    Las dos ramas no dependen entre sí y corren en paralelo, así la latencia
+    es aproximadamente max(imágenes, OCR) en lugar de la suma. Las llamadas
+    bloqueantes (PyPDF2, Pillow, Storage, Document AI, Firestore) corren en un
+    ThreadPoolExecutor propio, de modo que el event loop sigue atendiendo
+    otras peticiones mientras tanto.
+
+    Lo usan tanto el endpoint síncrono como los workers del modo asíncrono,
+    así ambos modos producen exactamente el mismo documento. Cada run
+    ocupa un lugar del cupo de uploads (admission), así el límite de
+    concurrencia vale para todos los caminos que procesan PDFs.
+
+    Las miniaturas se generan después de guardar, en segundo plano y con
+    hilos propios (derivative_executor). Cada reporte pendiente retiene sus
+    imágenes en memoria, así que se admiten hasta derivative_queue_max_size
+    a la vez; con más, se omiten y se completan luego con
+    POST /reports/{id}/derivatives.
+    """
+
+    def __init__(
+        self,
+        pdf_processor,
+        storage_service,
+        firestore_service,
+        settings,
+        max_workers: int = 8,
+        derivative_service=None,
+        read_workers: int = 8,
+        derivative_workers: int = 2,
+        derivative_queue_max_size: int = 16,
+        admission=None
+    ):
+        """
+        Inicializa el pipeline con los servicios que necesita.
+
+        Args:
+            pdf_processor: Instancia de PDFProcessor
+            storage_service: Instancia de GCPStorageService
+            firestore_service: Instancia de FirestoreService
+            settings: Configuración de la aplicación
+            max_workers: Hilos del executor para las etapas bloqueantes
+            derivative_service: ImageDerivativeService opcional (miniaturas)
+            read_workers: Hilos para las lecturas de los endpoints GET (run_read)
+            derivative_workers: Hilos para generar miniaturas (run_derivatives)
+            derivative_queue_max_size: Reportes esperando miniaturas antes de omitirlas
+            admission: AdmissionController del cupo de uploads que ocupa cada
+                       run (None = sin límite)
+        """
+        self.pdf_processor = pdf_processor
+        self.storage_service = storage_service
+        self.firestore_service = firestore_service
+        self.settings = settings
+        self.derivative_service = derivative_service
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+        # Las lecturas tienen sus propios hilos: no esperan detrás de las etapas de un upload
+        self.read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="reads")
+        # Las miniaturas tampoco ocupan los hilos de los uploads
+        self.derivative_executor = ThreadPoolExecutor(max_workers=derivative_workers, thread_name_prefix="derivatives")
+        self.derivative_queue_max_size = derivative_queue_max_size
+        self.admission = admission
+        self._background: Set[asyncio.Task] = set()
+
+    def shutdown(self):
+        """Libera los hilos de los executors."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.read_executor.shutdown(wait=False, cancel_futures=True)
+        self.derivative_executor.shutdown(wait=False, cancel_futures=True)
+        self.pdf_processor.shutdown()
+        if self.derivative_service:
+            self.derivative_service.shutdown()
+
+    async def run_blocking(self, func: Callable, *args) -> Any:
+        """
+        Ejecuta una función bloqueante en el executor del pipeline.
+
+        Args:
+            func: Función a ejecutar
+            *args: Argumentos posicionales de la función
+
+        Returns:
+            El resultado de la función
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def run_read(self, func: Callable, *args) -> Any:
+        """
+        Ejecuta una lectura bloqueante (ej: Firestore) en los hilos de lectura.
+
+        Args:
+            func: Función a ejecutar
+            *args: Argumentos posicionales de la función
+
+        Returns:
+            El resultado de la función
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.read_executor, func, *args)
+
+    async def run_derivatives(self, func: Callable, *args) -> Any:
+        """
+        Ejecuta una función bloqueante de miniaturas en sus propios hilos.
+
+        Args:
+            func: Función a ejecutar
+            *args: Argumentos posicionales de la función
+
+        Returns:
+            El resultado de la función
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.derivative_executor, func, *args)
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = False):
+        """
+        Ocupa un lugar del cupo de uploads (admission) durante el bloque;
+        sin cupo configurado no limita.
+
+        Args:
+            wait: Esperar turno sin límite en vez de rechazar con la cola llena
+
+        Raises:
+            AdmissionRejectedError: Si el cupo está saturado (solo con wait=False)
+        """
+        if self.admission is None:
+            yield
+            return
+        async with self.admission.admit(wait=wait):
+            yield
+
+    def derivatives_pending(self) -> int:
+        """Reportes con miniaturas en curso o esperando hilo."""
+        return len(self._background)
+
+    async def run(
+        self,
+        report_id: str,
+        pdf_content: bytes,
+        pdf_filename: str,
+        on_stage: Optional[Callable[[str, str], None]] = None,
+        content_sha256: Optional[str] = None,
+        persist: bool = True,
+        extracted_fields: Optional[Dict[str, Optional[str]]] = None,
+        deadline: Optional[Deadline] = None,
+        wait_for_slot: bool = False
+    ) -> Dict:
+        """
+        Procesa un PDF y guarda el reporte en Firestore.
+
+        Args:
+            report_id: ID del reporte
+            pdf_content: Bytes del PDF (el mismo buffer en el que se recibió)
+            pdf_filename: Nombre original del PDF
+            on_stage: Callback opcional (etapa, estado) para reportar progreso.
+                      Es bloqueante: se llama desde el executor.
+            content_sha256: Huella del PDF; si se indica, se registra en el
+                            índice de deduplicación al guardar
+            persist: False = no escribe en Firestore ni genera miniaturas;
+                     quien llama guarda el documento (ej: escrituras en lote)
+            extracted_fields: Campos ya extraídos (ej: Document AI en lote);
+                              si se indican no se llama a Document AI
+            deadline: Presupuesto de tiempo del PDF, compartido por las
+                      etapas que llaman a GCP (por defecto PIPELINE_DEADLINE)
+            wait_for_slot: Esperar turno en el cupo de admisión sin límite
+                           (workers y lotes) en vez de rechazar con la cola llena
+
+        Returns:
+            Dict con los datos del reporte guardado (incluye "image_count")
+
+        Raises:
+            AdmissionRejectedError: Si el cupo de uploads está saturado (solo
+                con wait_for_slot=False)
+        """
+        async with self.slot(wait=wait_for_slot):
+            return await self._run_admitted(
+                report_id, pdf_content, pdf_filename, on_stage,
+                content_sha256, persist, extracted_fields, deadline
+            )
+
+    async def _run_admitted(
+        self,
+        report_id: str,
+        pdf_content: bytes,
+        pdf_filename: str,
+        on_stage: Optional[Callable[[str, str], None]],
+        content_sha256: Optional[str],
+        persist: bool,
+        extracted_fields: Optional[Dict[str, Optional[str]]],
+        deadline: Optional[Deadline]
+    ) -> Dict:
+        """Cuerpo de run, con el lugar en el cupo ya ocupado (el deadline empieza a contar acá)."""
+        if deadline is None:
+            deadline = Deadline(self.settings.pipeline_deadline or None)
+
+        def parse():
+            return ParsedPDF(pdf_content)
+
+        def extract_images(document):
+            # En memoria: las imágenes van directo a Cloud Storage sin archivos locales
+            images = self.pdf_processor.extract_images_in_memory(document, report_id)
+            metrics.IMAGES_EXTRACTED.inc(len(images))
+            print(f"🖼️  Imágenes extraídas: {len(images)}")
+            return images
+
+        def upload_images(images):
+            if not self.storage_service or len(images) == 0:
+                return []
+            print(f"☁️  Subiendo {len(images)} imágenes a Cloud Storage...")
+            results = self.storage_service.upload_images_bulk(images, report_id, deadline)
+            print(f"✅ Imágenes disponibles en Cloud Storage")
+            return results
+
+        def document_ai(document):
+            if extracted_fields is not None:
+                return dict(extracted_fields), "document_ai_batch"
+            return self.extract_fields(document, deadline)
+
+        def save(images, upload_results, fields_and_tier):
+            extracted_fields, extraction_tier = fields_and_tier
+            metrics.EXTRACTION_TIER.labels(extraction_tier).inc()
+            image_urls = [result.url for result in upload_results if result.ok]
+            failed_images = [
+                {"filename": result.filename, "error": result.error}
+                for result in upload_results if not result.ok
+            ]
+            report_data = {
+                "id": report_id,
+                "pdf_filename": pdf_filename,
+                "patient_name": extracted_fields.get("patient_name"),
+                "owner_name": extracted_fields.get("owner_name"),
+                "veterinarian_name": extracted_fields.get("veterinarian_name"),
+                "diagnosis": extracted_fields.get("diagnosis"),
+                "recommendations": extracted_fields.get("recommendations"),
+                "image_urls": image_urls,
+                "upload_date": datetime.utcnow(),
+                "status": "processed",
+                "extraction_tier": extraction_tier
+            }
+            if failed_images:
+                report_data["failed_images"] = failed_images
+            if content_sha256:
+                report_data["content_sha256"] = content_sha256
+            if persist and self.firestore_service:
+                self.firestore_service.save_report(report_data)
+                if content_sha256:
+                    self.firestore_service.save_fingerprint(content_sha256, report_id)
+            return {**report_data, "image_count": len(images)}
+
+        results = await self.run_graph([
+            Stage("parse", parse),
+            Stage("extract_images", extract_images, ["parse"]),
+            Stage("upload_images", upload_images, ["extract_images"]),
+            Stage("document_ai", document_ai, ["parse"]),
+            Stage("save", save, ["extract_images", "upload_images", "document_ai"]),
+        ], on_stage)
+
+        # Miniaturas en segundo plano: no suman latencia al upload
+        uploaded = [results["extract_images"][r.index] for r in results["upload_images"] if r.ok]
+        if persist and self.derivative_service and self.derivative_service.specs and uploaded:
+            if self.derivatives_pending() >= self.derivative_queue_max_size:
+                # Saturado: no retener más imágenes en memoria (se completan con el backfill)
+                metrics.DERIVATIVES_SKIPPED.inc()
+                print(f"⚠️  Miniaturas omitidas para {report_id}: {self.derivatives_pending()} reportes en espera")
+            else:
+                originals = [(image.filename, (lambda image=image: image.data)) for image in uploaded]
+                self._start_background(self.run_derivatives(self.attach_derivatives, report_id, originals))
+
+        return results["save"]
+
+    def _start_background(self, coroutine):
+        """Lanza una tarea sin esperarla (guardando la referencia para que no se pierda)."""
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def attach_derivatives(self, report_id: str, originals, skip_existing: bool = False) -> Dict[str, List[Optional[str]]]:
+        """
+        Genera los derivados de un reporte y los guarda en el campo
+        image_derivatives de Firestore.
+
+        Args:
+            report_id: ID del reporte
+            originals: (nombre de archivo, función que devuelve sus bytes) por imagen
+            skip_existing: No regenerar los derivados que ya existen
+
+        Returns:
+            Dict tamaño → URLs
+        """
+        try:
+            with metrics.timed_stage("derivatives"):
+                derivatives = self.derivative_service.generate(report_id, originals, skip_existing=skip_existing)
+            self.firestore_service.update_report(report_id, {"image_derivatives": derivatives})
+            return derivatives
+        except Exception as e:
+            print(f"⚠️  Error generando derivados de {report_id}: {e}")
+            raise
+
+    def backfill_derivatives(self, report_id: str) -> Optional[Dict[str, List[Optional[str]]]]:
+        """
+        Genera los derivados que falten de un reporte ya guardado,
+        descargando los originales desde Cloud Storage.
+
+        Args:
+            report_id: ID del reporte
+
+        Returns:
+            Dict tamaño → URLs, o None si el reporte no existe
+        """
+        report_data = self.firestore_service.get_report(report_id)
+        if not report_data:
+            return None
+
+        originals = []
+        for url in report_data.get("image_urls", []):
+            blob_name = self.storage_service.blob_name_from_url(url)
+            originals.append((blob_name, (lambda blob_name=blob_name: self.storage_service.download_bytes(blob_name))))
+
+        return self.attach_derivatives(report_id, originals, skip_existing=True)
+
+    async def run_graph(
+        self,
+        stages: List[Stage],
+        on_stage: Optional[Callable[[str, str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta un grafo de etapas: cada etapa arranca en cuanto terminan
+        sus dependencias. Si una etapa falla, se cancelan las pendientes y
+        se relanza el error.
+
+        Args:
+            stages: Etapas en orden topológico (las dependencias primero)
+            on_stage: Callback opcional (etapa, estado)
+
+        Returns:
+            Dict etapa → resultado
+        """
+        notify = on_stage or (lambda stage, state: None)
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def call(stage: Stage, dep_results: List[Any]) -> Any:
+            notify(stage.name, "running")
+            try:
+                with metrics.timed_stage(stage.name):
+                    result = stage.func(*dep_results)
+            except Exception:
+                notify(stage.name, "failed")
+                raise
+            notify(stage.name, "done")
+            return result
+
+        async def run_stage(stage: Stage) -> Any:
+            dep_results = [await tasks[dep] for dep in stage.depends_on]
+            return await self.run_blocking(call, stage, dep_results)
+
+        for stage in stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def extract_fields(self, document, deadline: Optional[Deadline] = None) -> Tuple[Dict[str, Optional[str]], str]:
+        """
+        Extrae los campos del reporte por niveles, del más barato al más caro:
+
+        1. text_layer: el texto que ya trae el PDF (PyPDF2). Si encuentra
+           suficientes campos y el texto es denso (PDF digital), se usa
+           ese resultado y no se llama a Document AI.
+        2. document_ai: OCR para PDFs escaneados o con pocos campos. Si
+           Document AI encuentra menos campos que la capa de texto, falla,
+           se agota el deadline o su circuito está abierto, se usa la capa
+           de texto.
+        3. none: sin texto ni Document AI, los campos quedan vacíos.
+
+        Args:
+            document: ParsedPDF ya abierto (o ruta del PDF)
+            deadline: Presupuesto de tiempo para Document AI
+
+        Returns:
+            (campos extraídos, nivel que los produjo)
+        """
+        text_layer = None
+        if self.settings.text_layer_fast_path:
+            try:
+                text_layer = self.pdf_processor.extract_fields_from_text_layer(document)
+                if text_layer.is_confident(
+                    self.settings.text_layer_min_fields,
+                    self.settings.text_layer_min_chars_per_page
+                ):
+                    print(f"⚡ Campos extraídos de la capa de texto ({text_layer.fields_found}/{len(EMPTY_FIELDS)}), sin Document AI")
+                    return text_layer.fields, "text_layer"
+            except Exception as e:
+                print(f"⚠️  Error leyendo la capa de texto, se usa Document AI: {e}")
+
+        fallback_reason = None
+        if self.settings.gcp_processor_id:
+            try:
+                print(f"🤖 Extrayendo campos con Document AI...")
+                extracted_fields = self.pdf_processor.extract_fields_with_document_ai(
+                    pdf_path=document,
+                    project_id=self.settings.gcp_project_id,
+                    location=self.settings.gcp_location,
+                    processor_id=self.settings.gcp_processor_id,
+                    deadline=deadline
+                )
+                print(f"✅ Campos extraídos por Document AI")
+                found = sum(1 for value in extracted_fields.values() if value)
+                if text_layer and text_layer.fields_found > found:
+                    metrics.DOCUMENTAI_FALLBACKS.labels("fewer_fields").inc()
+                    return text_layer.fields, "text_layer"
+                return extracted_fields, "document_ai"
+            except Exception as ai_error:
+                fallback_reason = "circuit_open" if isinstance(ai_error, CircuitOpenError) else "error"
+                print(f"⚠️  Document AI no disponible, se usa la capa de texto: {ai_error}")
+                if text_layer is None:
+                    # Sin el camino rápido la capa de texto todavía no se leyó
+                    try:
+                        text_layer = self.pdf_processor.extract_fields_from_text_layer(document)
+                    except Exception as e:
+                        print(f"⚠️  Error leyendo la capa de texto: {e}")
+
+        if text_layer and text_layer.fields_found:
+            if fallback_reason:
+                metrics.DOCUMENTAI_FALLBACKS.labels(fallback_reason).inc()
+            return text_layer.fields, "text_layer"
+        return dict(EMPTY_FIELDS), "none"
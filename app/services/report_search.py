@@ -0,0 +1,339 @@
+"""
+Búsqueda de reportes (GET /reports/search).
+
+Filtros por paciente, propietario y veterinario (exactos o por prefijo),
+rango de fechas de carga y palabras del diagnóstico/recomendaciones.
+Usa los campos search_keys y search_terms que FirestoreService escribe al
+guardar cada reporte (app/services/search_keys.py).
+
+Dos implementaciones con el mismo resultado:
+- FirestoreReportSearch: consultas con índices compuestos de Firestore
+  (firestore.indexes.json: uno por cada combinación de filtros)
+- InMemoryReportSearch: índice invertido en memoria, para pruebas locales
+"""
+import copy
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.firestore_db import DOCUMENT_ID, decode_cursor, encode_cursor
+from app.services.search_keys import (
+    MIN_PREFIX, NAME_FIELDS, SEARCH_KEYS_FIELD, SEARCH_TERMS_FIELD, TEXT_FIELDS,
+    name_term, normalize_key, search_fields, strip_search_fields, text_term, tokenize
+)
+
+
+MATCH_MODES = ("exact", "prefix")
+
+# Palabras de búsqueda en el texto como máximo
+MAX_TEXT_WORDS = 10
+
+
+class InvalidSearchError(ValueError):
+    """Parámetros de búsqueda inválidos."""
+
+
+@dataclass
+class SearchPage:
+    """
+    Una página de resultados.
+
+    Atributos:
+        reports: Reportes de la página, más recientes primero
+        next_cursor: Cursor de la página siguiente (None si no hay más)
+        truncated: True si se cortó la lectura al llegar a max_scan; la
+            página puede traer menos de page_size reportes aunque haya más
+            (se sigue con next_cursor)
+    """
+    reports: List[Dict]
+    next_cursor: Optional[str] = None
+    truncated: bool = False
+
+
+def as_utc(value: datetime) -> datetime:
+    """Fecha con zona horaria (las fechas sin zona se guardan en UTC)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@dataclass
+class ReportSearchQuery:
+    """
+    Criterios de una búsqueda. Todos se combinan con AND.
+
+    Atributos:
+        names: Campo de nombre → valor buscado (patient_name, owner_name, veterinarian_name)
+        match: "exact" (nombre completo) o "prefix" (cada palabra buscada es el
+            comienzo de una palabra del nombre: "pe" encuentra "Juan Pérez")
+        date_from: upload_date desde (incluido)
+        date_to: upload_date hasta (no incluido)
+        text: Palabras que deben aparecer en el diagnóstico o las recomendaciones
+        page_size: Reportes por página
+        cursor: next_cursor de la página anterior
+    """
+    names: Dict[str, str] = field(default_factory=dict)
+    match: str = "exact"
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    text: Optional[str] = None
+    page_size: int = 20
+    cursor: Optional[str] = None
+
+    def __post_init__(self):
+        if self.match not in MATCH_MODES:
+            raise InvalidSearchError(f"match debe ser uno de: {', '.join(MATCH_MODES)}")
+        unknown = set(self.names) - set(NAME_FIELDS)
+        if unknown:
+            raise InvalidSearchError(f"Campos de búsqueda desconocidos: {', '.join(sorted(unknown))}")
+
+        self.name_keys = {
+            name: normalize_key(value) for name, value in self.names.items() if normalize_key(value)
+        }
+        if self.match == "prefix":
+            short = [word for key in self.name_keys.values() for word in key.split() if len(word) < MIN_PREFIX]
+            if short:
+                raise InvalidSearchError(f"Los prefijos deben tener al menos {MIN_PREFIX} caracteres")
+
+        self.words = tokenize(self.text)
+        if self.text and not self.words:
+            raise InvalidSearchError("El texto de búsqueda no tiene palabras indexables")
+        if len(self.words) > MAX_TEXT_WORDS:
+            raise InvalidSearchError(f"Como máximo {MAX_TEXT_WORDS} palabras de búsqueda")
+
+        if self.date_from is not None:
+            self.date_from = as_utc(self.date_from)
+        if self.date_to is not None:
+            self.date_to = as_utc(self.date_to)
+        if self.date_from and self.date_to and self.date_from >= self.date_to:
+            raise InvalidSearchError("date_from debe ser anterior a date_to")
+
+        self.after: Optional[Tuple[datetime, str]] = None
+        if self.cursor:
+            upload_date, report_id = decode_cursor(self.cursor)
+            self.after = (as_utc(upload_date), report_id)
+
+    def equality_filters(self) -> Dict[str, str]:
+        """Filtros exactos sobre search_keys (ruta del campo → valor)."""
+        if self.match != "exact":
+            return {}
+        return {f"{SEARCH_KEYS_FIELD}.{name}": key for name, key in self.name_keys.items()}
+
+    def index_terms(self) -> List[str]:
+        """Términos de search_terms que debe contener cada resultado."""
+        terms = []
+        if self.match == "prefix":
+            terms.extend(name_term(name, word) for name, key in self.name_keys.items() for word in key.split())
+        terms.extend(text_term(word) for word in self.words)
+        return terms
+
+    def matches(self, report: Dict) -> bool:
+        """
+        Verifica todos los criterios sobre un reporte completo.
+        (Los índices solo acotan los candidatos; esto decide.)
+        """
+        for name, key in self.name_keys.items():
+            value = normalize_key(report.get(name))
+            if self.match == "exact":
+                if value != key:
+                    return False
+            else:
+                words = value.split()
+                if not all(any(word.startswith(prefix) for word in words) for prefix in key.split()):
+                    return False
+
+        if self.words:
+            present = set()
+            for text_field in TEXT_FIELDS:
+                present.update(tokenize(report.get(text_field)))
+            if not present.issuperset(self.words):
+                return False
+
+        upload_date = report.get("upload_date")
+        if self.date_from or self.date_to:
+            if not isinstance(upload_date, datetime):
+                return False
+            upload_date = as_utc(upload_date)
+            if self.date_from and upload_date < self.date_from:
+                return False
+            if self.date_to and upload_date >= self.date_to:
+                return False
+        return True
+
+
+class ReportSearchBackend:
+    """
+    Interfaz de las implementaciones de búsqueda.
+
+    index/remove se llaman al guardar y borrar reportes (FirestoreService);
+    search devuelve una SearchPage, más recientes primero.
+    """
+
+    def index(self, report: Dict):
+        """Agrega o reemplaza un reporte en el índice."""
+
+    def remove(self, report_id: str):
+        """Quita un reporte del índice."""
+
+    def search(self, query: ReportSearchQuery) -> SearchPage:
+        raise NotImplementedError
+
+
+class FirestoreReportSearch(ReportSearchBackend):
+    """
+    Búsqueda con consultas de Firestore.
+
+    La consulta lleva los filtros exactos (search_keys.*), un término de
+    search_terms (array-contains; Firestore admite uno por consulta) y el
+    rango de upload_date, ordenada por upload_date y ID. Los índices
+    compuestos están en firestore.indexes.json. El resto de los términos
+    se verifica al leer: se leen como máximo `max_scan` documentos por
+    página, y si se llega al límite la página puede venir incompleta
+    (truncated=True, con next_cursor para seguir).
+
+    index/remove no hacen nada: los campos de búsqueda se escriben con el
+    reporte.
+    """
+
+    def __init__(self, db, collection_name: str = "reports", max_scan: int = 500):
+        """
+        Args:
+            db: Cliente de Firestore (FirestoreService.db)
+            collection_name: Colección de los reportes
+            max_scan: Documentos leídos como máximo por página
+        """
+        self.db = db
+        self.collection_name = collection_name
+        self.max_scan = max_scan
+
+    @staticmethod
+    def _most_selective(terms: List[str]) -> str:
+        """El término más largo: suele tener menos reportes."""
+        return max(terms, key=lambda term: len(term.split(":", 1)[1]))
+
+    def search(self, query: ReportSearchQuery) -> SearchPage:
+        from google.cloud import firestore
+        from google.cloud.firestore_v1.base_query import FieldFilter
+        
+        base = self.db.collection(self.collection_name)
+        for path, value in query.equality_filters().items():
+            base = base.where(filter=FieldFilter(path, "==", value))
+
+        terms = query.index_terms()
+        if terms:
+            base = base.where(filter=FieldFilter(SEARCH_TERMS_FIELD, "array_contains", self._most_selective(terms)))
+        if query.date_from:
+            base = base.where(filter=FieldFilter("upload_date", ">=", query.date_from))
+        if query.date_to:
+            base = base.where(filter=FieldFilter("upload_date", "<", query.date_to))
+
+        base = (
+            base.order_by("upload_date", direction=firestore.Query.DESCENDING)
+            .order_by(DOCUMENT_ID, direction=firestore.Query.DESCENDING)
+        )
+
+        # Uno de más, como en list_reports, para saber si hay otra página
+        batch_size = query.page_size + 1
+        after = query.after
+        reports: List[Dict] = []
+        scanned = 0
+        while True:
+            page_query = base
+            if after:
+                page_query = page_query.start_after({"upload_date": after[0], DOCUMENT_ID: after[1]})
+            docs = list(page_query.limit(batch_size).stream())
+
+            for position, doc in enumerate(docs):
+                scanned += 1
+                report = doc.to_dict()
+                report.setdefault("id", doc.id)
+                after = (report["upload_date"], doc.id)
+                if query.matches(report):
+                    reports.append(strip_search_fields(report))
+                if len(reports) == query.page_size:
+                    more = position < len(docs) - 1 or len(docs) == batch_size
+                    return SearchPage(reports, encode_cursor(*after) if more else None)
+
+            if len(docs) < batch_size:
+                return SearchPage(reports)
+            if scanned >= self.max_scan:
+                return SearchPage(reports, encode_cursor(*after), truncated=True)
+
+
+class InMemoryReportSearch(ReportSearchBackend):
+    """
+    Índice invertido en memoria con la misma semántica que
+    FirestoreReportSearch: término → IDs de reportes, y clave exacta → IDs.
+    Los candidatos son la intersección de los conjuntos de cada criterio.
+
+    Sirve para pruebas y desarrollo local (SEARCH_BACKEND=memory): el
+    índice vive en el proceso y solo contiene los reportes guardados desde
+    que arrancó.
+    """
+
+    def __init__(self):
+        self._reports: Dict[str, Dict] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def index(self, report: Dict):
+        report = copy.deepcopy(report)
+        report.update(search_fields(report))
+        with self._lock:
+            self._remove(report["id"])
+            self._reports[report["id"]] = report
+            for key in self._keys(report):
+                self._postings.setdefault(key, set()).add(report["id"])
+
+    def remove(self, report_id: str):
+        with self._lock:
+            self._remove(report_id)
+
+    @staticmethod
+    def _keys(report: Dict) -> List[str]:
+        """Entradas del índice de un reporte: sus términos y sus claves exactas."""
+        keys = list(report[SEARCH_TERMS_FIELD])
+        keys.extend(f"{SEARCH_KEYS_FIELD}.{name}={key}" for name, key in report[SEARCH_KEYS_FIELD].items())
+        return keys
+
+    def _remove(self, report_id: str):
+        report = self._reports.pop(report_id, None)
+        if report is None:
+            return
+        for key in self._keys(report):
+            ids = self._postings.get(key)
+            if ids is not None:
+                ids.discard(report_id)
+                if not ids:
+                    del self._postings[key]
+
+    def search(self, query: ReportSearchQuery) -> SearchPage:
+        keys = query.index_terms()
+        keys.extend(f"{path}={value}" for path, value in query.equality_filters().items())
+
+        with self._lock:
+            if keys:
+                postings = sorted((self._postings.get(key, set()) for key in keys), key=len)
+                candidates = set.intersection(*postings)
+            else:
+                candidates = set(self._reports)
+
+            ordered = []
+            for report_id in candidates:
+                report = self._reports[report_id]
+                # Como en Firestore: sin upload_date no entra en una consulta ordenada por ese campo
+                if not isinstance(report.get("upload_date"), datetime) or not query.matches(report):
+                    continue
+                position = (as_utc(report["upload_date"]), report_id)
+                if query.after and position >= query.after:
+                    continue
+                ordered.append((position, report))
+
+            ordered.sort(key=lambda item: item[0], reverse=True)
+            page = [strip_search_fields(copy.deepcopy(report)) for _, report in ordered[:query.page_size]]
+
+        next_cursor = None
+        if len(ordered) > query.page_size and page:
+            next_cursor = encode_cursor(page[-1]["upload_date"], page[-1]["id"])
+        return SearchPage(page, next_cursor)
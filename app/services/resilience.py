@@ -0,0 +1,289 @@
+"""
+Resiliencia de las llamadas a Document AI y Cloud Storage.
+
+- Deadline: presupuesto de tiempo de una petición; cada llamada usa como
+  timeout lo que queda (nunca más que el timeout propio de la llamada)
+- RetryPolicy: reintentos acotados con backoff exponencial y jitter, solo
+  para errores transitorios (429, 5xx, timeouts, conexión cortada)
+- CircuitBreaker: después de varios errores transitorios seguidos deja de
+  llamar a la dependencia por un rato y falla enseguida (CircuitOpenError);
+  pasado ese tiempo deja pasar una llamada de prueba
+
+DependencyGuard combina los tres para una dependencia. Hay uno por
+dependencia en el proceso (get_guard), compartido por todas las peticiones.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from app.services import metrics
+
+
+# Códigos HTTP que indican un problema transitorio de la dependencia
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+# Equivalentes en gRPC (grpc.StatusCode)
+RETRYABLE_GRPC_CODES = frozenset({"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "INTERNAL", "ABORTED"})
+
+# Errores de conexión de requests (Cloud Storage) que no heredan de ConnectionError
+RETRYABLE_REQUESTS_ERRORS = frozenset({"ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "ChunkedEncodingError"})
+
+
+class DeadlineExceededError(TimeoutError):
+    """Se agotó el presupuesto de tiempo de la petición."""
+
+
+class CircuitOpenError(Exception):
+    """La dependencia está degradada: no se la llama hasta que pase reset_timeout."""
+
+    def __init__(self, dependency: str, retry_in: float):
+        super().__init__(f"{dependency} no disponible (circuito abierto, se reintenta en {retry_in:.0f} s)")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Indica si vale la pena reintentar: errores de google.api_core con un
+    código transitorio, errores de gRPC equivalentes y cortes de conexión.
+    """
+    if isinstance(error, DeadlineExceededError):
+        return False
+    code = getattr(error, "code", None)
+    if callable(code):
+        try:
+            return getattr(code(), "name", None) in RETRYABLE_GRPC_CODES
+        except Exception:
+            return False
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return type(error).__module__.startswith("requests") and type(error).__name__ in RETRYABLE_REQUESTS_ERRORS
+
+
+class Deadline:
+    """Presupuesto de tiempo de una petición (seconds=None: sin límite)."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Segundos que quedan (None = sin límite)."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """
+        Timeout para la próxima llamada: lo que queda, sin superar cap.
+
+        Raises:
+            DeadlineExceededError: Si ya no queda tiempo
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if remaining <= 0:
+            raise DeadlineExceededError("Se agotó el tiempo de la petición")
+        return min(cap, remaining) if cap else remaining
+
+
+@dataclass
+class RetryPolicy:
+    """Reintentos con backoff exponencial y jitter completo."""
+    max_attempts: int = 3     # Intentos en total (1 = sin reintentos)
+    base_delay: float = 0.5   # Espera máxima antes del primer reintento (s)
+    max_delay: float = 8.0    # Tope de la espera (s)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Espera antes del reintento número attempt + 1: al azar entre 0 y
+        base_delay * 2^attempt (así los clientes no reintentan todos juntos).
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de una dependencia.
+
+    closed: las llamadas pasan. Con failure_threshold errores transitorios
+    seguidos pasa a open: las llamadas fallan enseguida con CircuitOpenError.
+    Pasados reset_timeout segundos pasa a half_open: una sola llamada de
+    prueba; si anda se cierra, si falla vuelve a open.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Dependencia (etiqueta de las métricas)
+            failure_threshold: Errores transitorios seguidos que abren el circuito
+            reset_timeout: Segundos abierto antes de la llamada de prueba
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        metrics.CIRCUIT_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            print(f"🔌 Circuito de {self.name}: {self._state} → {state}")
+            self._state = state
+            metrics.CIRCUIT_STATE.labels(self.name).set(self.STATE_VALUES[state])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """
+        Raises:
+            CircuitOpenError: Si el circuito está abierto (o ya hay una llamada de prueba en curso)
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                waited = time.monotonic() - self._opened_at
+                if waited < self.reset_timeout:
+                    metrics.CIRCUIT_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(self.name, self.reset_timeout - waited)
+                self._set_state(self.HALF_OPEN)
+                self._probing = False
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    metrics.CIRCUIT_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(self.name, 0)
+                self._probing = True
+
+    def record_success(self):
+        """La dependencia respondió (aunque sea con un error que no es transitorio)."""
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        """Error transitorio o timeout."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self._state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {"state": self._state, "consecutive_failures": self._failures, "retry_in": round(retry_in, 1)}
+
+
+class DependencyGuard:
+    """Deadline, reintentos y circuit breaker alrededor de las llamadas a una dependencia."""
+
+    def __init__(self, name: str, retry: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            name: Dependencia (documentai, storage)
+            retry: Política de reintentos
+            breaker: Circuit breaker de la dependencia
+            timeout: Timeout de cada intento si quien llama no indica otro (s)
+        """
+        self.name = name
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.timeout = timeout
+
+    def call(self, func: Callable[[Optional[float]], Any], deadline: Optional[Deadline] = None,
+             timeout: Optional[float] = None, attempts: Optional[int] = None) -> Any:
+        """
+        Llama a func(timeout) con reintentos.
+
+        Args:
+            func: Función que hace la llamada; recibe el timeout del intento
+            deadline: Presupuesto de la petición (no se reintenta si no alcanza)
+            timeout: Timeout de cada intento (por defecto el del guard)
+            attempts: Intentos en total (por defecto los de la política)
+
+        Returns:
+            El resultado de func
+
+        Raises:
+            CircuitOpenError: Si la dependencia está degradada
+            DeadlineExceededError: Si se agotó el presupuesto
+            El último error de func si no es transitorio o se acabaron los intentos
+        """
+        attempts = attempts or self.retry.max_attempts
+        cap = timeout or self.timeout
+        for attempt in range(attempts):
+            attempt_timeout = deadline.timeout(cap) if deadline else cap
+            self.breaker.before_call()
+            try:
+                result = func(attempt_timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+                delay = self.retry.backoff(attempt)
+                remaining = deadline.remaining() if deadline else None
+                if remaining is not None and remaining <= delay:
+                    raise
+                metrics.DEPENDENCY_RETRIES.labels(self.name).inc()
+                print(f"  🔁 {self.name}: {e} — reintento {attempt + 1}/{attempts - 1} en {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+
+_guards: Dict[str, DependencyGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(name: str) -> DependencyGuard:
+    """DependencyGuard del proceso para una dependencia (con valores por defecto si no se configuró)."""
+    with _guards_lock:
+        if name not in _guards:
+            _guards[name] = DependencyGuard(name)
+        return _guards[name]
+
+
+def configure_guard(name: str, retry: RetryPolicy, failure_threshold: int,
+                    reset_timeout: float, timeout: Optional[float] = None) -> DependencyGuard:
+    """
+    Reemplaza el DependencyGuard de una dependencia (al arrancar, con la configuración).
+
+    Returns:
+        DependencyGuard: El guard nuevo
+    """
+    guard = DependencyGuard(name, retry, CircuitBreaker(name, failure_threshold, reset_timeout), timeout)
+    with _guards_lock:
+        _guards[name] = guard
+    return guard
+
+
+def circuit_stats() -> Dict[str, Dict]:
+    """Estado de los circuitos de cada dependencia (para GET /ready)."""
+    with _guards_lock:
+        guards = dict(_guards)
+    return {name: guard.breaker.stats() for name, guard in sorted(guards.items())}
@@ -0,0 +1,31 @@
+"""
+Completa los campos de búsqueda de los reportes existentes.
+
+Los reportes guardados antes de GET /reports/search no tienen search_keys
+ni search_terms y no aparecen en las búsquedas. Este comando los recorre
+una vez y escribe solo esos campos (ver
+FirestoreService.backfill_search_fields). Se puede volver a ejecutar.
+
+Uso:
+    python -m app.services.search_backfill --dry-run
+    python -m app.services.search_backfill --page-size 300
+"""
+import argparse
+
+from app.config import get_settings
+from app.services.firestore_db import MAX_BATCH_WRITES, FirestoreService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Completa search_keys y search_terms de los reportes existentes")
+    parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES, help="Reportes por página (y por escritura en lote)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo cuenta los reportes a actualizar")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    firestore_service = FirestoreService(project_id=settings.gcp_project_id)
+    firestore_service.backfill_search_fields(page_size=args.page_size, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
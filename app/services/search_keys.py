@@ -0,0 +1,106 @@
+"""
+Claves de búsqueda de los reportes.
+
+Al guardar un reporte se le agregan dos campos derivados:
+
+- search_keys: nombres normalizados (sin acentos ni mayúsculas) para los
+  filtros exactos de GET /reports/search
+- search_terms: lista de términos. Firestore indexa cada elemento de una
+  lista (array-contains), así la lista funciona como índice invertido:
+  "text:calculos" → reportes que mencionan "cálculos" en el diagnóstico
+  o las recomendaciones; "owner_name:pe" → reportes con un propietario
+  cuyo nombre tiene una palabra que empieza con "pe"
+"""
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+
+SEARCH_KEYS_FIELD = "search_keys"
+SEARCH_TERMS_FIELD = "search_terms"
+
+# Campos con filtro exacto / por prefijo
+NAME_FIELDS = ("patient_name", "owner_name", "veterinarian_name")
+# Campos con búsqueda por palabras
+TEXT_FIELDS = ("diagnosis", "recommendations")
+
+# Largo de los prefijos indexados: los más cortos devuelven casi todo y
+# los más largos se verifican en memoria contra el nombre completo
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+
+TEXT_PREFIX = "text"
+
+STOPWORDS = frozenset({
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "no", "o", "para", "por", "se", "sin", "su", "sus", "un", "una", "y",
+})
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_key(text: Optional[str]) -> str:
+    """
+    Normaliza un texto para comparar: sin acentos, minúsculas y palabras
+    separadas por un solo espacio ("  Dra. Fernández " → "dra fernandez").
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", without_accents.casefold()).strip()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Palabras normalizadas de un texto, sin repetir y sin stopwords."""
+    seen = []
+    for word in normalize_key(text).split():
+        if len(word) > 1 and word not in STOPWORDS and word not in seen:
+            seen.append(word)
+    return seen
+
+
+def name_term(field: str, prefix: str) -> str:
+    """Término del índice para un prefijo de nombre (ej: owner_name:pe)."""
+    return f"{field}:{prefix[:MAX_PREFIX]}"
+
+
+def text_term(word: str) -> str:
+    """Término del índice para una palabra del diagnóstico o recomendaciones."""
+    return f"{TEXT_PREFIX}:{word}"
+
+
+def search_fields(report: Dict) -> Dict:
+    """
+    Campos de búsqueda de un reporte (se guardan junto con el reporte).
+
+    Args:
+        report: Datos del reporte
+
+    Returns:
+        {"search_keys": {...}, "search_terms": [...]}
+    """
+    keys = {field: normalize_key(report.get(field)) for field in NAME_FIELDS}
+
+    terms = []
+    for field, key in keys.items():
+        for word in key.split():
+            for length in range(MIN_PREFIX, min(len(word), MAX_PREFIX) + 1):
+                term = name_term(field, word[:length])
+                if term not in terms:
+                    terms.append(term)
+
+    for field in TEXT_FIELDS:
+        for word in tokenize(report.get(field)):
+            term = text_term(word)
+            if term not in terms:
+                terms.append(term)
+
+    return {SEARCH_KEYS_FIELD: keys, SEARCH_TERMS_FIELD: terms}
+
+
+def strip_search_fields(report: Dict) -> Dict:
+    """El reporte sin los campos de búsqueda (no se devuelven en la API)."""
+    report.pop(SEARCH_KEYS_FIELD, None)
+    report.pop(SEARCH_TERMS_FIELD, None)
+    return report
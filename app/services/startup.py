@@ -0,0 +1,217 @@
+"""
+Arranque de la aplicación (cold start).
+
+Los servicios se construyen en segundo plano cuando arranca el lifespan:
+el servidor acepta conexiones enseguida, GET / responde de inmediato y
+GET /ready indica cuándo los clientes de GCP están listos.
+
+StartupProfiler mide cuánto tarda cada componente en importarse y en
+inicializarse (STARTUP_PROFILE=true imprime la tabla al terminar).
+"""
+import asyncio
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from app.services import metrics
+
+
+@dataclass
+class StartupStep:
+    """Tiempo de un componente en una fase del arranque."""
+    component: str
+    phase: str  # import | init
+    seconds: float
+
+
+class StartupProfiler:
+    """
+    Tiempos del arranque por componente.
+
+    Los pasos pueden correr en paralelo (en hilos), así que la suma de los
+    tiempos puede superar el tiempo total hasta estar listo. Un módulo que
+    ya importó otro componente (ej: google.api_core, compartido por Storage
+    y Firestore) se cuenta en el primero que lo importa.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        """
+        Args:
+            started: Inicio del arranque (time.perf_counter); por defecto ahora
+        """
+        self.started = started if started is not None else time.perf_counter()
+        self.steps: List[StartupStep] = []
+        self.ready_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, component: str, phase: str, seconds: float):
+        """Registra el tiempo de un paso (también como métrica)."""
+        with self._lock:
+            self.steps.append(StartupStep(component, phase, seconds))
+        metrics.STARTUP_DURATION.labels(component, phase).set(seconds)
+
+    @contextmanager
+    def step(self, component: str, phase: str = "init"):
+        """Mide el bloque como un paso del arranque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(component, phase, time.perf_counter() - start)
+
+    def import_module(self, name: str):
+        """Importa un módulo midiendo cuánto tarda."""
+        with self.step(name, "import"):
+            return importlib.import_module(name)
+
+    def mark_ready(self):
+        """Registra el tiempo total desde el inicio hasta estar listo."""
+        self.ready_seconds = time.perf_counter() - self.started
+        metrics.STARTUP_READY.set(self.ready_seconds)
+
+    def summary(self) -> Dict:
+        """Tiempos en segundos, para GET /ready."""
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "steps": [
+                {"component": step.component, "phase": step.phase, "seconds": round(step.seconds, 4)}
+                for step in steps
+            ]
+        }
+
+    def report(self) -> str:
+        """Tabla de tiempos, del paso más lento al más rápido."""
+        with self._lock:
+            steps = sorted(self.steps, key=lambda step: step.seconds, reverse=True)
+        lines = [
+            "⏱️  Arranque por componente",
+            f"    {'componente':<32} {'fase':<7} {'ms':>9}"
+        ]
+        for step in steps:
+            lines.append(f"    {step.component:<32} {step.phase:<7} {step.seconds * 1000:>9.1f}")
+        if self.ready_seconds is not None:
+            lines.append(f"    Listo en {self.ready_seconds * 1000:.1f} ms desde la importación de app.main")
+        return "\n".join(lines)
+
+
+class ServiceInitializer:
+    """
+    Corre la inicialización de los servicios en segundo plano y permite
+    esperar a que termine.
+
+    Si falla (ej: un error pasajero al crear los clientes de GCP) se
+    reintenta hasta `attempts` veces con espera creciente (retry_delay,
+    ×2, hasta retry_max_delay). Si se agotan los intentos se llama a
+    on_give_up: la instancia no puede atender pedidos y conviene que el
+    orquestador la reinicie en vez de dejarla viva respondiendo 503.
+    Los errores de `permanent_errors` (ej: configuración inválida) no se
+    reintentan: reintentar no los arregla.
+
+    Estados: "starting" (en curso, reintentando o sin arrancar), "ready" y
+    "failed" (se agotaron los intentos).
+    """
+
+    def __init__(
+        self,
+        initialize: Callable[[], Awaitable[None]],
+        attempts: int = 1,
+        retry_delay: float = 2.0,
+        retry_max_delay: float = 30.0,
+        on_give_up: Optional[Callable[[], None]] = None,
+        permanent_errors: Tuple[Type[BaseException], ...] = ()
+    ):
+        """
+        Args:
+            initialize: Corrutina que construye los servicios
+            attempts: Intentos como máximo (1 = sin reintentos)
+            retry_delay: Espera antes del primer reintento (segundos)
+            retry_max_delay: Espera máxima entre reintentos (segundos)
+            on_give_up: Se llama si fallan todos los intentos (ej: terminar el proceso)
+            permanent_errors: Errores que terminan la inicialización sin reintentar
+        """
+        self._initialize = initialize
+        self.attempts = max(1, attempts)
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.on_give_up = on_give_up
+        self.permanent_errors = permanent_errors
+        self._task: Optional[asyncio.Task] = None
+        self._done: Optional[asyncio.Event] = None
+        self.error: Optional[BaseException] = None
+        self.attempt = 0
+
+    def start(self):
+        """Lanza la inicialización (dentro del event loop)."""
+        self._done = asyncio.Event()
+        self.error = None
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        delay = self.retry_delay
+        try:
+            for attempt in range(1, self.attempts + 1):
+                self.attempt = attempt
+                try:
+                    await self._initialize()
+                    self.error = None
+                    return
+                except Exception as e:
+                    self.error = e
+                    print(f"❌ Error inicializando servicios (intento {attempt}/{self.attempts}): {str(e)}")
+                    if isinstance(e, self.permanent_errors):
+                        print("❌ El error no es pasajero: no se reintenta")
+                        break
+                if attempt < self.attempts:
+                    print(f"🔁 Reintentando la inicialización en {delay:.0f} s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.retry_max_delay)
+        except asyncio.CancelledError as e:
+            self.error = e
+            raise
+        finally:
+            self._done.set()
+
+        if self.on_give_up is not None:
+            self.on_give_up()
+
+    @property
+    def status(self) -> str:
+        if self._done is None or not self._done.is_set():
+            return "starting"
+        return "failed" if self.error is not None else "ready"
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    async def wait(self, timeout: float) -> bool:
+        """
+        Espera a que termine la inicialización.
+
+        Args:
+            timeout: Segundos de espera como máximo
+
+        Returns:
+            True si los servicios están listos
+        """
+        if self._done is None:
+            return False
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    async def stop(self):
+        """Cancela la inicialización si sigue en curso (al apagar)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,108 @@
+"""
+Recepción de PDFs subidos.
+Lee el archivo por bloques, valida que sea un PDF y corta si excede el tamaño máximo.
+"""
+import hashlib
+from dataclasses import dataclass
+
+from fastapi import UploadFile
+
+
+# Todo PDF válido empieza con esta firma (el estándar permite basura
+# antes, pero siempre dentro del primer KB)
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+
+@dataclass
+class PDFUpload:
+    """PDF recibido: su contenido y su huella SHA-256."""
+    content: bytes
+    sha256: str
+
+
+class UploadTooLargeError(Exception):
+    """El archivo supera el tamaño máximo permitido."""
+
+
+class InvalidPDFError(Exception):
+    """El contenido del archivo no es un PDF."""
+
+
+async def read_pdf_upload(file: UploadFile, max_bytes: int, chunk_size: int = 1024 * 1024) -> PDFUpload:
+    """
+    Lee un PDF subido por bloques y lo carga en un único buffer.
+
+    - Valida la firma %PDF- con el primer bloque (no con la extensión)
+    - Deja de leer en cuanto se supera max_bytes
+    - Calcula la huella SHA-256 mientras lee (para deduplicar)
+    - La validación recorre el archivo sin guardar los bloques; recién
+      después se lee entero una sola vez, así el pico de memoria es el
+      tamaño del PDF (y no el doble, como al copiar un buffer acumulado).
+      Ese buffer lo reutilizan todas las etapas (PyPDF2 y Document AI)
+
+    Args:
+        file: Archivo recibido por FastAPI
+        max_bytes: Tamaño máximo permitido en bytes
+        chunk_size: Tamaño de cada bloque leído
+
+    Returns:
+        PDFUpload: Contenido del PDF y su huella
+
+    Raises:
+        InvalidPDFError: Si el primer bloque no contiene la firma de PDF
+        UploadTooLargeError: Si el archivo supera max_bytes
+    """
+    size = 0
+    digest = hashlib.sha256()
+
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+
+        # Validar la firma con el primer bloque
+        if not size and PDF_MAGIC not in chunk[:PDF_MAGIC_WINDOW]:
+            raise InvalidPDFError("El archivo no es un PDF válido")
+
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(
+                f"El archivo supera el máximo de {max_bytes // (1024 * 1024)} MB"
+            )
+
+        digest.update(chunk)
+
+    if not size:
+        raise InvalidPDFError("El archivo está vacío")
+
+    # UploadFile ya guardó el cuerpo (en memoria o en disco): una sola lectura
+    await file.seek(0)
+    content = await file.read()
+    return PDFUpload(content=content, sha256=digest.hexdigest())
+
+
+def pdf_upload_from_bytes(content: bytes, max_bytes: int) -> PDFUpload:
+    """
+    Valida un PDF que ya está en memoria (ej: extraído de un ZIP).
+
+    Args:
+        content: Bytes del archivo
+        max_bytes: Tamaño máximo permitido en bytes
+
+    Returns:
+        PDFUpload: Contenido del PDF y su huella
+
+    Raises:
+        InvalidPDFError: Si está vacío o no contiene la firma de PDF
+        UploadTooLargeError: Si el archivo supera max_bytes
+    """
+    if not content:
+        raise InvalidPDFError("El archivo está vacío")
+    if PDF_MAGIC not in content[:PDF_MAGIC_WINDOW]:
+        raise InvalidPDFError("El archivo no es un PDF válido")
+    if len(content) > max_bytes:
+        raise UploadTooLargeError(
+            f"El archivo supera el máximo de {max_bytes // (1024 * 1024)} MB"
+        )
+    return PDFUpload(content=content, sha256=hashlib.sha256(content).hexdigest())
@@ -0,0 +1,306 @@
+"""
+Subidas reanudables de PDFs grandes (/uploads).
+
+El cliente crea una sesión, envía el PDF por bloques (PUT con
+Content-Range y el SHA-256 de cada bloque), consulta cuántos bytes ya se
+guardaron si se corta la conexión y al final pide procesarlo. Todo se
+guarda en Cloud Storage, así cualquier instancia puede continuar una
+sesión:
+
+    upload-sessions/{upload_id}/session.json           nombre, tamaño, vencimiento
+    upload-sessions/{upload_id}/chunks/{inicio}-{fin}  cada bloque recibido
+
+El offset confirmado no se guarda aparte: es el final de la cadena de
+bloques contiguos desde el byte 0. Un bloque reenviado o un PUT cortado a
+la mitad (que no llega a crear su objeto) no dejan la sesión inconsistente.
+"""
+import hashlib
+import json
+import re
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+SESSION_FILE = "session.json"
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_CHUNK_NAME = re.compile(r"^(\d{12})-(\d{12})$")
+_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadSessionError(Exception):
+    """Error de una subida reanudable."""
+
+
+class UploadSessionNotFoundError(UploadSessionError):
+    """La sesión no existe o ya expiró."""
+
+
+class InvalidChunkError(UploadSessionError):
+    """Content-Range inválido o bloque fuera del tamaño declarado."""
+
+
+class ChunkChecksumError(UploadSessionError):
+    """El SHA-256 declarado no coincide con los bytes recibidos."""
+
+
+class ChunkOffsetError(UploadSessionError):
+    """El bloque no empieza en el offset confirmado."""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class IncompleteUploadError(ChunkOffsetError):
+    """Se pidió finalizar antes de recibir todos los bytes."""
+
+
+def parse_content_range(header: Optional[str], length: int, size: int) -> int:
+    """
+    Valida el Content-Range de un bloque.
+
+    Args:
+        header: Valor de Content-Range (ej: "bytes 0-8388607/41943040")
+        length: Bytes recibidos en el cuerpo
+        size: Tamaño total declarado al crear la sesión
+
+    Returns:
+        int: Byte inicial del bloque
+
+    Raises:
+        InvalidChunkError: Si falta, no coincide con el cuerpo o con el tamaño total
+    """
+    match = _CONTENT_RANGE.match((header or "").strip())
+    if not match:
+        raise InvalidChunkError("Content-Range inválido (formato: bytes inicio-fin/total)")
+    start, last, total = int(match.group(1)), int(match.group(2)), match.group(3)
+    if last < start or last - start + 1 != length:
+        raise InvalidChunkError("Content-Range no coincide con el tamaño del bloque")
+    if total != "*" and int(total) != size:
+        raise InvalidChunkError(f"El total de Content-Range no coincide con el tamaño de la sesión ({size})")
+    return start
+
+
+@dataclass
+class UploadSession:
+    """Sesión de subida; offset son los bytes confirmados."""
+    upload_id: str
+    filename: str
+    size: int
+    sha256: Optional[str]
+    created_at: datetime
+    expires_at: datetime
+    offset: int = 0
+
+    def to_json(self) -> bytes:
+        data = asdict(self)
+        data.pop("offset")
+        data["created_at"] = self.created_at.isoformat()
+        data["expires_at"] = self.expires_at.isoformat()
+        return json.dumps(data).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, raw: bytes) -> "UploadSession":
+        data = json.loads(raw)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        data["expires_at"] = datetime.fromisoformat(data["expires_at"])
+        return cls(**data)
+
+
+class UploadSessionStore:
+    """
+    Sesiones de subida guardadas en Cloud Storage (GCPStorageService).
+
+    Cada operación lista los objetos de la sesión (una llamada) para saber
+    si existe y cuál es el offset confirmado; no hay estado en memoria.
+    Las sesiones vencidas se borran al consultarlas y con purge_expired
+    (la app lo llama periódicamente).
+    """
+
+    def __init__(self, storage_service, prefix: str = "upload-sessions",
+                 ttl: float = 86400.0, chunk_size: int = 8 * 1024 * 1024):
+        """
+        Args:
+            storage_service: GCPStorageService donde se guardan los bloques
+            prefix: Carpeta del bucket para las sesiones
+            ttl: Segundos desde la creación hasta que una sesión sin finalizar se descarta
+            chunk_size: Tamaño máximo de cada bloque en bytes
+        """
+        self.storage = storage_service
+        self.prefix = prefix.strip("/")
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+
+    def _path(self, upload_id: str, name: str = "") -> str:
+        return f"{self.prefix}/{upload_id}/{name}"
+
+    def create(self, filename: str, size: int, sha256: Optional[str] = None) -> UploadSession:
+        """
+        Crea una sesión de subida.
+
+        Args:
+            filename: Nombre original del PDF
+            size: Tamaño total en bytes
+            sha256: Huella del PDF completo (opcional, se verifica al finalizar)
+
+        Returns:
+            UploadSession: La sesión creada (offset 0)
+        """
+        now = datetime.utcnow()
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            filename=filename,
+            size=size,
+            sha256=sha256.lower() if sha256 else None,
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.ttl)
+        )
+        self.storage.upload_bytes(session.to_json(), self._path(session.upload_id, SESSION_FILE), "application/json")
+        print(f"📥 Subida reanudable creada: {session.upload_id} ({filename}, {size} bytes)")
+        return session
+
+    def _load(self, upload_id: str) -> Tuple[UploadSession, List[str]]:
+        """Sesión con su offset confirmado y los bloques que lo forman, en orden."""
+        if not _UPLOAD_ID.match(upload_id):
+            raise UploadSessionNotFoundError(f"Subida '{upload_id}' no encontrada")
+
+        names = self.storage.list_blob_names(self._path(upload_id))
+        if self._path(upload_id, SESSION_FILE) not in names:
+            raise UploadSessionNotFoundError(f"Subida '{upload_id}' no encontrada")
+
+        session = UploadSession.from_json(self.storage.download_bytes(self._path(upload_id, SESSION_FILE)))
+        if datetime.utcnow() >= session.expires_at:
+            self.storage.delete_images(names)
+            raise UploadSessionNotFoundError(f"La subida '{upload_id}' expiró")
+
+        # Por cada inicio, el bloque que llega más lejos (un reenvío puede ser más largo)
+        longest: Dict[int, Tuple[int, str]] = {}
+        chunks_prefix = self._path(upload_id, "chunks/")
+        for name in names:
+            match = _CHUNK_NAME.match(name[len(chunks_prefix):]) if name.startswith(chunks_prefix) else None
+            if match:
+                start, end = int(match.group(1)), int(match.group(2))
+                if end > longest.get(start, (start, ""))[0]:
+                    longest[start] = (end, name)
+
+        chain = []
+        while session.offset in longest:
+            end, name = longest[session.offset]
+            chain.append(name)
+            session.offset = end
+        return session, chain
+
+    def get(self, upload_id: str) -> UploadSession:
+        """
+        Estado de una sesión.
+
+        Raises:
+            UploadSessionNotFoundError: Si no existe o expiró
+        """
+        return self._load(upload_id)[0]
+
+    def put_chunk(self, upload_id: str, content_range: Optional[str], data: bytes,
+                  sha256: Optional[str]) -> UploadSession:
+        """
+        Guarda un bloque.
+
+        Reenviar un bloque ya confirmado (ej: se perdió la respuesta) no es
+        un error: devuelve el offset actual sin volver a subirlo.
+
+        Args:
+            upload_id: ID de la sesión
+            content_range: Cabecera Content-Range del bloque
+            data: Contenido del bloque
+            sha256: SHA-256 del bloque (hex) declarado por el cliente
+
+        Returns:
+            UploadSession: La sesión con el offset actualizado
+
+        Raises:
+            UploadSessionNotFoundError: Si la sesión no existe o expiró
+            InvalidChunkError: Si el bloque está vacío, es muy grande, su Content-Range
+                es inválido o excede el tamaño total
+            ChunkChecksumError: Si falta el SHA-256 o no coincide
+            ChunkOffsetError: Si el bloque no empieza en el offset confirmado
+        """
+        if not data:
+            raise InvalidChunkError("El bloque está vacío")
+        if len(data) > self.chunk_size:
+            raise InvalidChunkError(f"El bloque supera el máximo de {self.chunk_size} bytes")
+        if not sha256:
+            raise ChunkChecksumError("Falta el SHA-256 del bloque")
+        if hashlib.sha256(data).hexdigest() != sha256.strip().lower():
+            raise ChunkChecksumError("El SHA-256 del bloque no coincide con los bytes recibidos")
+
+        session, _ = self._load(upload_id)
+        start = parse_content_range(content_range, len(data), session.size)
+        end = start + len(data)
+        if end > session.size:
+            raise InvalidChunkError(f"El bloque termina después del tamaño declarado ({session.size} bytes)")
+        if end <= session.offset:
+            return session
+        if start != session.offset:
+            raise ChunkOffsetError(
+                f"El bloque empieza en {start} pero el offset confirmado es {session.offset}",
+                session.offset
+            )
+
+        self.storage.upload_bytes(data, self._path(upload_id, f"chunks/{start:012d}-{end:012d}"))
+        session.offset = end
+        return session
+
+    def read(self, upload_id: str) -> Tuple[UploadSession, bytes]:
+        """
+        Une los bloques de una sesión completa.
+
+        Returns:
+            (UploadSession, contenido del archivo)
+
+        Raises:
+            UploadSessionNotFoundError: Si la sesión no existe o expiró
+            IncompleteUploadError: Si faltan bytes
+            ChunkChecksumError: Si el archivo no coincide con el SHA-256 declarado al crear la sesión
+        """
+        session, chain = self._load(upload_id)
+        if session.offset < session.size:
+            raise IncompleteUploadError(
+                f"Faltan bytes: recibidos {session.offset} de {session.size}",
+                session.offset
+            )
+
+        # Los bloques se descargan en paralelo; map conserva el orden
+        content = b"".join(self.storage.executor.map(self.storage.download_bytes, chain))
+        if session.sha256 and hashlib.sha256(content).hexdigest() != session.sha256:
+            raise ChunkChecksumError("El SHA-256 del archivo no coincide con el declarado al crear la subida")
+        return session, content
+
+    def delete(self, upload_id: str):
+        """Borra la sesión y sus bloques."""
+        self.storage.delete_images(self.storage.list_blob_names(self._path(upload_id)))
+
+    def purge_expired(self) -> int:
+        """
+        Borra las sesiones vencidas que nadie volvió a consultar.
+
+        Returns:
+            int: Sesiones borradas
+        """
+        purged = 0
+        now = datetime.utcnow()
+        for name in self.storage.list_blob_names(f"{self.prefix}/"):
+            if not name.endswith(f"/{SESSION_FILE}"):
+                continue
+            upload_id = name[len(self.prefix) + 1:-len(SESSION_FILE) - 1]
+            try:
+                session = UploadSession.from_json(self.storage.download_bytes(name))
+                if now >= session.expires_at:
+                    self.delete(upload_id)
+                    purged += 1
+            except Exception as e:
+                print(f"⚠️  Error revisando la subida {upload_id}: {e}")
+        if purged:
+            print(f"🧹 Subidas vencidas eliminadas: {purged}")
+        return purged
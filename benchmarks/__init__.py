@@ -0,0 +1 @@
+# Este archivo hace que 'benchmarks' sea un paquete Python importable
@@ -0,0 +1,254 @@
+"""
+Regresión del motor de extracción de campos.
+
+Compara app.services.field_extraction.extract_fields contra la
+implementación original con regex sobre un corpus de textos de reportes
+(formatos reales, casos borde y textos aleatorios) y mide el tiempo en
+textos de 100+ páginas para comprobar que crece de forma lineal.
+
+Uso:
+    python -m benchmarks.field_extraction_regression
+"""
+import json
+import random
+import time
+from typing import Dict, List
+
+from app.services.field_extraction import extract_fields
+
+
+def legacy_extract_fields(text: str) -> Dict[str, str]:
+    """
+    Implementación original (regex sin compilar, una búsqueda por patrón).
+    Se conserva solo como referencia para la regresión.
+    
+    Args:
+        text: Texto completo extraído del PDF
+        
+    Returns:
+        Dict con los campos extraídos
+    """
+    import re
+
+    fields = {
+        "patient_name": None,
+        "owner_name": None,
+        "veterinarian_name": None,
+        "diagnosis": None,
+        "recommendations": None
+    }
+    
+    # Patrones para buscar (case insensitive)
+    patterns = {
+        "patient_name": [
+            r"paciente[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Propietario|Tutor|Raza|Especie|Edad|Sexo|\n)",
+            r"nombre\s+(?:del\s+)?paciente[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Raza|Especie|Edad|\n)",
+            r"patient[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Owner|Breed|Species|Age|\n)",
+        ],
+        "owner_name": [
+            r"propietario[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Especie|Raza|Tel|Dirección|Teléfono|Sexo|Edad|\n)",
+            r"tutor[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Raza|Tel|Dirección|Teléfono|\n)",
+            r"dueño[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Tel|Dirección|\n)",
+            r"owner[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s]+?)(?:\s+Species|Phone|Address|\n)",
+        ],
+        "veterinarian_name": [
+            r"referido\s+por[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\n|\s+ANTECEDENTES)",
+            r"derivante[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\n|Solicitud)",
+            r"(?:médico\s+)?veterinario[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|Tel|\n)",
+            r"médico[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)",
+            r"doctor[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+License|Date|\n)",
+            r"MVZ[:\s\.]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)",
+            r"elaboró[:\s]+([A-Za-zÁÉÍÓÚáéíóúñÑ\s\.]+?)(?:\s+Cédula|Fecha|\n)",
+        ],
+        "diagnosis": [
+            r"(?:hallazgo|hallazgos)[s\s]*(?:bidimensional|radiográfico)?[:\s]*\n*(.{20,1500}?)(?:\n\s*CONCLUS|\n\s*©|\n\s*DiagnoVet|INDICACIONES|RECOMENDACIONES|$)",
+            r"se\s+observa[:\s]*(.{20,1500}?)(?:\n\s*©|\n\s*DiagnoVet|\n\s*CONCLUS|\n\s*INDICACIONES|$)",
+            r"diagnóstico[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*Tratamiento|\n\s*Observación|$)",
+            r"impresión\s+diagnóstica[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*Tratamiento|$)",
+            r"diagnosis[:\s]*(.{20,800}?)(?:\n\s*Recommendation|\n\s*Treatment|$)",
+            r"conclusión[:\s]*(.{20,800}?)(?:\n\s*Recomendación|\n\s*INDICACIONES|$)",
+        ],
+        "recommendations": [
+            r"(?:indicaciones|recomendaciones)[:\s]*(.{20,1000}?)(?:\n\s*©|\n\s*DiagnoVet|\n\s*Firma|\n\s*Elaboró|\n\s*M\.V\.|$)",
+            r"recomendación(?:es)?[:\s]*(.{20,800}?)(?:\n\s*Firma|\n\s*Fecha\s+de\s+emisión|\n\s*Elaboró|$)",
+            r"tratamiento[:\s]*(.{20,800}?)(?:\n\s*Firma|\n\s*Fecha|$)",
+            r"recommendation(?:s)?[:\s]*(.{20,800}?)(?:\n\s*Signature|\n\s*Date|$)",
+            r"conclusión[:\s]*(.{20,800}?)(?:\n\s*Indicaciones|\n\s*Recomendación|\n\s*Firma|$)",
+        ],
+    }
+    
+    # Buscar cada campo con sus patrones
+    for field, field_patterns in patterns.items():
+        for pattern in field_patterns:
+            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            if match:
+                value = match.group(1).strip()
+                # Limpiar el valor (múltiples espacios y saltos de línea)
+                value = re.sub(r'\s+', ' ', value)
+                value = value.strip()
+                value = value[:500]  # Limitar longitud
+                
+                if len(value) > 2:  # Solo si tiene contenido válido
+                    fields[field] = value
+                    break  # Ya encontramos este campo, pasar al siguiente
+    
+    return fields
+
+
+
+# Textos con los formatos de reportes que ya procesamos
+SAMPLE_REPORTS: List[str] = [
+    # Ecocardiografía (formato Chester)
+    """ECOCARDIOGRAFÍA
+Paciente: Chester Raza: Caniche Edad: 12 años
+Propietario: Naveda Especie: Canino
+Referido por: Dra. Gerbero
+HALLAZGOS BIDIMENSIONAL:
+Se observa tamaño de atrio izquierdo conservado. Contractilidad miocárdica
+conservada, fracción de acortamiento 35%.
+CONCLUSIÓN: Estudio dentro de parámetros normales.
+© DiagnoVet
+""",
+    # Radiografía (formato Ramón)
+    """ESTUDIO RADIOGRÁFICO
+Paciente: Ramón
+Tutor: Simonetti Tel: 555-1234
+Derivante: Ghersevich Carolina
+Solicitud: tórax y columna
+HALLAZGOS RADIOGRÁFICOS:
+• Depósito de material de radiodensidad mineral en laterales de espacio
+intervertebral entre vértebras T13-L1.
+• Patrón pulmonar bronquial panlobar moderado.
+INDICACIONES: Control radiográfico en 30 días y evaluación clínica.
+DiagnoVet
+""",
+    # Formato en inglés
+    """Patient: Luna Breed: Beagle
+Owner: John Smith Phone: 555
+Doctor: A. Jones License 123
+Diagnosis: Mild hepatomegaly with diffuse hyperechoic parenchyma.
+Recommendation: Repeat abdominal ultrasound in two weeks.
+Signature
+""",
+    # Formato con diagnóstico y tratamiento
+    """Nombre del paciente: Toby Especie: Felino
+Dueño: María López Dirección: Calle 1
+Médico veterinario: Dr. Pérez Cédula 998877
+Diagnóstico: Cálculos renales en riñón izquierdo de tamaño moderado.
+Recomendación: Dieta especial baja en calcio, control en 2 semanas.
+Firma
+""",
+    # Impresión diagnóstica y tratamiento
+    """MVZ. Laura Díaz Fecha 01/02/2026
+Impresión diagnóstica: Gastritis aguda con engrosamiento de pared gástrica.
+Tratamiento: Omeprazol 1 mg/kg cada 24 horas por 10 días.
+Fecha de emisión 02/02/2026
+""",
+    # Valores demasiado cortos: la regla se descarta y se prueba la siguiente
+    """Paciente: X
+Nombre del paciente: Firulais Raza: Mestizo
+Elaboró: Dr. Ruiz Fecha: hoy
+Conclusión: sin alteraciones relevantes en el estudio abdominal completo.
+""",
+    # Sin campos reconocibles
+    """Documento sin etiquetas conocidas.
+Solo texto libre que no debería producir campos.
+""",
+    # Plegados especiales de mayúsculas (ſ, ı, İ): usan el escáner de respaldo
+    """PACİENTE: Kira Raza: Husky
+Paciente: Kıra Raza: Husky
+Dueño: Ana ſánchez Tel: 1
+ſe obſerva: hígado de tamaño aumentado con bordes redondeados.
+""",
+    "",
+]
+
+KEYWORDS = [
+    "Paciente", "Propietario", "Tutor", "Dueño", "Owner", "Patient", "Nombre del paciente",
+    "Referido por", "Derivante", "Médico", "Veterinario", "Médico veterinario", "Doctor",
+    "MVZ.", "Elaboró", "HALLAZGOS", "Hallazgo radiográfico", "Se observa", "Diagnóstico",
+    "Impresión diagnóstica", "Diagnosis", "CONCLUSIÓN", "INDICACIONES", "RECOMENDACIONES",
+    "Recomendación", "Tratamiento", "Recommendations", "Raza", "Especie", "Edad", "Sexo",
+    "Tel", "Cédula", "Fecha", "Firma", "©", "DiagnoVet", "Solicitud", "ANTECEDENTES",
+]
+WORDS = [
+    "Max", "Luna", "Chester", "Pérez", "García", "riñón", "hígado", "normal", "leve",
+    "moderado", "se", "observa", "control", "días", "ÁÉÍÓÚ", "ñandú", "a", "de", "la",
+]
+SEPARATORS = [": ", ":", " ", "\n", "\n\n", " \n  ", ". "]
+
+
+def random_report(rng: random.Random, tokens: int) -> str:
+    """Texto aleatorio mezclando etiquetas, palabras y separadores."""
+    parts = []
+    for _ in range(tokens):
+        parts.append(rng.choice(KEYWORDS) if rng.random() < 0.25 else rng.choice(WORDS))
+        parts.append(rng.choice(SEPARATORS))
+    text = "".join(parts)
+    return text.upper() if rng.random() < 0.2 else text
+
+
+def long_report(pages: int) -> str:
+    """Reporte de muchas páginas: cuerpo largo con etiquetas repetidas."""
+    page = (
+        "--- Página {n} ---\n"
+        "Estudio ecográfico abdominal. Se evalúan hígado, bazo y riñones.\n"
+        "Paciente en decúbito dorsal, sin sedación. Imagen {n} de la serie.\n"
+        "El parénquima hepático presenta ecogenicidad conservada y bordes regulares.\n"
+    )
+    body = "".join(page.format(n=n) for n in range(pages))
+    return body + SAMPLE_REPORTS[0]
+
+
+def build_corpus(seed: int = 1234, random_samples: int = 500) -> List[str]:
+    """Corpus determinístico: muestras reales + textos aleatorios."""
+    rng = random.Random(seed)
+    corpus = list(SAMPLE_REPORTS)
+    corpus += [random_report(rng, rng.randint(5, 200)) for _ in range(random_samples)]
+    corpus += [long_report(pages) for pages in (1, 10, 50)]
+    return corpus
+
+
+def time_call(func, text: str, repeat: int = 3) -> float:
+    """Mejor tiempo (segundos) de varias ejecuciones."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run() -> Dict:
+    """Ejecuta la regresión y las mediciones. Retorna el resumen."""
+    corpus = build_corpus()
+    mismatches = []
+    for index, text in enumerate(corpus):
+        expected = legacy_extract_fields(text)
+        actual = extract_fields(text)
+        if expected != actual:
+            mismatches.append({"index": index, "expected": expected, "actual": actual})
+
+    scaling = []
+    for pages in (100, 200, 400, 800):
+        text = long_report(pages)
+        scaling.append({
+            "pages": pages,
+            "chars": len(text),
+            "legacy_ms": round(time_call(legacy_extract_fields, text) * 1000, 3),
+            "engine_ms": round(time_call(extract_fields, text) * 1000, 3),
+        })
+
+    return {
+        "corpus_size": len(corpus),
+        "mismatches": len(mismatches),
+        "first_mismatches": mismatches[:5],
+        "scaling": scaling,
+    }
+
+
+if __name__ == "__main__":
+    summary = run()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if summary["mismatches"]:
+        raise SystemExit(1)
@@ -0,0 +1,471 @@
+"""
+Fakes en memoria de Cloud Storage, Firestore y Document AI para medir
+la aplicación sin red ni credenciales.
+
+Cada llamada "remota" espera la latencia configurada (FakeLatency), así
+los benchmarks reflejan el costo de las idas y vueltas a GCP y no solo
+el de la CPU. Solo implementan lo que usan los servicios de app/services.
+
+También se pueden inyectar fallas por operación (FakeGCP.inject_fault)
+para probar reintentos, timeouts y circuit breakers.
+
+Uso:
+    from benchmarks.gcp_fakes import FakeLatency, install_gcp_fakes
+    state = install_gcp_fakes(FakeLatency(storage=0.02, firestore=0.01, documentai=0.5))
+    from app.main import app  # importar DESPUÉS de instalar los fakes
+"""
+import copy
+import functools
+import io
+import operator
+import os
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from app.services.documentai_client import DocumentAIClientManager
+from app.services.pdf_processor import ParsedPDF
+
+
+@dataclass
+class FakeLatency:
+    """Latencia inyectada en segundos (jitter = fracción aleatoria ± sobre la media)."""
+    storage: float = 0.0
+    firestore: float = 0.0
+    documentai: float = 0.0
+    documentai_per_page: float = 0.0
+    jitter: float = 0.0
+
+
+@dataclass
+class Fault:
+    """
+    Falla inyectada en una operación (ej: "documentai.process", "storage.upload").
+
+    errors: Llamadas que fallan (-1 = todas hasta clear_faults)
+    rate: Probabilidad de que falle cada llamada (con errors agotado no falla más)
+    status: Código HTTP del error (503 → ServiceUnavailable, 429 → TooManyRequests...)
+    hang: Si es > 0, en vez de responder con error la llamada tarda estos
+          segundos; si el timeout de la llamada es menor, falla con
+          DeadlineExceeded al vencer el timeout
+    """
+    errors: int = -1
+    rate: float = 1.0
+    status: int = 503
+    hang: float = 0.0
+
+
+class FakeGCP:
+    """Estado compartido por todos los clientes falsos (buckets, colecciones y llamadas)."""
+
+    def __init__(self, latency: Optional[FakeLatency] = None, seed: int = 0):
+        self.latency = latency or FakeLatency()
+        self.buckets: Dict[str, Dict[str, bytes]] = {}
+        self.collections: Dict[str, Dict[str, Dict]] = {}
+        self.calls: Counter = Counter()
+        self.faults: Dict[str, Fault] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def inject_fault(self, operation: str, **fault):
+        """
+        Hace fallar las próximas llamadas a una operación.
+
+        Ej: state.inject_fault("documentai.process", errors=3, status=503)
+            state.inject_fault("storage.upload", hang=5)
+        """
+        with self._lock:
+            self.faults[operation] = Fault(**fault)
+
+    def clear_faults(self):
+        with self._lock:
+            self.faults.clear()
+
+    def _fault(self, operation: str) -> Optional[Fault]:
+        """La falla que le toca a esta llamada (con el lock tomado)."""
+        fault = self.faults.get(operation)
+        if fault is None or fault.errors == 0 or self._rng.random() >= fault.rate:
+            return None
+        if fault.errors > 0:
+            fault.errors -= 1
+        return fault
+
+    def pause(self, operation: str, seconds: float, timeout: Optional[float] = None):
+        """
+        Cuenta la llamada y espera su latencia (o aplica la falla inyectada).
+
+        Raises:
+            GoogleAPICallError: Con el código de la falla, o DeadlineExceeded
+                si la falla cuelga la llamada más que su timeout
+        """
+        with self._lock:
+            self.calls[operation] += 1
+            if seconds and self.latency.jitter:
+                seconds *= 1 + self._rng.uniform(-self.latency.jitter, self.latency.jitter)
+            fault = self._fault(operation)
+
+        if fault is not None:
+            from google.api_core import exceptions
+            if not fault.hang:
+                raise exceptions.from_http_status(fault.status, f"Falla inyectada en {operation}")
+            if timeout is not None and timeout < fault.hang:
+                time.sleep(timeout)
+                raise exceptions.DeadlineExceeded(f"{operation}: sin respuesta en {timeout:.1f} s")
+            seconds += fault.hang
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def reset(self):
+        """Vacía los datos, los contadores y las fallas (entre escenarios del benchmark)."""
+        with self._lock:
+            self.buckets.clear()
+            self.collections.clear()
+            self.calls.clear()
+            self.faults.clear()
+
+
+# ---------------------------------------------------------------------------
+# Cloud Storage
+# ---------------------------------------------------------------------------
+
+class FakeBlob:
+    def __init__(self, state: FakeGCP, bucket: str, name: str):
+        self._state = state
+        self._data = state.buckets.setdefault(bucket, {})
+        self.bucket_name = bucket
+        self.name = name
+        self.public_url = f"https://storage.googleapis.com/{bucket}/{name}"
+
+    def upload_from_string(self, data, content_type: Optional[str] = None, **kwargs):
+        self._state.pause("storage.upload", self._state.latency.storage, kwargs.get("timeout"))
+        self._data[self.name] = data if isinstance(data, bytes) else data.encode()
+
+    def upload_from_filename(self, filename: str, **kwargs):
+        with open(filename, "rb") as f:
+            self.upload_from_string(f.read(), **kwargs)
+
+    def upload_from_file(self, file_obj, rewind: bool = False, **kwargs):
+        if rewind:
+            file_obj.seek(0)
+        self.upload_from_string(file_obj.read(), **kwargs)
+
+    def open(self, mode: str = "rb", **kwargs):
+        return io.BytesIO(self.download_as_bytes(**kwargs))
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        self._state.pause("storage.download", self._state.latency.storage, kwargs.get("timeout"))
+        try:
+            return self._data[self.name]
+        except KeyError:
+            from google.api_core.exceptions import NotFound
+            raise NotFound(f"No existe gs://{self.bucket_name}/{self.name}")
+
+    def exists(self, **kwargs) -> bool:
+        self._state.pause("storage.exists", self._state.latency.storage)
+        return self.name in self._data
+
+    def delete(self, **kwargs):
+        self._state.pause("storage.delete", self._state.latency.storage)
+        if self._data.pop(self.name, None) is None:
+            from google.api_core.exceptions import NotFound
+            raise NotFound(f"No existe gs://{self.bucket_name}/{self.name}")
+
+
+class FakeBucket:
+    def __init__(self, state: FakeGCP, name: str):
+        self._state = state
+        self.name = name
+
+    def blob(self, name: str, **kwargs) -> FakeBlob:
+        return FakeBlob(self._state, self.name, name)
+
+
+class FakeStorageClient:
+    """Reemplazo de google.cloud.storage.Client."""
+
+    def __init__(self, state: FakeGCP, project: Optional[str] = None, **kwargs):
+        self._state = state
+        self.project = project
+
+    def bucket(self, name: str) -> FakeBucket:
+        return FakeBucket(self._state, name)
+
+    def list_blobs(self, bucket: str, prefix: str = "", **kwargs) -> List[FakeBlob]:
+        self._state.pause("storage.list", self._state.latency.storage)
+        names = [name for name in list(self._state.buckets.get(bucket, {})) if name.startswith(prefix)]
+        return [FakeBlob(self._state, bucket, name) for name in sorted(names)]
+
+
+# ---------------------------------------------------------------------------
+# Firestore
+# ---------------------------------------------------------------------------
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict]):
+        self.id = doc_id
+        self.exists = data is not None
+        # Como en Firestore, el snapshot no cambia si después se escribe el documento
+        self._data = copy.deepcopy(data)
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data)
+
+
+class FakeDocumentRef:
+    def __init__(self, state: FakeGCP, collection: str, doc_id: str):
+        self._state = state
+        self._docs = state.collections.setdefault(collection, {})
+        self.id = doc_id
+
+    def set(self, data: Dict, merge: bool = False):
+        self._state.pause("firestore.set", self._state.latency.firestore)
+        self._write(data, merge)
+
+    def _write(self, data: Dict, merge: bool = False):
+        if merge and self.id in self._docs:
+            self._docs[self.id].update(copy.deepcopy(data))
+        else:
+            self._docs[self.id] = copy.deepcopy(data)
+
+    def get(self, **kwargs) -> FakeSnapshot:
+        self._state.pause("firestore.get", self._state.latency.firestore)
+        return FakeSnapshot(self.id, self._docs.get(self.id))
+
+    def update(self, updates: Dict):
+        self._state.pause("firestore.update", self._state.latency.firestore)
+        if self.id not in self._docs:
+            from google.api_core.exceptions import NotFound
+            raise NotFound(f"No existe el documento {self.id}")
+        for path, value in updates.items():
+            target = self._docs[self.id]
+            *parents, leaf = path.split(".")
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = copy.deepcopy(value)
+
+    def delete(self):
+        self._state.pause("firestore.delete", self._state.latency.firestore)
+        self._docs.pop(self.id, None)
+
+
+_OPERATORS = {
+    "==": operator.eq,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "array_contains": lambda values, value: isinstance(values, list) and value in values,
+}
+
+
+def _field_value(data: Dict, path: str):
+    """Valor de un campo con ruta de puntos (ej: search_keys.patient_name)."""
+    for part in path.split("."):
+        if not isinstance(data, dict) or part not in data:
+            return None
+        data = data[part]
+    return data
+
+
+def _comparable(value):
+    """Las fechas sin zona (como las guarda la app) se comparan como UTC."""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class FakeQuery:
+    """where + order_by + select + start_after + limit sobre los documentos de una colección."""
+
+    def __init__(self, state: FakeGCP, collection: str):
+        self._state = state
+        self._collection = collection
+        self._filters: List[tuple] = []
+        self._orders: List[tuple] = []
+        self._fields: Optional[List[str]] = None
+        self._after: Optional[Dict] = None
+        self._limit: Optional[int] = None
+
+    def _copy(self, **changes) -> "FakeQuery":
+        query = copy.copy(self)
+        query._orders = list(self._orders)
+        query._filters = list(self._filters)
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    def where(self, field_path: str = None, op_string: str = None, value=None, filter=None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(_filters=self._filters + [(field_path, _OPERATORS[op_string], _comparable(value))])
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(_orders=self._orders + [(field, direction)])
+
+    def select(self, fields) -> "FakeQuery":
+        return self._copy(_fields=list(fields))
+
+    def start_after(self, values: Dict) -> "FakeQuery":
+        return self._copy(_after=values)
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(_limit=count)
+
+    def stream(self) -> List[FakeSnapshot]:
+        self._state.pause("firestore.query", self._state.latency.firestore)
+        docs = [
+            (doc_id, data) for doc_id, data in list(self._state.collections.get(self._collection, {}).items())
+            if all(
+                _field_value(data, path) is not None and compare(_comparable(_field_value(data, path)), value)
+                for path, compare, value in self._filters
+            )
+        ]
+
+        def key(item):
+            doc_id, data = item
+            return tuple(doc_id if field == "__name__" else _comparable(data.get(field)) for field, _ in self._orders)
+
+        descending = bool(self._orders) and self._orders[0][1] == "DESCENDING"
+        docs.sort(key=key, reverse=descending)
+        if self._after is not None:
+            after = tuple(_comparable(self._after.get(field)) for field, _ in self._orders)
+            docs = [item for item in docs if (key(item) < after if descending else key(item) > after)]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+
+        snapshots = []
+        for doc_id, data in docs:
+            if self._fields is not None:
+                data = {field: data[field] for field in self._fields if field in data}
+            snapshots.append(FakeSnapshot(doc_id, copy.deepcopy(data)))
+        return snapshots
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id: str) -> FakeDocumentRef:
+        return FakeDocumentRef(self._state, self._collection, doc_id)
+
+
+class FakeWriteBatch:
+    """Escrituras acumuladas que se aplican en un solo commit (una sola latencia)."""
+
+    def __init__(self, state: FakeGCP):
+        self._state = state
+        self._writes: List[tuple] = []
+
+    def set(self, ref: FakeDocumentRef, data: Dict, merge: bool = False):
+        self._writes.append((ref, data, merge))
+
+    def commit(self):
+        self._state.pause("firestore.commit", self._state.latency.firestore)
+        for ref, data, merge in self._writes:
+            ref._write(data, merge)
+        self._writes = []
+
+
+class FakeFirestoreClient:
+    """Reemplazo de google.cloud.firestore.Client."""
+
+    def __init__(self, state: FakeGCP, project: Optional[str] = None, **kwargs):
+        self._state = state
+        self.project = project
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self._state, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self._state)
+
+
+# ---------------------------------------------------------------------------
+# Document AI
+# ---------------------------------------------------------------------------
+
+def ocr_text(content: bytes) -> str:
+    """
+    "OCR" de un PDF sintético: en las páginas escaneadas el texto está en
+    la clave /BenchText de la imagen (benchmarks/synthetic_pdfs.py); en el
+    resto se usa la capa de texto.
+    """
+    document = ParsedPDF(content)
+    scanned: Dict[int, str] = {}
+    for page_num, _, obj in document.image_xobjects():
+        if "/BenchText" in obj:
+            scanned[page_num] = str(obj["/BenchText"])
+    return "".join(
+        scanned.get(page_num, document.page_text(page_num)) + "\n"
+        for page_num in range(document.num_pages)
+    )
+
+
+class FakeDocumentAIClient:
+    """Reemplazo de DocumentProcessorServiceClient (process_document en línea)."""
+
+    def __init__(self, state: FakeGCP):
+        self._state = state
+
+    @staticmethod
+    def processor_path(project: str, location: str, processor: str) -> str:
+        return f"projects/{project}/locations/{location}/processors/{processor}"
+
+    def get_processor(self, name: str, **kwargs):
+        self._state.pause("documentai.get_processor", self._state.latency.firestore)
+        return SimpleNamespace(name=name)
+
+    def process_document(self, request, **kwargs):
+        content = request.raw_document.content
+        text = ocr_text(content)
+        pages = ParsedPDF(content).num_pages
+        latency = self._state.latency
+        self._state.pause(
+            "documentai.process", latency.documentai + latency.documentai_per_page * pages, kwargs.get("timeout")
+        )
+        return SimpleNamespace(document=SimpleNamespace(text=text))
+
+
+class FakeDocumentAIManager(DocumentAIClientManager):
+    """DocumentAIClientManager que entrega el cliente falso (sin credenciales)."""
+
+    def __init__(self, client: FakeDocumentAIClient):
+        super().__init__()
+        self._fake_client = client
+
+    def get_client(self, location: str):
+        return self._fake_client
+
+
+def install_gcp_fakes(latency: Optional[FakeLatency] = None, seed: int = 0) -> FakeGCP:
+    """
+    Reemplaza los clientes de GCP por los fakes y completa la configuración
+    mínima para importar app.main.
+
+    Debe llamarse antes de arrancar la app (los servicios se crean en el
+    lifespan, con los clientes que haya en ese momento). El OCR en lote usa LocalBatchTransport y las miniaturas
+    se desactivan (usan procesos aparte) salvo que ya estén configuradas.
+
+    Args:
+        latency: Latencia inyectada por servicio
+        seed: Semilla del jitter
+
+    Returns:
+        FakeGCP con los datos y el conteo de llamadas
+    """
+    from google.cloud import firestore, storage
+    from app.services import documentai_client
+
+    state = FakeGCP(latency, seed)
+    storage.Client = functools.partial(FakeStorageClient, state)
+    firestore.Client = functools.partial(FakeFirestoreClient, state)
+    documentai_client._manager = FakeDocumentAIManager(FakeDocumentAIClient(state))
+
+    os.environ.setdefault("GCP_PROJECT_ID", "benchmark")
+    os.environ.setdefault("GCP_PROCESSOR_ID", "fake-processor")
+    os.environ.setdefault("GCS_BUCKET_NAME", "benchmark-bucket")
+    os.environ.setdefault("DOCUMENTAI_BATCH_TRANSPORT", "local")
+    os.environ.setdefault("IMAGE_DERIVATIVE_SIZES", "")
+    return state
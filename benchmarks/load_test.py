@@ -0,0 +1,395 @@
+"""
+Prueba de carga HTTP: cuántas subidas y lecturas concurrentes aguanta una
+instancia antes de saturarse, para elegir --concurrency de Cloud Run con
+datos.
+
+- Tráfico mixto de POST /upload-report, GET /reports/{id} y GET /reports
+  con tasas de llegada fijas por endpoint (peticiones por segundo,
+  llegadas de Poisson o a intervalos regulares)
+- Carga abierta: las llegadas no esperan a que terminen las anteriores.
+  Como máximo `concurrency` peticiones en curso, como hace Cloud Run por
+  instancia; las demás esperan su turno
+- Se barre la concurrencia (ej: 1,2,4,8,16) con la misma carga
+
+Por endpoint y nivel se reporta throughput, tasa de error y latencia
+p50/p95/p99, medida de dos formas:
+- latency: desde la llegada programada (incluye la espera por un lugar;
+  no esconde la cola cuando el servidor se atrasa)
+- service_latency: desde que la petición se envía (lo que tarda la instancia)
+
+Sin --url se levanta la app con uvicorn en otro proceso, sobre los fakes
+en memoria de GCP (benchmarks/gcp_fakes.py) con la latencia indicada.
+
+Uso:
+    python -m benchmarks.load_test --quick
+    python -m benchmarks.load_test --mix upload=4,get=40,list=10 --levels 1,4,8,16,32 --duration 30
+    python -m benchmarks.load_test --url http://localhost:8000 --mix get=50,list=10
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from benchmarks.pipeline_benchmarks import summarize
+from benchmarks.synthetic_pdfs import generate_report
+
+
+ENDPOINTS = {
+    "upload": ("POST", "/upload-report"),
+    "get": ("GET", "/reports/{report_id}"),
+    "list": ("GET", "/reports"),
+}
+
+
+@dataclass
+class RequestRecord:
+    """Una petición de la prueba."""
+    endpoint: str
+    status: str            # código HTTP o "error" (timeout, conexión)
+    latency: float         # desde la llegada programada
+    service_latency: float  # desde el envío
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Interpreta "upload=2,get=20,list=5" (peticiones por segundo).
+
+    Raises:
+        ValueError: Si un endpoint no existe o la tasa no es un número positivo
+    """
+    rates = {}
+    for part in filter(None, (p.strip() for p in mix.split(","))):
+        name, _, value = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Endpoint desconocido en --mix: {name} (válidos: {', '.join(ENDPOINTS)})")
+        rate = float(value)
+        if rate <= 0:
+            raise ValueError(f"La tasa de {name} debe ser mayor que 0")
+        rates[name] = rate
+    if not rates:
+        raise ValueError("--mix no tiene ningún endpoint")
+    return rates
+
+
+def arrival_times(rate: float, duration: float, rng: random.Random, poisson: bool = True) -> List[float]:
+    """Momentos de llegada (segundos desde el inicio) para una tasa dada."""
+    times, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate) if poisson else 1 / rate
+        if t >= duration:
+            return times
+        times.append(t)
+
+
+class PDFPool:
+    """PDFs sintéticos distintos (la deduplicación respondería los repetidos sin procesarlos)."""
+
+    def __init__(self, seed: int, pages: int, scanned_fraction: float):
+        self.rng = random.Random(seed)
+        self.seed = seed * 1_000_000
+        self.pages = pages
+        self.scanned_fraction = scanned_fraction
+
+    def next(self) -> bytes:
+        self.seed += 1
+        variant = "scanned" if self.rng.random() < self.scanned_fraction else "text"
+        return generate_report(self.seed, pages=self.pages, variant=variant).content
+
+
+class LoadGenerator:
+    """Genera la carga contra una URL y junta los resultados."""
+
+    def __init__(self, client, pdfs: PDFPool, rng: random.Random):
+        self.client = client
+        self.pdfs = pdfs
+        self.rng = rng
+        self.report_ids: List[str] = []
+
+    async def request(self, endpoint: str, content: Optional[bytes] = None):
+        """Una petición al endpoint; retorna la respuesta (lanza en errores de red)."""
+        if endpoint == "upload":
+            response = await self.client.post(
+                "/upload-report", files={"file": ("load.pdf", content, "application/pdf")}
+            )
+            if response.status_code == 200:
+                self.report_ids.append(response.json()["report_id"])
+            return response
+        if endpoint == "get":
+            report_id = self.rng.choice(self.report_ids) if self.report_ids else "no-existe"
+            return await self.client.get(f"/reports/{report_id}")
+        return await self.client.get("/reports", params={"page_size": 20})
+
+    async def seed_reports(self, count: int):
+        """Sube reportes iniciales para que GET /reports/{id} y /reports tengan datos."""
+        for _ in range(count):
+            await self.request("upload", await asyncio.to_thread(self.pdfs.next))
+
+    async def run_level(
+        self,
+        rates: Dict[str, float],
+        concurrency: int,
+        duration: float,
+        poisson: bool = True
+    ) -> List[RequestRecord]:
+        """
+        Carga abierta durante `duration` segundos con como máximo
+        `concurrency` peticiones en curso.
+        """
+        schedule = sorted(
+            (t, endpoint)
+            for endpoint, rate in rates.items()
+            for t in arrival_times(rate, duration, self.rng, poisson)
+        )
+        # Los PDFs se generan antes: la prueba mide al servidor, no al generador
+        uploads = sum(1 for _, endpoint in schedule if endpoint == "upload")
+        contents = [await asyncio.to_thread(self.pdfs.next) for _ in range(uploads)]
+
+        slots = asyncio.Semaphore(concurrency)
+        records: List[RequestRecord] = []
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def fire(scheduled: float, endpoint: str, content: Optional[bytes]):
+            async with slots:
+                sent = loop.time()
+                try:
+                    response = await self.request(endpoint, content)
+                    status = str(response.status_code)
+                except Exception:
+                    status = "error"
+                done = loop.time()
+            records.append(RequestRecord(endpoint, status, done - scheduled, done - sent))
+
+        tasks = []
+        for offset, endpoint in schedule:
+            delay = start + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            content = contents.pop() if endpoint == "upload" else None
+            tasks.append(asyncio.create_task(fire(start + offset, endpoint, content)))
+        await asyncio.gather(*tasks)
+        return records
+
+
+def endpoint_summary(records: List[RequestRecord], elapsed: float) -> Dict:
+    """Throughput, errores y latencias de un grupo de peticiones."""
+    statuses = Counter(record.status for record in records)
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(records),
+        "throughput_rps": round(len(records) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(errors / len(records), 4) if records else 0.0,
+        "status": dict(sorted(statuses.items())),
+        "latency": summarize([record.latency for record in records]),
+        "service_latency": summarize([record.service_latency for record in records]),
+    }
+
+
+def recommend_concurrency(levels: Dict[int, Dict], slo_ms: float, max_error_rate: float) -> Optional[int]:
+    """
+    Nivel con mayor throughput cuyo p99 de servicio cumple el SLO en todos
+    los endpoints y cuya tasa de error no supera el máximo.
+    """
+    candidates = [
+        (result["total"]["throughput_rps"], level)
+        for level, result in levels.items()
+        if result["total"]["error_rate"] <= max_error_rate
+        and all(ep["service_latency"]["p99_ms"] <= slo_ms for ep in result["endpoints"].values())
+    ]
+    return max(candidates)[1] if candidates else None
+
+
+async def run_load(
+    url: str,
+    rates: Dict[str, float],
+    levels: List[int],
+    duration: float,
+    seed_reports: int = 20,
+    pages: int = 1,
+    scanned_fraction: float = 0.2,
+    poisson: bool = True,
+    timeout: float = 120.0,
+    seed: int = 7
+) -> Dict[int, Dict]:
+    """
+    Ejecuta la prueba en cada nivel de concurrencia.
+
+    Returns:
+        Dict nivel → {"elapsed_s", "endpoints": {endpoint: resumen}, "total": resumen}
+    """
+    import httpx
+
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        generator = LoadGenerator(client, PDFPool(seed, pages, scanned_fraction), rng)
+        await generator.seed_reports(seed_reports)
+
+        results = {}
+        for level in levels:
+            print(f"🚦 Concurrencia {level}: {duration:.0f}s con {rates}", file=sys.stderr)
+            start = time.perf_counter()
+            records = await generator.run_level(rates, level, duration, poisson)
+            elapsed = time.perf_counter() - start
+            by_endpoint = {
+                endpoint: endpoint_summary([r for r in records if r.endpoint == endpoint], elapsed)
+                for endpoint in rates
+            }
+            results[level] = {
+                "elapsed_s": round(elapsed, 3),
+                "endpoints": by_endpoint,
+                "total": endpoint_summary(records, elapsed),
+            }
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def local_server(latency_args: List[str], startup_timeout: float = 60.0):
+    """
+    Levanta la app con los fakes de GCP en otro proceso (no comparte el GIL
+    con el generador de carga) y retorna su URL.
+    """
+    import httpx
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--serve", "--port", str(port), *latency_args],
+        stdout=sys.stderr
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("El servidor de prueba terminó al arrancar")
+            try:
+                if httpx.get(f"{url}/ready", timeout=1.0).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("El servidor de prueba no quedó listo a tiempo")
+            time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def serve(port: int, latency):
+    """Proceso servidor: instala los fakes, importa la app y corre uvicorn."""
+    from benchmarks.gcp_fakes import install_gcp_fakes
+
+    install_gcp_fakes(latency)
+    import uvicorn
+    from app.main import app
+
+    with contextlib.redirect_stdout(sys.stderr):
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main():
+    from benchmarks.gcp_fakes import FakeLatency
+
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP con barrido de concurrencia")
+    parser.add_argument("--url", help="Servidor ya levantado (si no, se levanta uno local con fakes de GCP)")
+    parser.add_argument("--mix", default="upload=2,get=30,list=5", help="Peticiones por segundo por endpoint")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="Niveles de concurrencia a barrer")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos de carga por nivel")
+    parser.add_argument("--seed-reports", type=int, default=20, help="Reportes subidos antes de empezar")
+    parser.add_argument("--pages", type=int, default=1, help="Páginas de cada PDF subido")
+    parser.add_argument("--scanned-fraction", type=float, default=0.2, help="Fracción de PDFs escaneados (van a Document AI)")
+    parser.add_argument("--uniform", action="store_true", help="Llegadas a intervalos regulares en vez de Poisson")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout de cada petición (s)")
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="p99 máximo aceptable para recomendar un nivel")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Tasa de error máxima para recomendar un nivel")
+    parser.add_argument("--storage-latency", type=float, default=0.02)
+    parser.add_argument("--firestore-latency", type=float, default=0.01)
+    parser.add_argument("--documentai-latency", type=float, default=0.5)
+    parser.add_argument("--documentai-page-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--quick", action="store_true", help="Prueba corta (3 niveles, 3 s cada uno)")
+    parser.add_argument("--output", help="Archivo donde guardar el JSON (además de stdout)")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    latency = FakeLatency(
+        storage=args.storage_latency,
+        firestore=args.firestore_latency,
+        documentai=args.documentai_latency,
+        documentai_per_page=args.documentai_page_latency,
+        jitter=args.jitter
+    )
+    if args.serve:
+        serve(args.port, latency)
+        return
+
+    rates = parse_mix(args.mix)
+    levels = sorted({int(level) for level in args.levels.split(",") if level.strip()})
+    duration, seed_reports = args.duration, args.seed_reports
+    if args.quick:
+        levels, duration, seed_reports = [1, 4, 16], 3.0, 5
+
+    latency_args = [
+        "--storage-latency", str(args.storage_latency),
+        "--firestore-latency", str(args.firestore_latency),
+        "--documentai-latency", str(args.documentai_latency),
+        "--documentai-page-latency", str(args.documentai_page_latency),
+        "--jitter", str(args.jitter),
+    ]
+    with contextlib.ExitStack() as stack:
+        url = args.url or stack.enter_context(local_server(latency_args))
+        results = asyncio.run(run_load(
+            url, rates, levels, duration,
+            seed_reports=seed_reports,
+            pages=args.pages,
+            scanned_fraction=args.scanned_fraction,
+            poisson=not args.uniform,
+            timeout=args.timeout,
+            seed=args.seed
+        ))
+
+    summary = {
+        "config": {
+            "url": args.url or "local (fakes de GCP)",
+            "mix_rps": rates,
+            "duration_s": duration,
+            "pages": args.pages,
+            "scanned_fraction": args.scanned_fraction,
+            "arrivals": "uniform" if args.uniform else "poisson",
+            "latency_s": None if args.url else vars(latency),
+            "cpus": os.cpu_count(),
+        },
+        "levels": {str(level): result for level, result in results.items()},
+        "recommended_concurrency": recommend_concurrency(results, args.slo_ms, args.max_error_rate),
+        "slo": {"p99_ms": args.slo_ms, "max_error_rate": args.max_error_rate},
+    }
+    output = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Benchmarks del pipeline sin GCP: corpus de PDFs sintéticos
+(benchmarks/synthetic_pdfs.py) y fakes en memoria de Storage, Firestore
+y Document AI con latencia inyectada (benchmarks/gcp_fakes.py).
+
+- Micro: extract_text, extract_images_in_memory y
+  _extract_fields_from_text por cada PDF del corpus
+- End-to-end: POST /upload-report a través de la app ASGI (middlewares,
+  validación, pipeline y guardado), con N peticiones concurrentes
+
+El resultado es un JSON (stdout o --output) para comparar corridas.
+Los logs de la app van a stderr.
+
+Uso:
+    python -m benchmarks.pipeline_benchmarks
+    python -m benchmarks.pipeline_benchmarks --quick --output resultados.json
+    python -m benchmarks.pipeline_benchmarks --documentai-latency 0.8 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+from benchmarks.gcp_fakes import FakeLatency, install_gcp_fakes
+from benchmarks.synthetic_pdfs import build_corpus, generate_report
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil q (0-100) con interpolación lineal."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Estadísticas en milisegundos de una lista de duraciones en segundos."""
+    ms = [sample * 1000 for sample in samples]
+    return {
+        "n": len(ms),
+        "min_ms": round(min(ms), 3) if ms else 0.0,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+
+def time_call(fn: Callable, iterations: int, warmup: int = 1) -> List[float]:
+    """Duración de cada llamada (después de `warmup` llamadas sin medir)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_micro(corpus, iterations: int) -> Dict:
+    """
+    Microbenchmarks de PDFProcessor sobre cada PDF del corpus.
+
+    Cada iteración abre el PDF de nuevo (ParsedPDF cachea texto e
+    imágenes, y se quiere medir el trabajo completo).
+    """
+    from app.services.pdf_processor import ParsedPDF, PDFProcessor
+
+    processor = PDFProcessor()
+    results = {}
+    try:
+        for report in corpus:
+            text = ParsedPDF(report.content).text
+            results[report.name] = {
+                "variant": report.variant,
+                "pages": report.pages,
+                "images": report.images,
+                "bytes": len(report.content),
+                "extract_text": summarize(time_call(
+                    lambda: processor.extract_text(ParsedPDF(report.content)), iterations
+                )),
+                "extract_images": summarize(time_call(
+                    lambda: processor.extract_images_in_memory(ParsedPDF(report.content), "bench"), iterations
+                )),
+                "extract_fields_from_text": summarize(time_call(
+                    lambda: processor._extract_fields_from_text(text), iterations
+                )),
+            }
+    finally:
+        processor.shutdown()
+    return results
+
+
+async def _upload_scenario(client, pdfs: List[bytes], concurrency: int) -> Dict:
+    """Sube todos los PDFs con como máximo `concurrency` peticiones a la vez."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def upload(index: int, content: bytes):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/upload-report", files={"file": (f"bench_{index}.pdf", content, "application/pdf")}
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(index, content) for index, content in enumerate(pdfs)))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(pdfs),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(pdfs) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round(errors / len(pdfs), 4) if pdfs else 0.0,
+        "status": dict(statuses),
+        "latency": summarize(latencies),
+    }
+
+
+async def run_end_to_end(state, scenarios: List[Dict], requests: int, concurrency: int, seed: int) -> Dict:
+    """
+    POST /upload-report a través de la app ASGI (httpx.ASGITransport).
+
+    Cada petición sube un PDF distinto para que la deduplicación por huella
+    no la responda sin procesar.
+    """
+    import httpx
+    from app.main import app, services
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        if not await services.wait(timeout=60):
+            raise RuntimeError(f"La app no quedó lista: {services.error}")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for scenario_index, scenario in enumerate(scenarios):
+                name = f"{scenario['variant']}_{scenario['pages']}p"
+                pdfs = [
+                    generate_report(seed * 100000 + scenario_index * 1000 + i, **scenario).content
+                    for i in range(requests)
+                ]
+                state.reset()
+                result = await _upload_scenario(client, pdfs, concurrency)
+
+                reports = state.collections.get("reports", {}).values()
+                result["extraction_tiers"] = dict(Counter(r.get("extraction_tier") for r in reports))
+                result["gcp_calls"] = dict(sorted(state.calls.items()))
+                results[name] = result
+    return results
+
+
+def run(
+    iterations: int = 10,
+    requests: int = 20,
+    concurrency: int = 4,
+    latency: FakeLatency = None,
+    seed: int = 7,
+    page_counts=(1, 5, 20)
+) -> Dict:
+    """
+    Ejecuta los benchmarks.
+
+    Args:
+        iterations: Repeticiones de cada microbenchmark
+        requests: Peticiones por escenario end-to-end
+        concurrency: Peticiones simultáneas en el end-to-end
+        latency: Latencia inyectada en los fakes de GCP
+        seed: Semilla del corpus
+        page_counts: Cantidades de páginas del corpus
+
+    Returns:
+        Dict con el resultado (serializable a JSON)
+    """
+    latency = latency or FakeLatency()
+    state = install_gcp_fakes(latency, seed=seed)
+
+    corpus = build_corpus(seed=seed, page_counts=page_counts)
+    scenarios = [{"variant": report.variant, "pages": report.pages} for report in corpus]
+
+    micro = run_micro(corpus, iterations)
+    end_to_end = asyncio.run(run_end_to_end(state, scenarios, requests, concurrency, seed))
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "iterations": iterations,
+            "requests": requests,
+            "concurrency": concurrency,
+            "seed": seed,
+            "latency_s": vars(latency),
+        },
+        "micro": micro,
+        "end_to_end": end_to_end,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline con PDFs sintéticos y fakes de GCP")
+    parser.add_argument("--iterations", type=int, default=10, help="Repeticiones de cada microbenchmark")
+    parser.add_argument("--requests", type=int, default=20, help="Peticiones por escenario end-to-end")
+    parser.add_argument("--concurrency", type=int, default=4, help="Peticiones simultáneas")
+    parser.add_argument("--storage-latency", type=float, default=0.02, help="Segundos por operación de Storage")
+    parser.add_argument("--firestore-latency", type=float, default=0.01, help="Segundos por operación de Firestore")
+    parser.add_argument("--documentai-latency", type=float, default=0.5, help="Segundos por llamada a Document AI")
+    parser.add_argument("--documentai-page-latency", type=float, default=0.05, help="Segundos extra por página en Document AI")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Variación aleatoria de la latencia (fracción)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--quick", action="store_true", help="Corpus y repeticiones mínimas (prueba rápida)")
+    parser.add_argument("--output", help="Archivo donde guardar el JSON (además de stdout)")
+    args = parser.parse_args()
+
+    latency = FakeLatency(
+        storage=args.storage_latency,
+        firestore=args.firestore_latency,
+        documentai=args.documentai_latency,
+        documentai_per_page=args.documentai_page_latency,
+        jitter=args.jitter
+    )
+    options = dict(iterations=args.iterations, requests=args.requests, concurrency=args.concurrency)
+    if args.quick:
+        options = dict(iterations=2, requests=4, concurrency=2, page_counts=(1, 5))
+
+    # Los servicios imprimen su progreso: a stderr, para que stdout sea solo el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run(latency=latency, seed=args.seed, **options)
+
+    output = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Generador determinístico de PDFs sintéticos de reportes veterinarios.
+
+Escribe el PDF a mano (objetos, streams y tabla xref) para no depender de
+una librería de generación de PDFs. Variantes:
+
+- text: PDF digital con capa de texto (Helvetica) e imágenes embebidas
+- scanned: cada página es una sola imagen JPEG, sin capa de texto. El
+  texto "verdadero" de la página va en la clave /BenchText de la imagen:
+  lo lee el Document AI falso (benchmarks/gcp_fakes.py) como si hiciera OCR
+
+Las imágenes alternan JPEG (DCTDecode, se copian tal cual) y RGB
+comprimido con Flate (hay que decodificarlo y codificarlo como PNG).
+
+Uso:
+    from benchmarks.synthetic_pdfs import build_corpus
+    corpus = build_corpus(seed=7)
+"""
+import io
+import random
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageDraw
+
+
+PATIENTS = ["Max", "Luna", "Rocky", "Kira", "Simba", "Toby", "Nala", "Bruno", "Mora", "Chester"]
+OWNERS = ["Juan Pérez", "María García", "Lucía Gómez", "Carlos Díaz", "Ana Romero", "Pedro Sosa"]
+VETS = ["Dra. Fernández", "Dr. Álvarez", "Dra. Ruiz", "Dr. Castro", "Dra. Molina"]
+FINDINGS = [
+    "se observa riñón izquierdo con cálculos renales de tamaño moderado",
+    "hígado de tamaño conservado con ecogenicidad levemente aumentada",
+    "vejiga con contenido anecoico y paredes de grosor normal",
+    "bazo de bordes regulares sin lesiones focales evidentes",
+    "asas intestinales con peristaltismo conservado y estratificación normal",
+]
+RECOMMENDATIONS = [
+    "Dieta especial baja en calcio y control ecográfico en 2 semanas",
+    "Repetir el estudio en 30 días y control de enzimas hepáticas",
+    "Hidratación abundante y análisis de orina completo",
+    "Control clínico en 7 días o antes si presenta vómitos",
+]
+FILLER = (
+    "Estudio ecográfico abdominal. Se evalúan hígado, bazo, riñones y vejiga. "
+    "Paciente en decúbito dorsal, sin sedación. El parénquima presenta ecogenicidad "
+    "conservada y bordes regulares. No se observan colecciones libres en cavidad. "
+)
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 en puntos
+LINE_HEIGHT = 14
+LINE_CHARS = 90
+
+
+@dataclass
+class SyntheticReport:
+    """PDF sintético y los valores que contiene (para validar la extracción)."""
+    name: str
+    content: bytes
+    variant: str
+    pages: int
+    images: int
+    expected: Dict[str, str] = field(default_factory=dict)
+
+
+class _PDFWriter:
+    """Arma un PDF mínimo objeto por objeto."""
+
+    def __init__(self):
+        self.objects: List[Optional[bytes]] = []
+
+    def reserve(self) -> int:
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, number: int, body: bytes):
+        self.objects[number - 1] = body
+
+    def add(self, body: bytes) -> int:
+        number = self.reserve()
+        self.set(number, body)
+        return number
+
+    def add_stream(self, entries: bytes, data: bytes) -> int:
+        return self.add(b"<< " + entries + b" /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+
+    def build(self, root: int) -> bytes:
+        out = io.BytesIO()
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, start=1):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.objects) + 1))
+        for offset in offsets:
+            out.write(b"%010d 00000 n \n" % offset)
+        out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.objects) + 1, root, xref))
+        return out.getvalue()
+
+
+def _pdf_string(text: str) -> bytes:
+    """Texto como string literal de PDF (WinAnsi, con escapes)."""
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _wrap(text: str) -> List[str]:
+    """Corta un párrafo en líneas de LINE_CHARS caracteres."""
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > LINE_CHARS:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _photo(rng: random.Random, size: int) -> Image.Image:
+    """Imagen tipo ecografía: fondo oscuro con manchas claras (comprime como una real)."""
+    image = Image.new("L", (size, size), 10)
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y, r = rng.randint(0, size), rng.randint(0, size), rng.randint(size // 20, size // 5)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=rng.randint(60, 220))
+    return image.convert("RGB")
+
+
+def _jpeg_xobject(writer: _PDFWriter, image: Image.Image, extra: bytes = b"") -> int:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    color = b"/DeviceGray" if image.mode == "L" else b"/DeviceRGB"
+    return writer.add_stream(
+        b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+        b"/BitsPerComponent 8 /Filter /DCTDecode %s" % (image.width, image.height, color, extra),
+        buffer.getvalue()
+    )
+
+
+def _flate_xobject(writer: _PDFWriter, image: Image.Image) -> int:
+    return writer.add_stream(
+        b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB "
+        b"/BitsPerComponent 8 /Filter /FlateDecode" % (image.width, image.height),
+        zlib.compress(image.tobytes(), 6)
+    )
+
+
+def _report_lines(rng: random.Random, pages: int, values: Dict[str, str]) -> List[List[str]]:
+    """Líneas de texto de cada página."""
+    first = [
+        "DiagnoVet - Informe de ultrasonido",
+        f"Paciente: {values['patient_name']}",
+        f"Propietario: {values['owner_name']}",
+        f"Referido por: {values['veterinarian_name']}",
+        "",
+        "HALLAZGOS:",
+        *_wrap(values["diagnosis"]),
+        "",
+        "RECOMENDACIONES:",
+        *_wrap(values["recommendations"]),
+        "",
+        f"Firma: {values['veterinarian_name']}",
+    ]
+    result = [first]
+    for page in range(1, pages):
+        paragraph = " ".join(FILLER for _ in range(rng.randint(3, 8)))
+        result.append([f"Anexo - página {page + 1}", *_wrap(paragraph)])
+    return result
+
+
+def _render_scan(lines: List[str]) -> Image.Image:
+    """Página escaneada: el texto dibujado en una imagen gris (sin capa de texto)."""
+    image = Image.new("L", (PAGE_WIDTH, PAGE_HEIGHT), 245)
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((40, 40 + index * LINE_HEIGHT), line, fill=20)
+    return image
+
+
+def generate_report(
+    seed: int,
+    pages: int = 1,
+    images_per_page: int = 2,
+    variant: str = "text",
+    image_size: int = 256
+) -> SyntheticReport:
+    """
+    Genera un PDF sintético determinístico (mismo seed = mismos bytes).
+
+    Args:
+        seed: Semilla del contenido
+        pages: Número de páginas
+        images_per_page: Imágenes embebidas por página (solo variante text)
+        variant: "text" (PDF digital) o "scanned" (imágenes sin capa de texto)
+        image_size: Lado de cada imagen en píxeles
+
+    Returns:
+        SyntheticReport
+    """
+    rng = random.Random(seed)
+    values = {
+        "patient_name": rng.choice(PATIENTS),
+        "owner_name": rng.choice(OWNERS),
+        "veterinarian_name": rng.choice(VETS),
+        "diagnosis": rng.choice(FINDINGS),
+        "recommendations": rng.choice(RECOMMENDATIONS),
+    }
+    page_lines = _report_lines(rng, pages, values)
+
+    writer = _PDFWriter()
+    catalog = writer.reserve()
+    pages_ref = writer.reserve()
+    font = writer.add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    page_refs = []
+    image_count = 0
+    for lines in page_lines:
+        xobjects = {}
+        commands = []
+        if variant == "scanned":
+            scan = _render_scan(lines)
+            name = b"Scan"
+            xobjects[name] = _jpeg_xobject(writer, scan, b"/BenchText " + _pdf_string("\n".join(lines)))
+            commands.append(b"q %d 0 0 %d 0 0 cm /Scan Do Q" % (PAGE_WIDTH, PAGE_HEIGHT))
+            image_count += 1
+        else:
+            text = [b"BT /F1 10 Tf %d TL 40 %d Td" % (LINE_HEIGHT, PAGE_HEIGHT - 50)]
+            for line in lines:
+                text.append(_pdf_string(line) + b" '")
+            text.append(b"ET")
+            commands.append(b"\n".join(text))
+            for index in range(images_per_page):
+                photo = _photo(rng, image_size)
+                name = b"Im%d" % index
+                # Se alternan JPEG y Flate para cubrir los dos caminos de extracción
+                if (image_count + index) % 2 == 0:
+                    xobjects[name] = _jpeg_xobject(writer, photo)
+                else:
+                    xobjects[name] = _flate_xobject(writer, photo)
+                commands.append(b"q 160 0 0 160 %d 60 cm /%s Do Q" % (40 + index * 180, name))
+            image_count += images_per_page
+
+        content = writer.add_stream(b"", b"\n".join(commands))
+        resources = b"<< /Font << /F1 %d 0 R >> /XObject << %s >> >>" % (
+            font, b" ".join(b"/%s %d 0 R" % (name, ref) for name, ref in xobjects.items())
+        )
+        page_refs.append(writer.add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>"
+            % (pages_ref, PAGE_WIDTH, PAGE_HEIGHT, resources, content)
+        ))
+
+    writer.set(pages_ref, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % ref for ref in page_refs), len(page_refs)
+    ))
+    writer.set(catalog, b"<< /Type /Catalog /Pages %d 0 R >>" % pages_ref)
+
+    return SyntheticReport(
+        name=f"{variant}_{pages}p_{seed}.pdf",
+        content=writer.build(catalog),
+        variant=variant,
+        pages=pages,
+        images=image_count,
+        expected=values
+    )
+
+
+def build_corpus(seed: int = 7, page_counts=(1, 5, 20), variants=("text", "scanned")) -> List[SyntheticReport]:
+    """
+    Corpus determinístico: una combinación por cantidad de páginas y variante.
+
+    Args:
+        seed: Semilla base
+        page_counts: Cantidades de páginas a generar
+        variants: Variantes a generar
+
+    Returns:
+        Lista de SyntheticReport
+    """
+    corpus = []
+    for index, (pages, variant) in enumerate((p, v) for p in page_counts for v in variants):
+        corpus.append(generate_report(seed * 1000 + index, pages=pages, variant=variant))
+    return corpus
@@ -0,0 +1,21 @@
+"""
+Fixtures compartidas: los fakes en memoria de GCP (benchmarks/gcp_fakes.py)
+reemplazan a los clientes reales, sin red ni credenciales.
+"""
+import pytest
+
+from benchmarks.gcp_fakes import FakeLatency, install_gcp_fakes
+
+
+@pytest.fixture(scope="session")
+def gcp_state():
+    """Instala los fakes una vez (los clientes se reemplazan a nivel de módulo)."""
+    return install_gcp_fakes(FakeLatency())
+
+
+@pytest.fixture
+def gcp(gcp_state):
+    """Fakes vacíos y sin fallas para cada prueba."""
+    gcp_state.reset()
+    yield gcp_state
+    gcp_state.reset()
@@ -0,0 +1,126 @@
+"""
+Cupo de uploads (AdmissionController) aplicado a las ejecuciones del
+pipeline: con el cupo ocupado un upload se rechaza con 429 y Retry-After,
+y un trabajo del modo asíncrono espera su turno y después se procesa.
+"""
+import asyncio
+import importlib
+
+import httpx
+import pytest
+
+from app.config import get_settings
+from app.services.admission import AdmissionController, AdmissionRejectedError
+from benchmarks.synthetic_pdfs import generate_report
+
+
+@pytest.fixture
+def api(gcp, monkeypatch):
+    """app.main con un cupo de 1 upload a la vez y la cola de espera indicada."""
+    def load(queue_size: int = 0):
+        for name, value in {
+            "GCP_PROJECT_ID": "test",
+            "GCS_BUCKET_NAME": "test-bucket",
+            "UPLOAD_CONCURRENCY": "1",
+            "UPLOAD_QUEUE_MAX_SIZE": str(queue_size),
+            "JOB_WORKERS": "1",
+        }.items():
+            monkeypatch.setenv(name, value)
+        get_settings.cache_clear()
+        return importlib.import_module("app.main")
+
+    yield load
+    get_settings.cache_clear()
+
+
+def serve(main, scenario):
+    """Corre scenario(client) con los servicios de la app inicializados."""
+    async def run():
+        async with main.app.router.lifespan_context(main.app):
+            assert await main.services.wait(30)
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await scenario(client)
+
+    asyncio.run(run())
+
+
+def pdf_file(seed: int):
+    return {"file": (f"r{seed}.pdf", generate_report(seed).content, "application/pdf")}
+
+
+async def job_status(client, report_id: str) -> str:
+    return (await client.get(f"/jobs/{report_id}")).json()["status"]
+
+
+def test_saturated_budget_rejects_with_retry_after(api):
+    main = api(queue_size=0)
+
+    async def scenario(client):
+        async with main.report_pipeline.slot():
+            response = await client.post("/upload-report", files=pdf_file(1))
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+
+        # Con el lugar libre el mismo upload se procesa
+        response = await client.post("/upload-report", files=pdf_file(1))
+        assert response.status_code == 200
+
+    serve(main, scenario)
+
+
+def test_worker_waits_for_a_slot_and_proceeds(api):
+    # Lugar en la cola: el upload asíncrono se acepta (los workers esperan sin límite)
+    main = api(queue_size=1)
+
+    async def scenario(client):
+        async with main.report_pipeline.slot():
+            response = await client.post("/upload-report?async_mode=true", files=pdf_file(2))
+            assert response.status_code == 202
+            report_id = response.json()["report_id"]
+
+            # El worker espera turno en vez de fallar con 429
+            for _ in range(100):
+                if main.upload_admission.waiting:
+                    break
+                await asyncio.sleep(0.01)
+            assert main.upload_admission.waiting == 1
+            assert await job_status(client, report_id) != "failed"
+
+        for _ in range(200):
+            status = await job_status(client, report_id)
+            if status in ("processed", "failed"):
+                break
+            await asyncio.sleep(0.02)
+        assert status == "processed"
+        assert main.upload_admission.in_flight == 0
+
+    serve(main, scenario)
+
+
+def test_check_rejects_only_when_the_queue_is_full():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrent=1, max_queue=1, queue_timeout=5.0)
+        entered = asyncio.Event()
+
+        async def background_job():
+            async with admission.admit(wait=True):
+                entered.set()
+
+        async with admission.admit():
+            admission.check()  # hay lugar en la cola
+            waiter = asyncio.ensure_future(background_job())
+            await asyncio.sleep(0)
+
+            with pytest.raises(AdmissionRejectedError) as rejected:
+                admission.check()
+            assert rejected.value.reason == "queue_full"
+            assert rejected.value.retry_after >= 1
+            assert not entered.is_set()
+
+        await waiter
+        assert entered.is_set()
+        assert admission.in_flight == 0
+
+    asyncio.run(scenario())
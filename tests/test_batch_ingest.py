@@ -0,0 +1,106 @@
+"""
+Carga en lote con OCR en lote (ocr_mode="batch") sobre LocalBatchTransport:
+los PDFs que Document AI no procesa (un documento o una operación entera)
+siguen por la extracción en línea.
+"""
+import asyncio
+
+import pytest
+
+from app.config import Settings
+from app.services.batch_ingest import BatchIngestor, BatchItem
+from app.services.documentai_batch import LocalBatchTransport, split_gcs_uri
+from app.services.firestore_db import FirestoreService
+from app.services.gcp_storage import GCPStorageService
+from app.services.pdf_processor import PDFProcessor
+from app.services.report_pipeline import ReportPipeline
+from benchmarks.synthetic_pdfs import generate_report
+
+
+class FailingOperationTransport(LocalBatchTransport):
+    """LocalBatchTransport en el que las operaciones de fail_operations fallan enteras."""
+
+    def __init__(self, *args, fail_operations=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_operations = set(fail_operations)
+
+    def poll(self, operation_name):
+        if operation_name.rsplit("/", 1)[-1] in self.fail_operations:
+            raise RuntimeError("Operación cancelada")
+        return super().poll(operation_name)
+
+
+@pytest.fixture
+def pipeline(gcp):
+    settings = Settings(
+        _env_file=None,
+        gcp_project_id="test",
+        gcs_bucket_name="test-bucket",
+        gcp_processor_id="processor",
+        documentai_batch_max_documents=2,
+        documentai_batch_poll_initial=0.0,
+        documentai_batch_poll_max=0.0
+    )
+    storage = GCPStorageService(bucket_name="test-bucket", project_id="test")
+    firestore = FirestoreService(project_id="test")
+    report_pipeline = ReportPipeline(PDFProcessor(), storage, firestore, settings)
+    yield report_pipeline
+    report_pipeline.shutdown()
+
+
+def make_transport(pipeline, **kwargs):
+    storage = pipeline.storage_service
+    return FailingOperationTransport(
+        read_input=lambda uri: storage.download_bytes(split_gcs_uri(uri)[1]), **kwargs
+    )
+
+
+def ingest(pipeline, transport, reports):
+    items = [
+        BatchItem(f"r{index}.pdf", lambda content=report.content: content)
+        for index, report in enumerate(reports)
+    ]
+    ingestor = BatchIngestor(pipeline, pipeline.firestore_service, batch_transport=transport)
+    return asyncio.run(ingestor.ingest("lote1", items, max_bytes=10 * 1024 * 1024, ocr_mode="batch"))
+
+
+def test_batch_ocr_with_failed_document_and_operation(gcp, pipeline):
+    reports = [generate_report(seed) for seed in range(5)]
+    # Con 2 PDFs por operación: 3 operaciones (2, 2 y 1 PDF)
+    transport = make_transport(pipeline, fail_operations={"2"})
+    original_start = transport.start
+
+    def start(processor_name, input_uris, output_uri):
+        # El PDF de la última operación falla como documento individual
+        if len(input_uris) == 1:
+            transport.fail_uris.update(input_uris)
+        return original_start(processor_name, input_uris, output_uri)
+
+    transport.start = start
+
+    outcomes = ingest(pipeline, transport, reports)
+
+    assert [outcome.status for outcome in outcomes] == ["processed"] * 5
+    tiers = []
+    for outcome, report in zip(outcomes, reports):
+        saved = pipeline.firestore_service.get_report(outcome.report_id)
+        assert saved["patient_name"] == report.expected["patient_name"]
+        assert saved["batch_id"] == "lote1"
+        tiers.append(saved["extraction_tier"])
+    # Solo la primera operación devolvió campos; los otros 3 PDFs usan la capa de texto
+    assert sorted(tiers) == ["document_ai_batch"] * 2 + ["text_layer"] * 3
+
+    # Cada salida se lee una vez y se descarta; sin archivos temporales en el bucket
+    assert transport.outputs == {}
+    assert pipeline.storage_service.list_blob_names("documentai-batch/") == []
+
+
+def test_batch_ocr_duplicates_are_not_sent_twice(gcp, pipeline):
+    report = generate_report(7)
+    transport = make_transport(pipeline)
+
+    outcomes = ingest(pipeline, transport, [report, report])
+
+    assert [outcome.status for outcome in outcomes] == ["processed", "duplicate"]
+    assert outcomes[1].report_id == outcomes[0].report_id
+    assert transport.outputs == {}
@@ -0,0 +1,228 @@
+"""
+Caché de lectura de reportes: aciertos, fallos, invalidación y fallas del almacén.
+"""
+from datetime import datetime
+
+import pytest
+
+from benchmarks.gcp_fakes import FakeDocumentRef
+from app.services.cache import InMemoryStore, LRUCache, SharedCache
+from app.services.firestore_db import FirestoreService
+
+
+class BrokenStore:
+    """Almacén que falla en todas las operaciones (Redis caído)."""
+
+    def get(self, key):
+        raise ConnectionError("redis caído")
+
+    def set(self, key, value, px=None):
+        raise ConnectionError("redis caído")
+
+    def delete(self, key):
+        raise ConnectionError("redis caído")
+
+    def mget(self, keys):
+        raise ConnectionError("redis caído")
+
+    def incr(self, key):
+        raise ConnectionError("redis caído")
+
+
+def make_report(report_id: str, status: str = "processed") -> dict:
+    return {
+        "id": report_id,
+        "pdf_filename": f"{report_id}.pdf",
+        "patient_name": "Max",
+        "diagnosis": "Cálculos renales",
+        "upload_date": datetime(2026, 1, 1, 10, 30),
+        "status": status,
+    }
+
+
+@pytest.fixture(params=["lru", "shared"])
+def report_cache(request):
+    """Las dos implementaciones de la caché de reportes."""
+    if request.param == "lru":
+        return LRUCache(max_size=16)
+    return SharedCache(InMemoryStore())
+
+
+@pytest.fixture
+def firestore(gcp, report_cache):
+    return FirestoreService(project_id="test", report_cache=report_cache)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1, ttl=0)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_shared_cache_round_trips_dates():
+    cache = SharedCache(InMemoryStore())
+    cache.set("r1", make_report("r1"))
+
+    assert cache.get("r1")["upload_date"] == datetime(2026, 1, 1, 10, 30)
+    assert cache.stats()["hits"] == 1
+
+
+def test_shared_cache_survives_store_errors():
+    cache = SharedCache(BrokenStore())
+    cache.set("r1", make_report("r1"))
+    cache.delete("r1")
+
+    assert cache.get("r1") is None
+    assert cache.stats()["errors"] == 3
+
+
+def test_set_after_invalidation_is_discarded(report_cache):
+    generation = report_cache.generation("r1")
+    report_cache.delete("r1")
+    report_cache.set("r1", make_report("r1"), generation=generation)
+
+    assert report_cache.get("r1") is None
+
+    report_cache.set("r1", make_report("r1"), generation=report_cache.generation("r1"))
+    assert report_cache.get("r1")["id"] == "r1"
+
+
+def test_lru_forgotten_invalidations_are_assumed_recent():
+    cache = LRUCache(max_size=1)
+    generation = cache.generation("a")
+    cache.delete("a")
+    cache.delete("b")  # "a" ya no está entre las invalidaciones recordadas
+
+    cache.set("a", 1, generation=generation)
+
+    assert cache.get("a") is None
+
+
+def test_shared_cache_invalidation_reaches_other_instances():
+    store = InMemoryStore()
+    first, second = SharedCache(store, default_ttl=60), SharedCache(store, default_ttl=60)
+
+    generation = first.generation("r1")
+    second.delete("r1")
+    first.set("r1", make_report("r1"), generation=generation)
+
+    assert first.get("r1") is None
+    assert second.get("r1") is None
+
+
+def test_get_report_miss_then_hit(gcp, firestore, report_cache):
+    firestore.save_report(make_report("r1"))
+    reads = gcp.calls["firestore.get"]
+
+    first = firestore.get_report("r1")
+    second = firestore.get_report("r1")
+
+    assert first == second
+    assert first["patient_name"] == "Max"
+    assert "search_terms" not in first
+    assert gcp.calls["firestore.get"] == reads + 1
+    assert report_cache.stats()["hits"] == 1
+
+
+def test_cached_report_is_a_copy(firestore):
+    firestore.save_report(make_report("r1"))
+    firestore.get_report("r1")["patient_name"] = "Otro"
+
+    assert firestore.get_report("r1")["patient_name"] == "Max"
+
+
+def test_update_invalidates_cached_report(firestore):
+    firestore.save_report(make_report("r1"))
+    firestore.get_report("r1")
+
+    firestore.update_report("r1", {"patient_name": "Luna"})
+
+    assert firestore.get_report("r1")["patient_name"] == "Luna"
+
+
+def test_delete_invalidates_cached_report(firestore):
+    firestore.save_report(make_report("r1"))
+    firestore.get_report("r1")
+
+    firestore.delete_report("r1")
+
+    assert firestore.get_report("r1") is None
+
+
+def test_missing_report_is_cached_until_saved(gcp, firestore):
+    assert firestore.get_report("r1") is None
+    reads = gcp.calls["firestore.get"]
+    assert firestore.get_report("r1") is None
+    assert gcp.calls["firestore.get"] == reads
+
+    firestore.save_report(make_report("r1"))
+
+    assert firestore.get_report("r1")["id"] == "r1"
+
+
+@pytest.mark.parametrize("status", ["queued", "processing"])
+def test_pending_jobs_are_not_cached(gcp, firestore, status):
+    firestore.save_report(make_report("r1", status=status))
+    firestore.get_report("r1")
+    reads = gcp.calls["firestore.get"]
+
+    report = firestore.get_report("r1")
+
+    assert report["status"] == status
+    assert gcp.calls["firestore.get"] == reads + 1
+
+
+@pytest.fixture
+def write_during_read(monkeypatch):
+    """Ejecuta una escritura justo después de la próxima lectura de un documento."""
+    def schedule(write):
+        original_get = FakeDocumentRef.get
+
+        def get_then_write(self, **kwargs):
+            monkeypatch.setattr(FakeDocumentRef, "get", original_get)
+            snapshot = original_get(self, **kwargs)
+            write()
+            return snapshot
+
+        monkeypatch.setattr(FakeDocumentRef, "get", get_then_write)
+    return schedule
+
+
+def test_stale_read_is_not_cached(firestore, write_during_read):
+    firestore.save_report(make_report("r1"))
+    write_during_read(lambda: firestore.update_report("r1", {"patient_name": "Luna"}))
+
+    assert firestore.get_report("r1")["patient_name"] == "Max"  # leído antes de la escritura
+    assert firestore.get_report("r1")["patient_name"] == "Luna"
+
+
+def test_report_saved_during_missing_read_is_not_hidden(firestore, write_during_read):
+    write_during_read(lambda: firestore.save_report(make_report("r1")))
+
+    assert firestore.get_report("r1") is None
+    assert firestore.get_report("r1")["id"] == "r1"
+
+
+def test_broken_cache_falls_back_to_firestore(gcp):
+    cache = SharedCache(BrokenStore())
+    firestore = FirestoreService(project_id="test", report_cache=cache)
+    firestore.save_report(make_report("r1"))
+
+    assert firestore.get_report("r1")["patient_name"] == "Max"
+    assert firestore.get_report("missing") is None
+    assert cache.stats()["errors"] > 0
@@ -0,0 +1,86 @@
+"""
+OCR de PDFs grandes por fragmentos (PDFProcessor._ocr_sharded) contra el
+fake de Document AI: orden del texto, reintentos por fragmento y
+cancelación de los fragmentos pendientes cuando uno falla.
+"""
+import pytest
+from google.api_core import exceptions
+
+from app.services import resilience
+from app.services.documentai_client import get_documentai_manager
+from app.services.pdf_processor import ParsedPDF, PDFProcessor
+from app.services.resilience import RetryPolicy, configure_guard
+from benchmarks.synthetic_pdfs import generate_report
+
+
+PAGES = 30
+SHARD_PAGES = 5
+SHARDS = PAGES // SHARD_PAGES
+
+
+@pytest.fixture(autouse=True)
+def documentai_guard(monkeypatch):
+    """Guard propio, sin esperas entre reintentos y con el circuito siempre cerrado."""
+    monkeypatch.setattr(resilience, "_guards", {})
+    configure_guard(
+        "documentai",
+        RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0),
+        failure_threshold=100,
+        reset_timeout=60.0
+    )
+
+
+@pytest.fixture
+def report():
+    return generate_report(5, pages=PAGES, images_per_page=0)
+
+
+def make_processor(concurrency: int = 4, retries: int = 2) -> PDFProcessor:
+    return PDFProcessor(
+        ocr_shard_threshold_pages=SHARD_PAGES,
+        ocr_shard_pages=SHARD_PAGES,
+        ocr_shard_concurrency=concurrency,
+        ocr_shard_retries=retries
+    )
+
+
+def extract(processor: PDFProcessor, report):
+    return processor.extract_fields_with_document_ai(ParsedPDF(report.content), "test", "us", "processor")
+
+
+def test_shards_are_joined_in_page_order(gcp, report):
+    processor = make_processor()
+    document = ParsedPDF(report.content)
+    client = get_documentai_manager().get_client("us")
+
+    sharded = processor._ocr_sharded(client, "processor", document)
+
+    assert gcp.calls["documentai.process"] == SHARDS
+    assert sharded.split() == processor._ocr(client, "processor", report.content).split()
+
+
+def test_sharded_extraction_finds_the_fields(gcp, report):
+    fields = extract(make_processor(), report)
+
+    assert fields["patient_name"] == report.expected["patient_name"]
+    assert fields["recommendations"] == report.expected["recommendations"]
+
+
+def test_failed_shard_is_retried_alone(gcp, report):
+    gcp.inject_fault("documentai.process", errors=1, status=503)
+
+    fields = extract(make_processor(), report)
+
+    assert gcp.calls["documentai.process"] == SHARDS + 1
+    assert fields["patient_name"] == report.expected["patient_name"]
+
+
+def test_failed_shard_cancels_pending_shards(gcp, report, monkeypatch):
+    monkeypatch.setattr(gcp.latency, "documentai", 0.05)
+    gcp.inject_fault("documentai.process", errors=1, status=400)
+
+    with pytest.raises(exceptions.BadRequest):
+        extract(make_processor(concurrency=1), report)
+
+    # El que falló y, como mucho, el que ya había empezado
+    assert gcp.calls["documentai.process"] <= 2
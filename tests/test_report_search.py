@@ -0,0 +1,160 @@
+"""
+GET /reports/search: FirestoreReportSearch (sobre el fake de Firestore) e
+InMemoryReportSearch tienen que devolver los mismos reportes en el mismo
+orden, y el backfill tiene que dejar buscables los reportes viejos.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.firestore_db import FirestoreService
+from app.services.report_search import (
+    FirestoreReportSearch, InMemoryReportSearch, InvalidSearchError, ReportSearchQuery
+)
+
+
+PATIENTS = ["Max", "Luna", "Toby", "Mía", "Rocky"]
+OWNERS = ["Juan Pérez", "María Gómez", "Pedro Peralta", "Ana López"]
+VETS = ["Dra. Fernández", "Dr. Ruiz"]
+DIAGNOSES = [
+    "Cálculos renales en riñón izquierdo",
+    "Hígado sin alteraciones",
+    "Cálculos en vejiga",
+    "Esplenomegalia leve",
+]
+
+QUERIES = [
+    {},
+    {"names": {"patient_name": "max"}},
+    {"names": {"owner_name": "JUAN PEREZ"}},
+    {"names": {"patient_name": "Luna", "veterinarian_name": "dra fernandez"}},
+    {"names": {"owner_name": "pe"}, "match": "prefix"},
+    {"names": {"owner_name": "pe", "patient_name": "ma"}, "match": "prefix"},
+    {"text": "cálculos"},
+    {"text": "calculos renales"},
+    {"names": {"patient_name": "Toby"}, "text": "calculos"},
+    {"date_from": datetime(2026, 1, 10), "date_to": datetime(2026, 1, 20)},
+    {"names": {"veterinarian_name": "Dr. Ruiz"}, "date_from": datetime(2026, 1, 5)},
+    {"names": {"patient_name": "Nadie"}},
+]
+
+
+def make_reports(count: int = 40, seed: int = 3):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, 9, 0)
+    reports = []
+    for index in range(count):
+        reports.append({
+            "id": f"r{index:03d}",
+            "pdf_filename": f"r{index:03d}.pdf",
+            "patient_name": rng.choice(PATIENTS),
+            "owner_name": rng.choice(OWNERS),
+            "veterinarian_name": rng.choice(VETS),
+            "diagnosis": rng.choice(DIAGNOSES),
+            "recommendations": None,
+            # Algunas fechas repetidas: el desempate es por ID
+            "upload_date": start + timedelta(days=index // 2),
+            "status": "processed",
+        })
+    return reports
+
+
+@pytest.fixture
+def backends(gcp):
+    """(Firestore, memoria) con los mismos reportes guardados."""
+    index = InMemoryReportSearch()
+    firestore = FirestoreService(project_id="test", search_index=index)
+    for report in make_reports():
+        firestore.save_report(report)
+    return FirestoreReportSearch(firestore.db, firestore.collection_name, max_scan=1000), index
+
+
+def all_ids(backend, page_size: int, **criteria):
+    """IDs de todas las páginas de una búsqueda, en orden."""
+    ids, cursor = [], None
+    while True:
+        page = backend.search(ReportSearchQuery(page_size=page_size, cursor=cursor, **criteria))
+        ids.extend(report["id"] for report in page.reports)
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("criteria", QUERIES)
+@pytest.mark.parametrize("page_size", [3, 100])
+def test_firestore_and_memory_return_the_same_reports(backends, criteria, page_size):
+    firestore_search, memory_search = backends
+
+    firestore_ids = all_ids(firestore_search, page_size, **criteria)
+    memory_ids = all_ids(memory_search, page_size, **criteria)
+
+    assert firestore_ids == memory_ids
+
+
+def test_results_are_newest_first(backends):
+    _, memory_search = backends
+    reports = memory_search.search(ReportSearchQuery(page_size=100)).reports
+
+    positions = [(report["upload_date"], report["id"]) for report in reports]
+    assert positions == sorted(positions, reverse=True)
+    assert all("search_terms" not in report for report in reports)
+
+
+def test_names_ignore_case_and_accents(backends):
+    _, memory_search = backends
+    reports = memory_search.search(ReportSearchQuery(names={"patient_name": "MIA"}, page_size=100)).reports
+
+    assert reports
+    assert {report["patient_name"] for report in reports} == {"Mía"}
+
+
+def test_scan_limit_marks_page_as_truncated(gcp):
+    firestore = FirestoreService(project_id="test")
+    for report in make_reports():
+        firestore.save_report(report)
+    search = FirestoreReportSearch(firestore.db, firestore.collection_name, max_scan=4)
+
+    page = search.search(ReportSearchQuery(names={"patient_name": "zz"}, match="prefix", text="higado", page_size=1))
+
+    assert page.truncated
+    assert page.next_cursor is not None
+
+
+def test_complete_page_is_not_truncated(backends):
+    firestore_search, _ = backends
+    page = firestore_search.search(ReportSearchQuery(page_size=5))
+
+    assert len(page.reports) == 5
+    assert not page.truncated
+
+
+def test_backfill_makes_old_reports_searchable(gcp):
+    firestore = FirestoreService(project_id="test")
+    reports = make_reports(count=7)
+    for report in reports:
+        # Guardados sin campos de búsqueda, como antes de GET /reports/search
+        firestore.db.collection(firestore.collection_name).document(report["id"]).set(report)
+    search = FirestoreReportSearch(firestore.db, firestore.collection_name)
+    query = ReportSearchQuery(names={"owner_name": reports[0]["owner_name"]}, page_size=100)
+    assert search.search(query).reports == []
+
+    assert firestore.backfill_search_fields(page_size=3, dry_run=True) == {"scanned": 7, "updated": 7}
+    assert search.search(query).reports == []
+    assert firestore.backfill_search_fields(page_size=3) == {"scanned": 7, "updated": 7}
+    assert firestore.backfill_search_fields(page_size=3) == {"scanned": 7, "updated": 0}
+
+    expected = {report["id"] for report in reports if report["owner_name"] == reports[0]["owner_name"]}
+    assert {report["id"] for report in search.search(query).reports} == expected
+
+
+@pytest.mark.parametrize("criteria", [
+    {"match": "fuzzy"},
+    {"names": {"species": "perro"}},
+    {"names": {"owner_name": "p"}, "match": "prefix"},
+    {"text": "de la"},
+    {"date_from": datetime(2026, 2, 1), "date_to": datetime(2026, 1, 1)},
+])
+def test_invalid_queries_are_rejected(criteria):
+    with pytest.raises(InvalidSearchError):
+        ReportSearchQuery(**criteria)
@@ -0,0 +1,177 @@
+"""
+Reintentos y circuit breaker de Cloud Storage contra el fake de GCP con
+fallas inyectadas (FakeGCP.inject_fault).
+"""
+import time
+
+import pytest
+from google.api_core import exceptions
+
+from app.services import resilience
+from app.services.gcp_storage import GCPStorageService
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceededError, RetryPolicy,
+    configure_guard, is_transient
+)
+
+
+RESET_TIMEOUT = 0.05
+
+
+@pytest.fixture(autouse=True)
+def isolated_guards(monkeypatch):
+    """Cada prueba configura sus propios guards (no se comparten entre pruebas)."""
+    monkeypatch.setattr(resilience, "_guards", {})
+
+
+def storage_guard(attempts: int = 3, failure_threshold: int = 3):
+    return configure_guard(
+        "storage",
+        RetryPolicy(max_attempts=attempts, base_delay=0.0, max_delay=0.0),
+        failure_threshold=failure_threshold,
+        reset_timeout=RESET_TIMEOUT
+    )
+
+
+@pytest.fixture
+def storage(gcp):
+    return GCPStorageService(bucket_name="test-bucket", project_id="test", upload_timeout=1.0)
+
+
+@pytest.mark.parametrize("error, transient", [
+    (exceptions.ServiceUnavailable("503"), True),
+    (exceptions.TooManyRequests("429"), True),
+    (exceptions.DeadlineExceeded("504"), True),
+    (ConnectionResetError(), True),
+    (exceptions.NotFound("404"), False),
+    (exceptions.BadRequest("400"), False),
+    (DeadlineExceededError("sin presupuesto"), False),
+    (ValueError("bug"), False),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_transient_errors_are_retried(gcp, storage):
+    guard = storage_guard(attempts=3)
+    gcp.inject_fault("storage.upload", errors=2, status=503)
+
+    storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    assert gcp.calls["storage.upload"] == 3
+    assert gcp.buckets["test-bucket"]["inputs/a.pdf"] == b"pdf"
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retries_are_bounded(gcp, storage):
+    storage_guard(attempts=3, failure_threshold=10)
+    gcp.inject_fault("storage.upload", errors=-1, status=503)
+
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    assert gcp.calls["storage.upload"] == 3
+
+
+def test_permanent_errors_are_not_retried(gcp, storage):
+    guard = storage_guard(attempts=3, failure_threshold=1)
+    gcp.inject_fault("storage.upload", errors=1, status=404)
+
+    with pytest.raises(exceptions.NotFound):
+        storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    assert gcp.calls["storage.upload"] == 1
+    # La dependencia respondió: no cuenta para abrir el circuito
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hanging_call_times_out_and_is_retried(gcp, storage):
+    storage_guard(attempts=2)
+    gcp.inject_fault("storage.upload", errors=1, hang=5.0)
+    storage.upload_timeout = 0.05
+
+    storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    assert gcp.calls["storage.upload"] == 2
+
+
+def test_expired_deadline_skips_the_call():
+    guard = storage_guard(attempts=5)
+    calls = []
+    deadline = Deadline(0.001)
+    time.sleep(0.01)
+
+    with pytest.raises(DeadlineExceededError):
+        guard.call(calls.append, deadline)
+
+    assert calls == []
+
+
+def test_no_retry_when_backoff_exceeds_deadline(monkeypatch):
+    guard = storage_guard(attempts=5)
+    monkeypatch.setattr(guard.retry, "backoff", lambda attempt: 1.0)
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        raise exceptions.ServiceUnavailable("503")
+
+    started = time.monotonic()
+    with pytest.raises(exceptions.ServiceUnavailable):
+        guard.call(call, Deadline(0.2))
+
+    assert len(calls) == 1
+    assert calls[0] <= 0.2
+    assert time.monotonic() - started < 0.2
+
+
+def test_circuit_opens_half_opens_and_closes(gcp, storage):
+    guard = storage_guard(attempts=1, failure_threshold=2)
+    gcp.inject_fault("storage.upload", errors=-1, status=503)
+
+    # closed → open después de failure_threshold errores seguidos
+    for _ in range(2):
+        with pytest.raises(exceptions.ServiceUnavailable):
+            storage.upload_bytes(b"pdf", "inputs/a.pdf")
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+    # Abierto: falla enseguida sin llamar a la dependencia
+    with pytest.raises(CircuitOpenError):
+        storage.upload_bytes(b"pdf", "inputs/a.pdf")
+    assert gcp.calls["storage.upload"] == 2
+
+    # Pasado reset_timeout: half_open, y la llamada de prueba cierra el circuito
+    time.sleep(RESET_TIMEOUT * 2)
+    assert guard.breaker.state == CircuitBreaker.HALF_OPEN
+    gcp.clear_faults()
+    storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+    assert gcp.calls["storage.upload"] == 3
+
+
+def test_failed_probe_reopens_circuit(gcp, storage):
+    guard = storage_guard(attempts=1, failure_threshold=1)
+    gcp.inject_fault("storage.upload", errors=-1, status=503)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    time.sleep(RESET_TIMEOUT * 2)
+    with pytest.raises(exceptions.ServiceUnavailable):
+        storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+    assert guard.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        storage.upload_bytes(b"pdf", "inputs/a.pdf")
+
+
+def test_half_open_allows_a_single_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED